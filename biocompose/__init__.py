@@ -9,9 +9,12 @@ sed_types = {
 }
 
 def register_types(core):
+    from biocompose.remote import register_protocols
+
     for key, schema in sed_types.items():
         core.register(key, schema)
-    return core
+    # also called by process_bigraph package discovery
+    return register_protocols(core)
 
 def create_core():
     core = get_sed_core()
@@ -0,0 +1,395 @@
+'''
+Run a directory (or manifest) of composite documents in parallel.
+
+    python -m biocompose.batch biocompose/documents --out out/batch --workers 8 --timeout 600
+
+Documents are run across a pool of worker processes. Each worker imports
+the engines once and then runs documents one after another. A document
+that runs past ``--timeout`` seconds, or that crashes its worker, is
+recorded as such, and the worker is replaced. If no worker starts, the
+remaining documents are recorded as ``crashed``.
+
+Every finished document's bridge output is written immediately to
+``<out>/results/<hash>.json``. The hash covers the document, the run time
+and the sha256 of every local ``model_source`` it references; remote
+sources are hashed by URL. A document whose hash already has an ``ok``
+result is skipped, so an interrupted or nightly run only redoes what
+changed. ``<out>/summary.json`` and a printed table list every document's
+status and timings.
+
+A manifest is a ``.txt`` file with one document path per line, or a
+``.json`` list of paths. Relative paths are resolved against the
+manifest's directory.
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Dict, Any, Callable, List, Optional
+
+from biocompose.processes.model_source import (
+    config_hash, hash_file, is_remote, resolve_model_source)
+
+
+RESULT_VERSION = 1
+
+
+# ----------------------------------------------------------------------
+# documents
+# ----------------------------------------------------------------------
+
+def find_documents(source) -> List[Path]:
+    """Document paths from a directory, a ``.txt`` or a ``.json`` manifest."""
+    source = Path(source)
+    if source.is_dir():
+        return sorted(source.glob('*.json'))
+
+    if source.suffix == '.json':
+        with open(source) as handle:
+            entries = json.load(handle)
+        if not isinstance(entries, list):
+            raise ValueError(f"JSON manifest must be a list of paths: {source}")
+    else:
+        with open(source) as handle:
+            entries = [
+                line.strip() for line in handle
+                if line.strip() and not line.lstrip().startswith('#')]
+
+    return [
+        path if path.is_absolute() else source.parent / path
+        for path in map(Path, entries)]
+
+
+def _model_sources(node, found):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == 'model_source' and isinstance(value, str):
+                found.add(value)
+            else:
+                _model_sources(value, found)
+    elif isinstance(node, list):
+        for item in node:
+            _model_sources(item, found)
+    return found
+
+
+def document_hash(document: Dict[str, Any], run_time: float) -> str:
+    """Content hash of a document run, including the model files it uses."""
+    models = {}
+    for model_source in sorted(_model_sources(document, set())):
+        if is_remote(model_source):
+            models[model_source] = model_source
+            continue
+        path = resolve_model_source(model_source)
+        models[model_source] = hash_file(path) if os.path.exists(path) else None
+
+    return config_hash({
+        'document': document,
+        'time': run_time,
+        'models': models,
+    })
+
+
+def _to_json(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    return str(value)
+
+
+def _write_json(path: Path, data):
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with open(tmp_path, 'w') as handle:
+        json.dump(data, handle, indent=1, default=_to_json)
+    os.replace(tmp_path, path)
+
+
+def run_document(core, path, run_time: float) -> Dict[str, Any]:
+    """Run one document, returning its bridge output and timings."""
+    from process_bigraph import Composite
+
+    with open(path) as handle:
+        document = json.load(handle)
+
+    start = time.perf_counter()
+    composite = Composite(document, core=core)
+    initialized = time.perf_counter()
+    composite.run(run_time)
+    finished = time.perf_counter()
+
+    return {
+        'output': composite.read_bridge(),
+        'init_seconds': initialized - start,
+        'run_seconds': finished - initialized,
+    }
+
+
+# ----------------------------------------------------------------------
+# worker pool
+# ----------------------------------------------------------------------
+
+def _worker_loop(connection, handler):
+    from biocompose import create_core
+
+    core = create_core()
+    connection.send('ready')
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        index, args = task
+        try:
+            outcome = {'status': 'ok', **handler(core, *args)}
+        except Exception as error:
+            outcome = {
+                'status': 'error',
+                'error': f'{type(error).__name__}: {error}',
+                'traceback': traceback.format_exc(),
+            }
+        connection.send((index, outcome))
+    connection.close()
+
+
+class _Worker:
+    def __init__(self, context, handler):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(
+            target=_worker_loop, args=(child, handler), daemon=True)
+        self.process.start()
+        child.close()
+        self.ready = False
+        self.task: Optional[int] = None
+        self.deadline = None
+
+    def submit(self, index: int, args: tuple, timeout: Optional[float]):
+        self.task = index
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.connection.send((index, args))
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=10)
+        if self.process.is_alive():
+            self.process.kill()
+        self.connection.close()
+
+
+def run_pool(tasks: List[tuple], handler: Callable, on_outcome: Callable,
+             workers: int = None, timeout: float = None):
+    """
+    Call ``handler(core, *task)`` for every task across ``workers`` spawned
+    processes, each with its own core, which run tasks one after another.
+
+    handler: a module level function returning a dict of results
+    on_outcome: called in this process as ``on_outcome(index, outcome)``
+        when a task finishes. The outcome is the handler's dict with
+        ``status`` 'ok', or ``status`` 'error', 'timeout' or 'crashed' with
+        an ``error`` message, plus ``seconds`` of wall time.
+
+    A worker that fails to start is dropped. If no worker starts, every
+    remaining task is reported as 'crashed' with the worker's exit code.
+    """
+    if not tasks:
+        return
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context('spawn')
+    queue = list(reversed(range(len(tasks))))
+    started: Dict[int, float] = {}
+    pool: List[_Worker] = []
+    startup_error = None
+
+    def finish(index: int, outcome: Dict[str, Any]):
+        outcome['seconds'] = time.perf_counter() - started[index]
+        on_outcome(index, outcome)
+
+    def assign(worker: _Worker):
+        index = queue.pop()
+        started[index] = time.perf_counter()
+        worker.submit(index, tasks[index], timeout)
+
+    try:
+        # workers only get a task once their engines are imported, so
+        # timeouts and timings cover the task alone
+        pool = [_Worker(context, handler) for _ in range(min(workers, len(tasks)))]
+
+        while queue or any(worker.task is not None for worker in pool):
+            active = [
+                worker for worker in pool
+                if not worker.ready or worker.task is not None]
+            if not active:
+                break
+            deadlines = [worker.deadline for worker in active if worker.deadline]
+            wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            ready = wait([worker.connection for worker in active], timeout=wait_for)
+
+            for worker in list(pool):
+                replace = False
+                if worker.connection in ready:
+                    try:
+                        message = worker.connection.recv()
+                    except (EOFError, OSError):
+                        if worker.task is None:
+                            worker.stop(kill=True)
+                            startup_error = (
+                                f'worker failed to start (exit code {worker.process.exitcode})')
+                            pool.remove(worker)
+                            continue
+                        worker.process.join(timeout=10)
+                        finish(worker.task, {
+                            'status': 'crashed',
+                            'error': f'worker exited with code {worker.process.exitcode}'})
+                        replace = True
+                    else:
+                        if message == 'ready':
+                            worker.ready = True
+                        else:
+                            finish(*message)
+                elif worker.deadline and time.monotonic() >= worker.deadline:
+                    finish(worker.task, {
+                        'status': 'timeout',
+                        'error': f'no result after {timeout} seconds'})
+                    replace = True
+                elif not (worker.ready and worker.task is None):
+                    continue
+
+                worker.task = None
+                worker.deadline = None
+                if replace:
+                    worker.stop(kill=True)
+                    pool[pool.index(worker)] = _Worker(context, handler)
+                elif queue and worker.ready:
+                    assign(worker)
+
+        # no worker started, so nothing is left to run the queue
+        while queue:
+            index = queue.pop()
+            started[index] = time.perf_counter()
+            finish(index, {'status': 'crashed', 'error': startup_error})
+    finally:
+        for worker in pool:
+            worker.stop(kill=worker.task is not None or not worker.ready)
+
+
+# ----------------------------------------------------------------------
+# batch
+# ----------------------------------------------------------------------
+
+def run_batch(documents, out_dir, workers: int = None, timeout: float = None,
+              run_time: float = 0.0, force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Run ``documents`` (paths) across ``workers`` processes.
+
+    Returns one summary row per document, in input order.
+    """
+    out_dir = Path(out_dir)
+    results_dir = out_dir / 'results'
+    results_dir.mkdir(parents=True, exist_ok=True)
+
+    rows: List[Dict[str, Any]] = []
+    pending: List[int] = []
+    for index, path in enumerate(documents):
+        row = {'document': str(path), 'status': None, 'hash': None, 'seconds': None}
+        rows.append(row)
+        try:
+            with open(path) as handle:
+                row['hash'] = document_hash(json.load(handle), run_time)
+        except (OSError, ValueError) as error:
+            row.update(status='error', error=f'{type(error).__name__}: {error}')
+            continue
+
+        result_path = results_dir / f"{row['hash']}.json"
+        if not force and result_path.exists():
+            with open(result_path) as handle:
+                stored = json.load(handle)
+            if stored.get('status') == 'ok' and stored.get('version') == RESULT_VERSION:
+                row.update(
+                    status='cached',
+                    seconds=stored.get('seconds'),
+                    init_seconds=stored.get('init_seconds'),
+                    run_seconds=stored.get('run_seconds'))
+                continue
+        pending.append(index)
+
+    def record(task: int, outcome: Dict[str, Any]):
+        row = rows[pending[task]]
+        row.update(status=outcome['status'], seconds=outcome['seconds'])
+        for key in ('init_seconds', 'run_seconds', 'error'):
+            if key in outcome:
+                row[key] = outcome[key]
+        _write_json(results_dir / f"{row['hash']}.json", {
+            'version': RESULT_VERSION,
+            'document': row['document'],
+            'hash': row['hash'],
+            'time': run_time,
+            **outcome,
+        })
+        print(f"[{sum(r['status'] is not None for r in rows)}/{len(rows)}] "
+              f"{row['status']:<8} {row['seconds']:8.2f}s  {row['document']}", flush=True)
+
+    try:
+        run_pool(
+            [(str(documents[index]), run_time) for index in pending],
+            run_document,
+            record,
+            workers=workers,
+            timeout=timeout)
+    finally:
+        # documents that finished before an interruption keep their rows
+        _write_json(out_dir / 'summary.json', rows)
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]]) -> str:
+    def seconds(value):
+        return f'{value:.2f}' if value is not None else '-'
+
+    names = [Path(row['document']).name for row in rows]
+    width = max([len('document')] + [len(name) for name in names])
+    lines = [
+        f"{'document':<{width}}  {'status':<8}  {'seconds':>9}  {'init':>9}  {'run':>9}  {'hash':<12}"]
+    for name, row in zip(names, rows):
+        lines.append(
+            f"{name:<{width}}  {row['status']:<8}  {seconds(row['seconds']):>9}  "
+            f"{seconds(row.get('init_seconds')):>9}  {seconds(row.get('run_seconds')):>9}  "
+            f"{(row['hash'] or '-')[:12]:<12}")
+
+    counts: Dict[str, int] = {}
+    for row in rows:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+    lines.append(', '.join(f'{status}: {count}' for status, count in sorted(counts.items())))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run composite documents in parallel.')
+    parser.add_argument('source', help='directory of documents, or a .txt/.json manifest')
+    parser.add_argument('--out', default='out/batch')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per document')
+    parser.add_argument('--time', type=float, default=0.0, help='simulation time to run each document for')
+    parser.add_argument('--force', action='store_true', help='rerun documents with stored results')
+    args = parser.parse_args(argv)
+
+    rows = run_batch(
+        find_documents(args.source),
+        args.out,
+        workers=args.workers,
+        timeout=args.timeout,
+        run_time=args.time,
+        force=args.force)
+    print(format_table(rows))
+    return rows
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,335 @@
+'''
+Cross-engine validation of a whole corpus of SBML models.
+
+    python -m biocompose.corpus path/to/models --db out/corpus.sqlite --workers 8
+
+Every ``*.xml``/``*.sbml`` file under the directory is simulated by every
+engine (``tellurium`` and ``copasi`` by default, ``numpy`` is available).
+Each engine run of each model is its own task on the ``biocompose.batch``
+worker pool, so all engines of all models run concurrently. Once all
+engines of a model have finished, their results are compared with
+``CompareResults``, the same way ``run_comparison_experiment`` does. The
+``species_mse`` is then written to the ``validations`` table of a SQLite
+database. Each row is committed right away, so the table can be queried
+while the run is still going:
+
+    SELECT path, max_mse FROM validations WHERE status = 'ok' ORDER BY max_mse DESC
+
+A model is only run again when its file hash, an engine version or the
+simulation settings changed. Models with a stored ``ok`` or ``error`` row
+are skipped, models that hit a ``timeout`` or ``crashed`` a worker are run
+again. Use ``--retry-errors`` to rerun errors, ``--force`` to rerun
+everything. A file whose content was already validated under another path
+reuses that result.
+'''
+
+import argparse
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from biocompose.batch import run_pool
+from biocompose.processes.model_source import config_hash, hash_file
+
+
+ENGINE_STEPS = {
+    'tellurium': 'TelluriumUTCStep',
+    'copasi': 'CopasiUTCStep',
+    'numpy': 'NumpyUTCStep',
+}
+
+DEFAULT_ENGINES = ('tellurium', 'copasi')
+
+MODEL_PATTERNS = ('*.xml', '*.sbml')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS validations (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    run_key TEXT NOT NULL,
+    engines TEXT NOT NULL,
+    status TEXT NOT NULL,
+    max_mse REAL,
+    species_mse TEXT,
+    errors TEXT,
+    seconds REAL,
+    finished REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS validations_content ON validations (sha256, run_key);
+CREATE INDEX IF NOT EXISTS validations_status ON validations (status, max_mse);
+'''
+
+COLUMNS = (
+    'path', 'sha256', 'run_key', 'engines', 'status',
+    'max_mse', 'species_mse', 'errors', 'seconds', 'finished')
+
+
+def engine_versions(engines) -> Dict[str, str]:
+    versions = {}
+    for engine in engines:
+        if engine == 'tellurium':
+            import roadrunner
+            versions[engine] = roadrunner.__version__
+        elif engine == 'copasi':
+            import COPASI
+            versions[engine] = COPASI.CVersion.VERSION.getVersion()
+        elif engine == 'numpy':
+            import numpy
+            import scipy
+            versions[engine] = f'numpy {numpy.__version__}, scipy {scipy.__version__}'
+        else:
+            raise ValueError(
+                f"Unknown engine {engine!r}, expected one of {tuple(ENGINE_STEPS)}")
+    return versions
+
+
+def find_models(directory) -> List[Path]:
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise ValueError(f"Not a directory: {directory}")
+    return sorted({
+        path for pattern in MODEL_PATTERNS
+        for path in directory.rglob(pattern)})
+
+
+# ----------------------------------------------------------------------
+# results table
+# ----------------------------------------------------------------------
+
+def open_table(path) -> sqlite3.Connection:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    # readers can query the table while rows are streamed in
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def stored_row(connection, path: str, sha256: str, run_key: str) -> Optional[Dict[str, Any]]:
+    """The stored validation of this content, under this path or another."""
+    row = connection.execute(
+        'SELECT * FROM validations WHERE path = ? AND sha256 = ? AND run_key = ?',
+        (path, sha256, run_key)).fetchone()
+    if row is None:
+        row = connection.execute(
+            'SELECT * FROM validations WHERE sha256 = ? AND run_key = ? '
+            "AND status = 'ok' LIMIT 1",
+            (sha256, run_key)).fetchone()
+    return dict(row) if row is not None else None
+
+
+def write_row(connection, row: Dict[str, Any]):
+    connection.execute(
+        f'INSERT OR REPLACE INTO validations ({", ".join(COLUMNS)}) '
+        f'VALUES ({", ".join("?" for _ in COLUMNS)})',
+        [row[column] for column in COLUMNS])
+    connection.commit()
+
+
+# ----------------------------------------------------------------------
+# engine runs (worker side)
+# ----------------------------------------------------------------------
+
+def run_engine(core, model_path: str, engine: str, time_interval: float, n_points: int):
+    """Simulate one model with one engine's UTC step, returning its result."""
+    from biocompose.processes import PROCESS_DICT
+
+    start = time.perf_counter()
+    step = PROCESS_DICT[ENGINE_STEPS[engine]]({
+        'model_source': model_path,
+        'time': time_interval,
+        'n_points': n_points,
+    }, core=core)
+    initialized = time.perf_counter()
+    result = step.update({})['result']
+    return {
+        'result': result,
+        'init_seconds': initialized - start,
+        'run_seconds': time.perf_counter() - initialized,
+    }
+
+
+# ----------------------------------------------------------------------
+# validation
+# ----------------------------------------------------------------------
+
+def compare(core, results: Dict[str, Dict[str, Any]]):
+    from biocompose.processes import CompareResults
+
+    comparison = CompareResults({}, core=core).update({'results': results})['comparison']
+    species_mse = comparison['species_mse']
+    values = [
+        mse for row in species_mse.values() for mse in row.values()
+        if mse is not None]
+    return species_mse, max(values) if values else None
+
+
+def validate_corpus(directory, db_path, engines=DEFAULT_ENGINES, workers: int = None,
+                    timeout: float = None, time_interval: float = 10.0, n_points: int = 100,
+                    force: bool = False, retry_errors: bool = False) -> Dict[str, int]:
+    """
+    Validate every model under ``directory`` across ``engines``, storing
+    one row per model in ``db_path``. Returns the count of each status.
+    """
+    from biocompose import create_core
+
+    if len(engines) < 2:
+        raise ValueError("Cross-engine validation needs at least two engines")
+    versions = engine_versions(engines)
+    run_key = config_hash({
+        'engines': versions,
+        'time': time_interval,
+        'n_points': n_points,
+    })
+
+    connection = open_table(db_path)
+    counts: Dict[str, int] = {}
+    # one entry per distinct file content, with every path it was found at
+    distinct: Dict[str, Dict[str, Any]] = {}
+    reusable = ('ok', 'error') if not retry_errors else ('ok',)
+
+    models = find_models(directory)
+    for model_path in models:
+        path = str(model_path.resolve())
+        sha256 = hash_file(path)
+        stored = None if force else stored_row(connection, path, sha256, run_key)
+        if stored is not None and stored['status'] in reusable:
+            if stored['path'] != path:
+                write_row(connection, {**stored, 'path': path, 'finished': time.time()})
+            counts['cached'] = counts.get('cached', 0) + 1
+            continue
+        if sha256 in distinct:
+            distinct[sha256]['paths'].append(path)
+            continue
+        distinct[sha256] = {
+            'paths': [path],
+            'sha256': sha256,
+            'results': {},
+            'errors': {},
+            'seconds': 0.0,
+            'remaining': len(engines),
+        }
+
+    pending = list(distinct.values())
+    print(f'{len(models)} models, {len(pending)} distinct to validate '
+          f'with {", ".join(engines)}', flush=True)
+
+    tasks = [
+        (model['paths'][0], engine, time_interval, n_points)
+        for model in pending
+        for engine in engines]
+    core = create_core()
+    done = 0
+
+    def record(index: int, outcome: Dict[str, Any]):
+        nonlocal done
+        model = pending[index // len(engines)]
+        engine = engines[index % len(engines)]
+        model['seconds'] += outcome['seconds']
+        if outcome['status'] == 'ok':
+            model['results'][engine] = outcome['result']
+        else:
+            model['errors'][engine] = {
+                'status': outcome['status'],
+                'error': outcome['error']}
+
+        model['remaining'] -= 1
+        if model['remaining']:
+            return
+
+        species_mse, max_mse = None, None
+        if model['errors']:
+            statuses = {error['status'] for error in model['errors'].values()}
+            status = next(
+                (status for status in ('crashed', 'timeout') if status in statuses),
+                'error')
+        else:
+            try:
+                species_mse, max_mse = compare(core, model['results'])
+                status = 'ok'
+            except Exception as error:
+                model['errors']['comparison'] = {
+                    'status': 'error',
+                    'error': f'{type(error).__name__}: {error}'}
+                status = 'error'
+
+        row = {
+            'sha256': model['sha256'],
+            'run_key': run_key,
+            'engines': json.dumps(versions, sort_keys=True),
+            'status': status,
+            'max_mse': max_mse,
+            'species_mse': json.dumps(species_mse) if species_mse is not None else None,
+            'errors': json.dumps(model['errors']) if model['errors'] else None,
+            'seconds': model['seconds'],
+            'finished': time.time(),
+        }
+        model['results'] = None
+        done += 1
+        mse = f'{max_mse:.3g}' if max_mse is not None else '-'
+        for path in model['paths']:
+            write_row(connection, {**row, 'path': path})
+            counts[status] = counts.get(status, 0) + 1
+            print(f'[{done}/{len(pending)}] {status:<8} max mse {mse:<10} {path}', flush=True)
+
+    try:
+        run_pool(tasks, run_engine, record, workers=workers, timeout=timeout)
+    finally:
+        connection.close()
+    return counts
+
+
+def format_report(db_path, limit: int = 10) -> str:
+    """Status counts and the models where the engines disagree most."""
+    connection = open_table(db_path)
+    try:
+        counts = connection.execute(
+            'SELECT status, COUNT(*) AS n FROM validations GROUP BY status ORDER BY status').fetchall()
+        worst = connection.execute(
+            "SELECT path, max_mse FROM validations WHERE status = 'ok' "
+            'ORDER BY max_mse DESC LIMIT ?', (limit,)).fetchall()
+    finally:
+        connection.close()
+
+    lines = [', '.join(f"{row['status']}: {row['n']}" for row in counts)]
+    if worst:
+        width = max(len(Path(row['path']).name) for row in worst)
+        lines.append(f"{'model':<{width}}  {'max mse':>12}")
+        for row in worst:
+            lines.append(f"{Path(row['path']).name:<{width}}  {row['max_mse']:>12.4g}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate engines against each other across a model corpus.')
+    parser.add_argument('directory', help='directory of SBML models, searched recursively')
+    parser.add_argument('--db', default='out/corpus.sqlite')
+    parser.add_argument('--engines', nargs='+', default=list(DEFAULT_ENGINES), choices=sorted(ENGINE_STEPS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--timeout', type=float, default=None, help='seconds per engine run')
+    parser.add_argument('--time', type=float, default=10.0, help='simulated time per model')
+    parser.add_argument('--n-points', type=int, default=100)
+    parser.add_argument('--force', action='store_true', help='rerun models with stored results')
+    parser.add_argument('--retry-errors', action='store_true', help='rerun models that failed before')
+    args = parser.parse_args(argv)
+
+    counts = validate_corpus(
+        args.directory,
+        args.db,
+        engines=tuple(args.engines),
+        workers=args.workers,
+        timeout=args.timeout,
+        time_interval=args.time,
+        n_points=args.n_points,
+        force=args.force,
+        retry_errors=args.retry_errors)
+    print(f'this run: {counts}')
+    print(format_report(args.db))
+
+
+if __name__ == '__main__':
+    main()
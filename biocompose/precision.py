@@ -0,0 +1,119 @@
+'''
+Reduced-precision storage for trajectories.
+
+    float64  full precision (default)
+    float32  about 7 significant digits, half the size
+    float16  quantized, a quarter of the size. Each array is divided by a
+             power of two so its largest magnitude is at most 1. This avoids
+             float16's overflow at 65504 and keeps relative precision
+             around 2**-11. The scale is stored with the array. The division
+             is exact, so all of the error comes from rounding.
+
+Downcasting is always explicit, with ``quantize``. ``error_report``
+measures what was lost against the full precision values.
+
+A step's ``precision`` option only rounds its trajectories to what the
+precision can hold. The step still reports Python float lists, so memory
+use in the composite does not change. The smaller size only applies where
+the values are stored at that precision: files written with
+``biocompose.wire.save`` and binary responses from the server.
+'''
+
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+PRECISIONS = {
+    'float64': '<f8',
+    'float32': '<f4',
+    'float16': '<f2',
+}
+
+# rounds a step's trajectories; the size is reduced only when they are
+# saved or sent with biocompose.wire
+PRECISION_SCHEMA = {
+    'precision': {'_type': 'string', '_default': 'float64'},
+}
+
+
+def check_precision(precision: str) -> str:
+    if precision not in PRECISIONS:
+        raise ValueError(
+            f"Unknown precision {precision!r}, expected one of {tuple(PRECISIONS)}")
+    return PRECISIONS[precision]
+
+
+def quantize(values, precision: str) -> Tuple[np.ndarray, float]:
+    """
+    Downcast ``values`` to ``precision``.
+
+    Returns the stored array and the scale to multiply it by when reading
+    it back (1.0 except for float16).
+    """
+    dtype = check_precision(precision)
+    values = np.asarray(values, dtype=float)
+    scale = 1.0
+    if dtype == '<f2':
+        peak = float(np.max(np.abs(values), initial=0.0))
+        if peak > 0 and np.isfinite(peak):
+            scale = float(2.0 ** np.ceil(np.log2(peak)))
+        return (values / scale).astype(dtype), scale
+    return values.astype(dtype), scale
+
+
+def dequantize(stored: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """Read a quantized array back as float64."""
+    values = np.asarray(stored, dtype=float)
+    if scale != 1.0:
+        values = values * scale
+    return values
+
+
+def round_trip(values, precision: str) -> np.ndarray:
+    """The float64 values a reader of ``precision`` storage will see."""
+    if precision == 'float64':
+        return np.asarray(values, dtype=float)
+    return dequantize(*quantize(values, precision))
+
+
+def round_trip_columns(values: np.ndarray, precision: str) -> np.ndarray:
+    """
+    ``round_trip`` each column of a (time x series) array on its own. This
+    matches the per-trajectory scaling of the wire format, so re-encoding
+    the result at the same precision loses nothing more.
+    """
+    if precision == 'float64':
+        return np.asarray(values, dtype=float)
+    return np.column_stack([
+        round_trip(values[:, column], precision)
+        for column in range(values.shape[1])
+    ]) if values.shape[1] else np.asarray(values, dtype=float)
+
+
+def error_report(full, reduced) -> Dict[str, float]:
+    """
+    Error of ``reduced`` against ``full`` precision values: the largest
+    absolute error, and the largest error relative to the peak magnitude of
+    its trajectory (each column of a (time x series) array).
+    """
+    full = np.asarray(full, dtype=float)
+    reduced = np.asarray(reduced, dtype=float)
+    if full.size == 0:
+        return {'max_abs_error': 0.0, 'max_rel_error': 0.0}
+    error = np.abs(reduced - full)
+    peak = np.max(np.abs(full), axis=0)
+    relative = error / np.where(peak > 0, peak, 1.0)
+    return {
+        'max_abs_error': float(np.max(error)),
+        'max_rel_error': float(np.max(relative)),
+    }
+
+
+def merge_reports(reports) -> Dict[str, float]:
+    """Worst case over several ``error_report`` results."""
+    merged = {'max_abs_error': 0.0, 'max_rel_error': 0.0}
+    for report in reports:
+        for key in merged:
+            merged[key] = max(merged[key], report[key])
+    return merged
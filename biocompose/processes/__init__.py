@@ -1,7 +1,9 @@
 from process_bigraph import ProcessTypes
 from biocompose.processes.copasi_process import CopasiUTCStep, CopasiUTCProcess, CopasiSteadyStateStep
 from biocompose.processes.tellurium_process import TelluriumUTCStep, TelluriumSteadyStateStep
+from biocompose.processes.numpy_process import NumpyUTCStep
 from biocompose.processes.comparison_processes import CompareResults
+from biocompose.processes.fitting import ParameterFitStep
 
 
 PROCESS_DICT = {
@@ -10,7 +12,9 @@ PROCESS_DICT = {
     "CopasiSteadyStateStep": CopasiSteadyStateStep,
     "TelluriumUTCStep": TelluriumUTCStep,
     "TelluriumSteadyStateStep": TelluriumSteadyStateStep,
+    "NumpyUTCStep": NumpyUTCStep,
     "CompareResults": CompareResults,
+    "ParameterFitStep": ParameterFitStep,
 }
 
 
@@ -0,0 +1,163 @@
+'''
+Adaptive output for time course steps.
+
+    grid      ``n_points`` evenly spaced samples (default)
+    steps     every internal step of the solver. Its error control makes the
+              steps dense across sharp transitions and sparse over flat
+              stretches.
+    adaptive  the solver steps, thinned to the fewest points whose linear
+              interpolation stays within ``output_tolerance`` (relative to
+              each observable's range) of every step that was dropped
+
+``events`` maps species to thresholds. Every crossing of a threshold is
+located by linear interpolation between the two solver points around it.
+Those two points are always kept in the output, also under decimation. Crossing times are
+reported per species and direction:
+
+    {'PX': {'up': [12.4, 160.2], 'down': [71.9]}}
+
+Results in ``steps`` or ``adaptive`` mode have a non-uniform time vector.
+``CompareResults`` interpolates results onto a shared time grid before
+comparing them.
+'''
+
+from typing import Dict, Any, List
+
+import numpy as np
+
+
+OUTPUT_MODES = ('grid', 'steps', 'adaptive')
+
+ADAPTIVE_SCHEMA = {
+    'output': {'_type': 'string', '_default': 'grid'},
+    'output_tolerance': {'_type': 'float', '_default': 1e-3},
+    'events': 'map[float]',
+}
+
+EVENTS_TYPE = 'map[map[list[float]]]'
+
+
+def output_mode(config: Dict[str, Any]) -> str:
+    mode = config.get('output') or 'grid'
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output {mode!r}, expected one of {OUTPUT_MODES}")
+    return mode
+
+
+def event_species(config: Dict[str, Any], species_ids) -> List[str]:
+    """Species with event thresholds, in slot order."""
+    events = config.get('events') or {}
+    unknown = set(events) - set(species_ids)
+    if unknown:
+        raise ValueError(f"Unknown event species: {sorted(unknown)}")
+    return [sid for sid in species_ids if sid in events]
+
+
+def _scale(values: np.ndarray) -> np.ndarray:
+    scale = np.ptp(values, axis=0)
+    scale[scale == 0] = 1.0
+    return scale
+
+
+def thin(times: np.ndarray, values: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Indices of the rows of ``values`` (time x observables) to keep so that
+    linear interpolation between kept rows is within ``tolerance`` times
+    each observable's range of every row.
+
+    Ramer-Douglas-Peucker: every segment between kept rows is split at its
+    worst row until none is off by more than the tolerance. All segments
+    are split together, one vectorized pass per level.
+    """
+    n_points = values.shape[0]
+    if n_points <= 2 or values.shape[1] == 0:
+        return np.arange(n_points)
+    limit = tolerance * _scale(values)
+    rows = np.arange(n_points)
+
+    keep = np.zeros(n_points, dtype=bool)
+    keep[[0, -1]] = True
+    while True:
+        kept = np.flatnonzero(keep)
+        segment = np.minimum(np.searchsorted(kept, rows, side='right') - 1, kept.size - 2)
+        start, end = kept[segment], kept[segment + 1]
+
+        span = times[end] - times[start]
+        fraction = np.divide(
+            times - times[start], span,
+            out=np.zeros(n_points), where=span > 0)[:, None]
+        chord = values[start] + fraction * (values[end] - values[start])
+        error = np.max(np.abs(values - chord) / limit, axis=1)
+        error[keep] = 0.0
+
+        worst = np.maximum.reduceat(error, kept[:-1])[segment]
+        split = (error > 1.0) & (error == worst)
+        if not split.any():
+            return kept
+        keep |= split
+
+
+def find_events(times: np.ndarray, values: np.ndarray, species: List[str],
+                thresholds: Dict[str, float]):
+    """
+    Threshold crossings of each column of ``values`` (one per ``species``).
+
+    Returns the crossing times per species and direction, and the indices
+    of the rows on either side of every crossing.
+    """
+    events = {}
+    brackets = []
+    for column, sid in enumerate(species):
+        offset = values[:, column] - float(thresholds[sid])
+        above = offset >= 0
+        crossings = np.flatnonzero(above[1:] != above[:-1])
+        before, after = offset[crossings], offset[crossings + 1]
+        at = times[crossings] + (times[crossings + 1] - times[crossings]) * before / (before - after)
+        rising = ~above[crossings]
+        events[sid] = {
+            'up': at[rising].tolist(),
+            'down': at[~rising].tolist(),
+        }
+        brackets.extend(crossings)
+        brackets.extend(crossings + 1)
+    return events, np.asarray(brackets, dtype=int)
+
+
+def event_columns(config: Dict[str, Any], species_ids, observables) -> List[str]:
+    """
+    Columns to select after the observables so every event species is
+    available: the event species that are not observables themselves.
+    """
+    observed = set(observables)
+    return [sid for sid in event_species(config, species_ids) if sid not in observed]
+
+
+def adaptive_rows(config: Dict[str, Any], values: np.ndarray, columns: List[str],
+                  n_observables: int):
+    """
+    The rows of a (time x selection) array to keep under a step's output
+    mode, the rows around every event crossing, and the events found (None
+    without events). The bracket rows are returned separately so they can
+    be added back after decimation.
+
+    columns: species of each column after time, the observables first
+    """
+    times = values[:, 0]
+
+    if output_mode(config) == 'adaptive':
+        keep = thin(
+            times,
+            values[:, 1:1 + n_observables],
+            float(config.get('output_tolerance', 1e-3)))
+    else:
+        keep = np.arange(values.shape[0])
+
+    thresholds = config.get('events') or {}
+    if not thresholds:
+        return keep, np.zeros(0, dtype=int), None
+
+    position = {sid: 1 + i for i, sid in enumerate(columns)}
+    species = [sid for sid in columns if sid in thresholds]
+    events, brackets = find_events(
+        times, values[:, [position[sid] for sid in species]], species, thresholds)
+    return keep, brackets, events
@@ -1,7 +1,10 @@
 from typing import Dict, Any
 
+import numpy as np
 from process_bigraph import Step, Process
 
+from biocompose.trace import span, traced
+
 from math import sqrt
 from typing import Dict, List, Tuple
 
@@ -31,6 +34,59 @@ def mean_squared_error_dict(a: Dict[str, List[float]],
     return sum_sq / count
 
 
+def mean_squared_error_arrays(a: np.ndarray, b: np.ndarray) -> float:
+    """MSE between two slot-aligned (species x time) arrays."""
+    if a.shape != b.shape:
+        raise ValueError(f"Shape mismatch: {a.shape} vs {b.shape}")
+    if a.size == 0:
+        raise ValueError("No data points to compare (count == 0)")
+    diff = a - b
+    return float(np.mean(diff * diff))
+
+
+def shared_time_grid(time_a: np.ndarray, time_b: np.ndarray) -> np.ndarray:
+    """Union of two time vectors, limited to the interval both cover."""
+    start = max(time_a[0], time_b[0])
+    end = min(time_a[-1], time_b[-1])
+    grid = np.union1d(time_a, time_b)
+    return grid[(grid >= start) & (grid <= end)]
+
+
+def same_times(time_a: np.ndarray, time_b: np.ndarray) -> bool:
+    return time_a.shape == time_b.shape and np.allclose(time_a, time_b, rtol=1e-9, atol=0.0)
+
+
+def mean_squared_error_aligned(time_a: np.ndarray, a: Dict[str, List[float]],
+                               time_b: np.ndarray, b: Dict[str, List[float]]) -> float:
+    """
+    MSE between results sampled at different times (adaptive output): both
+    are linearly interpolated onto ``shared_time_grid`` first.
+    """
+    common_keys = set(a.keys()) & set(b.keys())
+    if not common_keys:
+        raise ValueError("No overlapping keys between result dictionaries")
+    if time_a.size == 0 or time_b.size == 0:
+        raise ValueError("No data points to compare (count == 0)")
+
+    grid = shared_time_grid(time_a, time_b)
+    if grid.size == 0:
+        raise ValueError("Results do not overlap in time")
+
+    sum_sq = 0.0
+    for key in common_keys:
+        diff = np.interp(grid, time_a, a[key]) - np.interp(grid, time_b, b[key])
+        sum_sq += float(np.dot(diff, diff))
+    return sum_sq / (grid.size * len(common_keys))
+
+
+def stack_slots(species: Dict[str, List[float]]) -> np.ndarray | None:
+    """Stack trajectories in slot (insertion) order, None if ragged."""
+    try:
+        return np.asarray(list(species.values()), dtype=float)
+    except ValueError:
+        return None
+
+
 def safe_mse(a: Dict[str, List[float]],
              b: Dict[str, List[float]]) -> float | None:
     """Return MSE or None if we can't compute it (no overlap, etc.)."""
@@ -52,6 +108,7 @@ class CompareResults(Step):
             'comparison': 'map[map[map[float]]]',
         }
 
+    @traced("update")
     def update(self, inputs):
         results_map = inputs.get("results", {})
         if not isinstance(results_map, dict) or len(results_map) < 2:
@@ -68,6 +125,25 @@ class CompareResults(Step):
             for rid in engine_ids
         }
 
+        # Time vectors differ between engines with adaptive output, those
+        # pairs are interpolated onto a shared grid
+        times_by_id = {
+            rid: np.asarray(results_map[rid].get("time") or [], dtype=float)
+            for rid in engine_ids
+        }
+
+        # Engines built from the same model index emit species in the same
+        # slot order, those pairs are compared as arrays without key matching
+        with span("stack_slots"):
+            slots_by_id = {
+                rid: tuple(species_by_id[rid].keys())
+                for rid in engine_ids
+            }
+            arrays_by_id = {
+                rid: stack_slots(species_by_id[rid])
+                for rid in engine_ids
+            }
+
         # Initialize symmetric MSE matrix
         species_mse = {
             i: {j: None for j in engine_ids} for i in engine_ids
@@ -86,7 +162,17 @@ class CompareResults(Step):
                     continue
 
                 try:
-                    mse = mean_squared_error_dict(species_by_id[i], species_by_id[j])
+                    if not same_times(times_by_id[i], times_by_id[j]):
+                        with span("align"):
+                            mse = mean_squared_error_aligned(
+                                times_by_id[i], species_by_id[i],
+                                times_by_id[j], species_by_id[j])
+                    elif (slots_by_id[i] == slots_by_id[j]
+                            and arrays_by_id[i] is not None
+                            and arrays_by_id[j] is not None):
+                        mse = mean_squared_error_arrays(arrays_by_id[i], arrays_by_id[j])
+                    else:
+                        mse = mean_squared_error_dict(species_by_id[i], species_by_id[j])
                 except Exception:
                     mse = None
 
@@ -1,18 +1,28 @@
-import os
-from pathlib import Path
 from typing import Dict, Any
+import numpy as np
 from process_bigraph import Process, Step, Composite, ProcessTypes, gather_emitter_results
 import COPASI
 from basico import (
     load_model,
     get_species,
     get_reactions,
-    set_species,
     run_time_course,
+    run_time_course_with_output,
     run_steadystate,
 )
 import COPASI
 
+from biocompose.processes.model_source import resolve_model_source, config_hash, check_snapshot
+from biocompose.processes.model_index import get_model_index
+from biocompose.processes.decimation import DECIMATION_SCHEMA, decimate, select_observables
+from biocompose.processes.adaptive import (
+    ADAPTIVE_SCHEMA, EVENTS_TYPE, output_mode, event_columns, adaptive_rows)
+from biocompose.processes.integrators import (
+    SOLVER_SCHEMA, COPASI_DEFAULTS, COPASI_INTEGRATORS,
+    solver_settings, copasi_solver_kwargs, tune_copasi)
+from biocompose.precision import PRECISION_SCHEMA, check_precision, round_trip_columns, error_report
+from biocompose.trace import span, traced
+
 def _set_initial_concentrations(changes, dm):
     """
     changes: iterable of (species_name, value) pairs
@@ -51,27 +61,78 @@ def _get_transient_concentration(name, dm):
     return float(species.getConcentration())
 
 
+def _copasi_solver(instance, horizon, n_points) -> Dict[str, Any]:
+    """Solver settings for a COPASI backed instance, tuned if requested."""
+    if instance.config.get('integrator') == 'auto':
+        with span('tune_integrator'):
+            return tune_copasi(
+                instance.dm,
+                instance.model_index.sha256,
+                horizon,
+                n_points,
+                ['Time'] + [
+                    f'[{instance.model_index.sbml_to_display_name[sid]}]'
+                    for sid in instance.species_ids],
+                float(instance.config.get('tune_tolerance', 1e-4)))
+    return solver_settings(instance.config, COPASI_DEFAULTS, COPASI_INTEGRATORS)
+
+
+def _snapshot_copasi(instance) -> Dict[str, Any]:
+    """
+    Capture the transient species concentrations (slot order) of a COPASI
+    backed instance together with its time and config hash.
+    """
+    state = np.array([
+        _get_transient_concentration(name=instance.sbml_to_name[sbml_id], dm=instance.dm)
+        for sbml_id in instance.species_ids
+    ])
+    return {
+        'engine': 'copasi',
+        'config_hash': config_hash(instance.config),
+        'model_sha256': instance.model_index.sha256,
+        'time': instance.current_time,
+        'species_ids': list(instance.species_ids),
+        'state': state,
+    }
+
+
+def _restore_copasi(instance, snapshot):
+    """Load a snapshot from ``_snapshot_copasi`` back into the datamodel."""
+    check_snapshot(snapshot, instance.config, instance.model_index.sha256)
+
+    changes = [
+        (instance.sbml_to_name[sbml_id], float(value))
+        for sbml_id, value in zip(snapshot['species_ids'], snapshot['state'])
+        if sbml_id in instance.sbml_to_name
+    ]
+    _set_initial_concentrations(changes, instance.dm)
+    instance.cmodel.applyInitialValues()
+    instance.current_time = float(snapshot['time'])
+
+
 class CopasiUTCStep(Step):
 
     config_schema = {
         'model_source': 'string',
         'time': 'float',
         'n_points': 'integer',
+        **DECIMATION_SCHEMA,
+        **ADAPTIVE_SCHEMA,
+        **SOLVER_SCHEMA,
+        **PRECISION_SCHEMA,
     }
 
+    @traced('initialize')
     def initialize(self, config=None):
         model_source = self.config['model_source']
 
-        # Path resolution
-        if not model_source.startswith(('http://', 'https://')):
-            model_path = Path(model_source)
-            if not model_path.is_absolute():
-                project_root = Path(__file__).parent.parent
-                model_path = project_root / model_path
-            model_source = str(model_path)
+        # Path resolution (remote sources go through the model cache)
+        with span('resolve_model_source'):
+            model_source = resolve_model_source(model_source)
 
         # Load COPASI model
-        self.dm = load_model(model_source)
+        with span('load_model'):
+            self.dm = load_model(model_source)
         if self.dm is None:
             raise RuntimeError(
                 f"load_model({model_source!r}) returned None. "
@@ -80,20 +141,37 @@ class CopasiUTCStep(Step):
 
         self.cmodel = self.dm.getModel()
 
-        # Cache identifiers
-        spec_df = get_species(model=self.dm)
+        # Cache identifiers (shared per-model index, built once per file)
+        with span('model_index'):
+            self.model_index = get_model_index(model_source, dm=self.dm)
 
-        # canonical external IDs: SBML ids
-        self.species_ids = spec_df["sbml_id"].tolist()
+        # canonical external IDs: SBML ids, in slot order
+        self.species_ids = self.model_index.species_ids
 
-        # mapping SBML id -> COPASI display name (index)
-        self.sbml_to_name = {
-            spec_df.loc[name, "sbml_id"]: name
-            for name in spec_df.index
-        }
+        # mapping SBML id -> COPASI display name
+        self.sbml_to_name = self.model_index.sbml_to_name
+
+        self.reaction_names = self.model_index.reaction_names
 
-        rxn_df = get_reactions(model=self.dm)
-        self.reaction_names = rxn_df.index.tolist()
+        # Only the requested observables, and any other species that events
+        # are detected on, are added to the output selection
+        self.observables = select_observables(self.config, self.species_ids)
+        self._columns = self.observables + event_columns(
+            self.config, self.species_ids, self.observables)
+        self._selections = ['Time'] + [
+            f'[{self.model_index.sbml_to_display_name[sid]}]'
+            for sid in self._columns
+        ]
+        self.events = None
+
+        # Output times: uniform grid, or COPASI's automatic (solver) steps
+        self.output = output_mode(self.config)
+
+        # Precision the reported trajectories are rounded to; they stay
+        # float lists until saved or sent with biocompose.wire
+        self.precision = self.config.get('precision', 'float64')
+        check_precision(self.precision)
+        self.precision_report = None
 
         # Simulation parameters
         self.interval = float(self.config.get('time', 1.0))
@@ -103,6 +181,12 @@ class CopasiUTCStep(Step):
 
         self.intervals = self.n_points - 1   # COPASI requires this
 
+        self.solver = _copasi_solver(self, self.interval, self.n_points)
+        self._solver_kwargs = copasi_solver_kwargs(self.solver)
+
+        # simulated time so far, recorded in checkpoints
+        self.current_time = 0.0
+
     def initial_state(self) -> Dict[str, Any]:
         species_concentrations = {
             sbml_id: _get_transient_concentration(
@@ -122,10 +206,16 @@ class CopasiUTCStep(Step):
         }
 
     def outputs(self):
-        return {
+        outputs = {
             'result': 'result',
         }
+        if self.precision != 'float64':
+            outputs['precision_report'] = 'map[float]'
+        if self.config.get('events'):
+            outputs['events'] = EVENTS_TYPE
+        return outputs
 
+    @traced('update')
     def update(self, inputs):
         # Apply incoming concentrations
         spec_data = inputs.get('counts', {}) or {}
@@ -136,33 +226,74 @@ class CopasiUTCStep(Step):
         ]
 
         if changes:
-            _set_initial_concentrations(changes, self.dm)
-
-        # --- Run COPASI time course with intervals = n_points - 1 ---
-        tc = run_time_course(
-            start_time=0.0,
-            duration=self.config['time'],
-            intervals=self.intervals,
-            update_model=True,
-            use_sbml_id=True,
-            model=self.dm,
-        )
-
-        # Time series
-        time_list = tc.index.to_list()
-
-        species_update = {
-            sid: tc[sid].to_list()
-            for sid in self.species_ids
-            if sid in tc.columns
-        }
+            with span('set_inputs'):
+                _set_initial_concentrations(changes, self.dm)
+
+        # --- Run COPASI time course with intervals = n_points - 1 (or at
+        #     the automatic steps), only materializing time and the
+        #     selected columns ---
+        with span('integrate'):
+            tc = run_time_course_with_output(
+                self._selections,
+                start_time=0.0,
+                duration=self.config['time'],
+                intervals=self.intervals,
+                automatic=self.output != 'grid',
+                update_model=True,
+                model=self.dm,
+                **self._solver_kwargs,
+            )
+        with span('to_numpy'):
+            values = tc.to_numpy()
+
+        # Thin adaptive output, find events and decimate before building
+        # any lists
+        n_observed = len(self.observables) + 1
+        with span('adaptive_output', output=self.output):
+            keep, brackets, self.events = adaptive_rows(
+                self.config, values, self._columns, len(self.observables))
+        with span('decimate'):
+            keep = keep[decimate(self.config, values[keep, 1:n_observed])]
+            # the rows around event crossings survive decimation
+            keep = np.union1d(keep, brackets).astype(int)
+
+        kept = values[keep, :n_observed]
+        if self.precision != 'float64':
+            # Explicit downcast of the species, with the error against full
+            # precision; time stays float64 so it remains strictly increasing
+            with span('downcast', precision=self.precision):
+                full = kept[:, 1:]
+                reduced = round_trip_columns(full, self.precision)
+                self.precision_report = error_report(full, reduced)
+                kept = np.column_stack([kept[:, 0], reduced])
+
+        with span('build_lists'):
+            # Time series
+            time_list = kept[:, 0].tolist()
+
+            species_update = {
+                sid: kept[:, i + 1].tolist()
+                for i, sid in enumerate(self.observables)
+            }
 
         result = {
             "time": time_list,
             "species_concentrations": species_update,
         }
+        self.current_time += self.interval
 
-        return {"result": result}
+        update = {"result": result}
+        if self.precision_report is not None:
+            update["precision_report"] = self.precision_report
+        if self.events is not None:
+            update["events"] = self.events
+        return update
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return _snapshot_copasi(self)
+
+    def restore_checkpoint(self, snapshot):
+        _restore_copasi(self, snapshot)
 
 
 
@@ -173,19 +304,17 @@ class CopasiSteadyStateStep(Step):
         'time': 'float',  # kept for symmetry, not used
     }
 
+    @traced('initialize')
     def initialize(self, config=None):
         model_source = self.config['model_source']
 
-        # ---- Resolve path relative to project root ----
-        if not (model_source.startswith('http://') or model_source.startswith('https://')):
-            model_path = Path(model_source)
-            if not model_path.is_absolute():
-                project_root = Path(__file__).parent.parent
-                model_path = project_root / model_path
-            model_source = str(model_path)
+        # ---- Resolve path relative to project root / download cache ----
+        with span('resolve_model_source'):
+            model_source = resolve_model_source(model_source)
 
         # ---- Load COPASI model ----
-        self.dm = load_model(model_source)
+        with span('load_model'):
+            self.dm = load_model(model_source)
         if self.dm is None:
             raise RuntimeError(
                 f"load_model({model_source!r}) returned None. "
@@ -194,20 +323,17 @@ class CopasiSteadyStateStep(Step):
 
         self.cmodel = self.dm.getModel()
 
-        spec_df = get_species(model=self.dm)
+        with span('model_index'):
+            self.model_index = get_model_index(model_source, dm=self.dm)
 
-        # External canonical IDs: SBML IDs
-        self.species_ids = spec_df["sbml_id"].tolist()
+        # External canonical IDs: SBML IDs, in slot order
+        self.species_ids = self.model_index.species_ids
 
-        # Mapping: SBML ID -> COPASI display name (index)
-        self.sbml_to_name = {
-            spec_df.loc[name, "sbml_id"]: name
-            for name in spec_df.index
-        }
+        # Mapping: SBML ID -> COPASI display name
+        self.sbml_to_name = self.model_index.sbml_to_name
 
-        rxn_df = get_reactions(model=self.dm)
-        # These are typically SBML reaction ids already
-        self.reaction_ids = rxn_df.index.tolist()
+        # COPASI reaction names, as used to index get_reactions()
+        self.reaction_ids = self.model_index.reaction_names
 
     # ------------------------------------------------
     # initial state (SBML IDs externally)
@@ -247,6 +373,7 @@ class CopasiSteadyStateStep(Step):
     # ------------------------------------------------
     # steady-state update
     # ------------------------------------------------
+    @traced('update')
     def update(self, inputs):
         # 1) Prefer counts, otherwise concentrations (keys are SBML IDs)
         spec_data = (
@@ -267,14 +394,16 @@ class CopasiSteadyStateStep(Step):
 
         # 2) Run COPASI steady-state task
         # (use_sbml_id affects task I/O naming, but we read from get_species anyway)
-        run_steadystate(
-            update_model=True,
-            use_sbml_id=True,
-            model=self.dm,
-        )
+        with span('steady_state'):
+            run_steadystate(
+                update_model=True,
+                use_sbml_id=True,
+                model=self.dm,
+            )
 
         # 3) Read back steady-state species concentrations (SBML IDs externally)
-        spec_df = get_species(model=self.dm)
+        with span('get_species'):
+            spec_df = get_species(model=self.dm)
         # spec_df is indexed by COPASI name, with 'sbml_id' and 'concentration' columns
         species_conc_ss = {}
         for name in spec_df.index:
@@ -283,7 +412,8 @@ class CopasiSteadyStateStep(Step):
                 species_conc_ss[sbml_id] = float(spec_df.loc[name, "concentration"])
 
         # 4) Steady-state reaction fluxes
-        rxn_df = get_reactions(model=self.dm)
+        with span('get_reactions'):
+            rxn_df = get_reactions(model=self.dm)
         reaction_fluxes_ss = {
             rid: float(rxn_df.loc[rid, 'flux'])
             for rid in self.reaction_ids
@@ -311,21 +441,20 @@ class CopasiUTCProcess(Process):
         'model_source': 'string',
         'time': 'float',
         'intervals': 'integer',
+        **SOLVER_SCHEMA,
     }
 
+    @traced('initialize')
     def initialize(self, config=None):
         model_source = self.config['model_source']
 
-        # ---- Resolve path relative to sed2 project root ----
-        if not (model_source.startswith('http://') or model_source.startswith('https://')):
-            model_path = Path(model_source)
-            if not model_path.is_absolute():
-                project_root = Path(__file__).parent.parent
-                model_path = project_root / model_path
-            model_source = str(model_path)
+        # ---- Resolve path relative to sed2 project root / download cache ----
+        with span('resolve_model_source'):
+            model_source = resolve_model_source(model_source)
 
         # ---- Load COPASI model ----
-        self.dm = load_model(model_source)
+        with span('load_model'):
+            self.dm = load_model(model_source)
         if self.dm is None:
             raise RuntimeError(
                 f"Could not load model: {model_source!r}"
@@ -333,25 +462,40 @@ class CopasiUTCProcess(Process):
 
         self.cmodel = self.dm.getModel()
 
-        # ---- Species table from basico ----
-        spec_df = get_species(model=self.dm)
+        # ---- Identifiers from the shared model index ----
+        with span('model_index'):
+            self.model_index = get_model_index(model_source, dm=self.dm)
 
-        # canonical external IDs (SBML IDs)
-        self.species_ids = spec_df["sbml_id"].tolist()
+        # canonical external IDs (SBML IDs), in slot order
+        self.species_ids = self.model_index.species_ids
 
         # sbml → COPASI-name
-        self.sbml_to_name = {
-            spec_df.loc[name, "sbml_id"]: name
-            for name in spec_df.index
-        }
+        self.sbml_to_name = self.model_index.sbml_to_name
 
-        # ---- Reaction IDs ----
-        rxn_df = get_reactions(model=self.dm)
-        self.reaction_ids = rxn_df.index.tolist()
+        # ---- Reaction IDs (COPASI names, as used by get_reactions) ----
+        self.reaction_ids = self.model_index.reaction_names
 
         # ---- Sim parameters ----
         self.time = float(self.config.get("time", 1.0))
         self.intervals = int(self.config.get("intervals", 10))
+        self.current_time = 0.0
+
+        # with integrator: auto the solver is tuned in update, over the
+        # interval the composite actually advances it by
+        self.solver = None
+        self._solver_kwargs = None
+        self._solver_interval = None
+        if self.config.get('integrator') != 'auto':
+            self.solver = _copasi_solver(self, self.time, self.intervals + 1)
+            self._solver_kwargs = copasi_solver_kwargs(self.solver)
+
+    def _solver_for(self, interval) -> Dict[str, Any]:
+        """Solver keyword arguments for an update over ``interval``."""
+        if self.config.get('integrator') == 'auto' and interval != self._solver_interval:
+            self.solver = _copasi_solver(self, interval, self.intervals + 1)
+            self._solver_kwargs = copasi_solver_kwargs(self.solver)
+            self._solver_interval = interval
+        return self._solver_kwargs
 
     # -----------------------------------------------------------------
     # initial state
@@ -387,6 +531,7 @@ class CopasiUTCProcess(Process):
     # -----------------------------------------------------------------
     # update
     # -----------------------------------------------------------------
+    @traced('update')
     def update(self, inputs, interval):
         # --- 1) Determine incoming species map (SBML IDs)
         incoming = (
@@ -406,33 +551,40 @@ class CopasiUTCProcess(Process):
             _set_initial_concentrations(changes, self.dm)
 
         # --- 2) Run time course with SBML-ID columns ----
-        tc = run_time_course(
-            start_time=0.0,
-            duration=interval,
-            intervals=self.intervals,
-            update_model=True,
-            use_sbml_id=True,   # <-- critical
-            model=self.dm,
-        )
+        solver_kwargs = self._solver_for(interval)
+        with span('integrate'):
+            tc = run_time_course(
+                start_time=0.0,
+                duration=interval,
+                intervals=self.intervals,
+                update_model=True,
+                use_sbml_id=True,   # <-- critical
+                model=self.dm,
+                **solver_kwargs,
+            )
 
         # Extract time points
         time = tc["Time"].tolist() if "Time" in tc.columns else []
 
         # --- 3) Read back final state: export SBML IDs ----
-        species_concentrations = {
-            sbml_id: _get_transient_concentration(
-                name=self.sbml_to_name[sbml_id],
-                dm=self.dm
-            )
-            for sbml_id in self.species_ids
-        }
+        with span('read_state'):
+            species_concentrations = {
+                sbml_id: _get_transient_concentration(
+                    name=self.sbml_to_name[sbml_id],
+                    dm=self.dm
+                )
+                for sbml_id in self.species_ids
+            }
 
         # --- 4) Reaction fluxes (COPASI reaction IDs already match SBML IDs) ----
-        rxn_df = get_reactions(model=self.dm)
-        reaction_fluxes = {
-            rxn_id: float(rxn_df.loc[rxn_id, "flux"])
-            for rxn_id in self.reaction_ids
-        }
+        with span('get_reactions'):
+            rxn_df = get_reactions(model=self.dm)
+            reaction_fluxes = {
+                rxn_id: float(rxn_df.loc[rxn_id, "flux"])
+                for rxn_id in self.reaction_ids
+            }
+
+        self.current_time += interval
 
         return {
             "species_concentrations": species_concentrations,
@@ -440,6 +592,15 @@ class CopasiUTCProcess(Process):
             "time": time,
         }
 
+    # -----------------------------------------------------------------
+    # checkpointing
+    # -----------------------------------------------------------------
+    def checkpoint_state(self) -> Dict[str, Any]:
+        return _snapshot_copasi(self)
+
+    def restore_checkpoint(self, snapshot):
+        _restore_copasi(self, snapshot)
+
 
 
 
@@ -0,0 +1,102 @@
+'''
+Output decimation for time course steps.
+
+Each policy picks the indices of the time points to keep from a
+(time x observable) trajectory array. The first and last points are always
+kept so the reported interval does not change.
+
+    none       keep every point
+    every_k    keep every k-th point
+    threshold  keep a point once any observable moved by more than
+               ``threshold`` times its range since the last kept point
+    minmax     split the trajectory into buckets and keep each observable's
+               minimum and maximum per bucket, preserving peaks for plots
+'''
+
+from typing import Dict, Any
+
+import numpy as np
+
+
+DECIMATION_METHODS = ('none', 'every_k', 'threshold', 'minmax')
+
+DECIMATION_SCHEMA = {
+    'observables': 'list[string]',
+    'decimation': {'_type': 'string', '_default': 'none'},
+    'decimation_k': {'_type': 'integer', '_default': 1},
+    'decimation_threshold': {'_type': 'float', '_default': 0.01},
+    'decimation_points': {'_type': 'integer', '_default': 100},
+}
+
+
+def _with_endpoints(indices, n_points) -> np.ndarray:
+    return np.union1d(indices, [0, n_points - 1]).astype(int)
+
+
+def every_k(n_points: int, k: int) -> np.ndarray:
+    if k < 1:
+        raise ValueError(f"decimation_k must be >= 1, got {k}")
+    return _with_endpoints(np.arange(0, n_points, k), n_points)
+
+
+def change_threshold(values: np.ndarray, threshold: float) -> np.ndarray:
+    n_points = values.shape[0]
+    scale = np.ptp(values, axis=0)
+    scale[scale == 0] = 1.0
+    limit = threshold * scale
+
+    keep = [0]
+    last = values[0]
+    for i in range(1, n_points):
+        if np.any(np.abs(values[i] - last) > limit):
+            keep.append(i)
+            last = values[i]
+    return _with_endpoints(keep, n_points)
+
+
+def minmax(values: np.ndarray, points: int) -> np.ndarray:
+    n_points = values.shape[0]
+    n_buckets = max(points // 2, 1)
+    if n_points <= points:
+        return np.arange(n_points)
+
+    keep = []
+    for bucket in np.array_split(np.arange(n_points), n_buckets):
+        window = values[bucket]
+        keep.extend(bucket[np.argmin(window, axis=0)])
+        keep.extend(bucket[np.argmax(window, axis=0)])
+    return _with_endpoints(keep, n_points)
+
+
+def decimate(config: Dict[str, Any], values: np.ndarray) -> np.ndarray:
+    """
+    Return the indices of the rows of ``values`` (time x observables) to keep
+    under the policy described by a step's config.
+    """
+    method = config.get('decimation') or 'none'
+    n_points = values.shape[0]
+
+    if method == 'none' or n_points <= 2:
+        return np.arange(n_points)
+    if method == 'every_k':
+        return every_k(n_points, int(config.get('decimation_k', 1)))
+    if method == 'threshold':
+        return change_threshold(values, float(config.get('decimation_threshold', 0.01)))
+    if method == 'minmax':
+        return minmax(values, int(config.get('decimation_points', 100)))
+
+    raise ValueError(
+        f"Unknown decimation {method!r}, expected one of {DECIMATION_METHODS}")
+
+
+def select_observables(config: Dict[str, Any], species_ids):
+    """Observables requested in the config (in slot order), or all species."""
+    observables = config.get('observables') or []
+    if not observables:
+        return list(species_ids)
+
+    unknown = set(observables) - set(species_ids)
+    if unknown:
+        raise ValueError(f"Unknown observables: {sorted(unknown)}")
+    requested = set(observables)
+    return [sid for sid in species_ids if sid in requested]
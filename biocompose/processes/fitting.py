@@ -0,0 +1,451 @@
+'''
+Parameter estimation against experimental data.
+
+``ParameterFitStep`` takes data in the ``result`` shape on its ``data``
+input and fits the global parameters named in ``parameters``:
+
+    'parameters': {
+        'ps_a': {'lower': 0.1, 'upper': 1.0},
+        'tau_mRNA': {'lower': 0.5, 'upper': 5.0, 'initial': 1.0}}
+
+The model is simulated at exactly the data's time points, for the species
+in the data. The error is computed on (species x time) arrays with
+``mean_squared_error_arrays``.
+
+    mse        mean squared error
+    range_mse  the same, each species divided by its range in the data
+
+Candidates are evaluated on ``workers`` processes. Each process loads the
+model once and keeps it warm for every evaluation of the fit, and for
+later updates. ``differential_evolution`` sends each generation out in one
+round. ``nelder-mead`` evaluates one point at a time. Every evaluation is
+memoized per data set, so repeated points and repeated fits cost nothing.
+
+The step reports the best parameters, their error and trajectory, and the
+full history with one column per parameter plus ``error`` and ``cached``.
+'''
+
+import hashlib
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+from process_bigraph import Step
+
+from biocompose.processes.model_source import resolve_model_source
+from biocompose.processes.model_index import get_model_index
+from biocompose.processes.integrators import (
+    SOLVER_SCHEMA, TELLURIUM_DEFAULTS, TELLURIUM_INTEGRATORS, COPASI_DEFAULTS, COPASI_INTEGRATORS,
+    solver_settings, apply_tellurium_solver, copasi_solver_kwargs)
+from biocompose.processes.comparison_processes import mean_squared_error_arrays
+from biocompose.trace import span, traced
+
+
+FIT_ENGINES = ('tellurium', 'copasi')
+FIT_METHODS = ('differential_evolution', 'nelder-mead')
+FIT_METRICS = ('mse', 'range_mse')
+
+
+def fit_error(simulated: np.ndarray, data: np.ndarray, metric: str) -> float:
+    """Error of a (species x time) simulation against the data."""
+    if not np.all(np.isfinite(simulated)):
+        return float('inf')
+    if metric == 'range_mse':
+        scale = np.ptp(data, axis=1, keepdims=True)
+        scale[scale == 0] = 1.0
+        return mean_squared_error_arrays(simulated / scale, data / scale)
+    return mean_squared_error_arrays(simulated, data)
+
+
+# ----------------------------------------------------------------------
+# engine models
+# ----------------------------------------------------------------------
+
+class TelluriumFitModel:
+    """A warm RoadRunner instance that simulates parameter vectors."""
+
+    def __init__(self, model_path: str, parameter_ids: List[str], solver: Dict[str, Any]):
+        import tellurium as te
+
+        self.rr = te.loadSBMLModel(model_path)
+        apply_tellurium_solver(self.rr, solver)
+        self.parameter_ids = list(parameter_ids)
+
+        ruled = set(self.rr.getAssignmentRuleIds())
+        fittable = set(self.rr.getGlobalParameterIds()) - ruled
+        unknown = [pid for pid in self.parameter_ids if pid not in fittable]
+        if unknown:
+            raise ValueError(f"Not fittable global parameters: {unknown}")
+
+    def simulate(self, vector, times: np.ndarray, species: List[str]) -> np.ndarray:
+        for pid, value in zip(self.parameter_ids, vector):
+            self.rr[pid] = float(value)
+        # species initial values are re-evaluated with the new parameters
+        self.rr.reset()
+        # the simulation starts at the first time given
+        start = 1 if times[0] > 0 else 0
+        if start:
+            times = np.concatenate([[0.0], times])
+        values = self.rr.simulate(times=times, selections=[f'[{sid}]' for sid in species])
+        return np.asarray(values)[start:].T
+
+
+class CopasiFitModel:
+    """A warm COPASI datamodel that simulates parameter vectors."""
+
+    def __init__(self, model_path: str, parameter_ids: List[str], solver: Dict[str, Any]):
+        import COPASI
+        from basico import load_model
+
+        self.dm = load_model(model_path)
+        if self.dm is None:
+            raise RuntimeError(f"load_model({model_path!r}) returned None")
+        self.model = self.dm.getModel()
+        self.model_index = get_model_index(model_path, dm=self.dm)
+        self.solver_kwargs = copasi_solver_kwargs(solver)
+        self.parameter_ids = list(parameter_ids)
+
+        values = {}
+        for i in range(self.model.getNumModelValues()):
+            value = self.model.getModelValue(i)
+            if value.getStatus() == COPASI.CModelEntity.Status_FIXED:
+                values[value.getSBMLId()] = value
+        unknown = [pid for pid in self.parameter_ids if pid not in values]
+        if unknown:
+            raise ValueError(f"Not fittable global parameters: {unknown}")
+        self.values = [values[pid] for pid in self.parameter_ids]
+        self.references = COPASI.ObjectStdVector()
+        for value in self.values:
+            self.references.append(value.getInitialValueReference())
+
+    def simulate(self, vector, times: np.ndarray, species: List[str]) -> np.ndarray:
+        from basico import run_time_course_with_output
+
+        for value, parameter in zip(self.values, vector):
+            value.setInitialValue(float(parameter))
+        self.model.updateInitialValues(self.references)
+
+        tc = run_time_course_with_output(
+            [f'[{self.model_index.sbml_to_display_name[sid]}]' for sid in species],
+            values=times.tolist(),
+            duration=float(times[-1]),
+            use_initial_values=True,
+            update_model=False,
+            model=self.dm,
+            **self.solver_kwargs)
+        return tc.to_numpy().T
+
+
+def fittable_parameters(model_path) -> set:
+    """Global parameters of an SBML model that no rule sets."""
+    import libsbml
+
+    model = libsbml.readSBMLFromFile(str(model_path)).getModel()
+    if model is None:
+        raise RuntimeError(f"Could not read SBML model: {model_path}")
+    ruled = {rule.getVariable() for rule in model.getListOfRules()}
+    return {
+        parameter.getId() for parameter in model.getListOfParameters()
+        if parameter.getId() not in ruled}
+
+
+FIT_MODELS = {
+    'tellurium': TelluriumFitModel,
+    'copasi': CopasiFitModel,
+}
+
+
+def _evaluate(model, vector, times, species, data, metric) -> float:
+    try:
+        return fit_error(model.simulate(vector, times, species), data, metric)
+    except Exception:
+        # parameter sets the integrator cannot handle just score badly
+        return float('inf')
+
+
+# ----------------------------------------------------------------------
+# worker processes
+# ----------------------------------------------------------------------
+
+_worker_model = None
+
+
+def _init_worker(engine, model_path, parameter_ids, solver):
+    global _worker_model
+    _worker_model = FIT_MODELS[engine](model_path, parameter_ids, solver)
+
+
+def _evaluate_in_worker(task):
+    vector, times, species, data, metric = task
+    return _evaluate(_worker_model, vector, times, species, data, metric)
+
+
+def _simulate_in_worker(task):
+    vector, times, species = task
+    return _worker_model.simulate(vector, times, species)
+
+
+# ----------------------------------------------------------------------
+# step
+# ----------------------------------------------------------------------
+
+class ParameterFitStep(Step):
+    config_schema = {
+        'model_source': 'string',
+        'engine': {'_type': 'string', '_default': 'tellurium'},
+        'parameters': 'map[map[float]]',
+        'method': {'_type': 'string', '_default': 'differential_evolution'},
+        'metric': {'_type': 'string', '_default': 'mse'},
+        'max_iterations': {'_type': 'integer', '_default': 50},
+        'population': {'_type': 'integer', '_default': 15},
+        'workers': {'_type': 'integer', '_default': 0},
+        'seed': {'_type': 'integer', '_default': 0},
+        **SOLVER_SCHEMA,
+    }
+
+    @traced('initialize')
+    def initialize(self, config=None):
+        with span('resolve_model_source'):
+            self.model_path = resolve_model_source(self.config['model_source'])
+        with span('model_index'):
+            self.model_index = get_model_index(self.model_path)
+
+        self.engine = self.config.get('engine') or 'tellurium'
+        if self.engine not in FIT_ENGINES:
+            raise ValueError(f"Unknown engine {self.engine!r}, expected one of {FIT_ENGINES}")
+        self.method = self.config.get('method') or 'differential_evolution'
+        if self.method not in FIT_METHODS:
+            raise ValueError(f"Unknown method {self.method!r}, expected one of {FIT_METHODS}")
+        self.metric = self.config.get('metric') or 'mse'
+        if self.metric not in FIT_METRICS:
+            raise ValueError(f"Unknown metric {self.metric!r}, expected one of {FIT_METRICS}")
+
+        # fitted parameters, their bounds and starting point
+        parameters = self.config.get('parameters') or {}
+        if not parameters:
+            raise ValueError("ParameterFitStep: no parameters to fit")
+        self.parameter_ids = list(parameters)
+        # checked here, the engine models raise inside the optimizer otherwise
+        fittable = fittable_parameters(self.model_path)
+        unknown = [pid for pid in self.parameter_ids if pid not in fittable]
+        if unknown:
+            raise ValueError(f"Not fittable global parameters: {unknown}")
+        self.bounds = []
+        self.initial = []
+        for pid, spec in parameters.items():
+            if 'lower' not in spec or 'upper' not in spec:
+                raise ValueError(f"Parameter {pid!r} needs 'lower' and 'upper' bounds")
+            lower, upper = float(spec['lower']), float(spec['upper'])
+            if not lower < upper:
+                raise ValueError(f"Parameter {pid!r}: lower must be below upper")
+            self.bounds.append((lower, upper))
+            self.initial.append(float(spec.get('initial', (lower + upper) / 2)))
+
+        if self.config.get('integrator') == 'auto':
+            raise ValueError("ParameterFitStep: integrator 'auto' is not supported, choose one")
+        if self.engine == 'tellurium':
+            self.solver = solver_settings(self.config, TELLURIUM_DEFAULTS, TELLURIUM_INTEGRATORS)
+        else:
+            self.solver = solver_settings(self.config, COPASI_DEFAULTS, COPASI_INTEGRATORS)
+
+        self.workers = int(self.config.get('workers') or 0) or os.cpu_count() or 1
+        self._model = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+        # (data hash, parameter vector) -> error
+        self._memo: Dict[tuple, float] = {}
+
+    def inputs(self):
+        return {
+            'data': 'result',
+        }
+
+    def outputs(self):
+        return {
+            'parameters': 'map[float]',
+            'error': 'float',
+            'result': 'result',
+            'history': 'map[list[float]]',
+        }
+
+    # ------------------------------------------------
+    # evaluation
+    # ------------------------------------------------
+    def _local_model(self):
+        if self._model is None:
+            with span('load_model'):
+                self._model = FIT_MODELS[self.engine](
+                    self.model_path, self.parameter_ids, self.solver)
+        return self._model
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with span('start_workers', workers=self.workers):
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.engine, self.model_path, self.parameter_ids, self.solver))
+                weakref.finalize(self, self._executor.shutdown, cancel_futures=True)
+        return self._executor
+
+    def _evaluate_many(self, vectors: List[np.ndarray], fit) -> List[float]:
+        keys = [(fit['data_key'], tuple(float(x) for x in vector)) for vector in vectors]
+        missing = list(dict.fromkeys(key for key in keys if key not in self._memo))
+
+        if missing:
+            with span('evaluate', candidates=len(missing)):
+                if self.workers == 1:
+                    model = self._local_model()
+                    errors = [
+                        _evaluate(model, np.asarray(key[1]), fit['times'], fit['species'],
+                                  fit['data'], self.metric)
+                        for key in missing]
+                else:
+                    tasks = [
+                        (np.asarray(key[1]), fit['times'], fit['species'], fit['data'], self.metric)
+                        for key in missing]
+                    chunksize = max(1, len(tasks) // (4 * self.workers))
+                    errors = list(self._pool().map(_evaluate_in_worker, tasks, chunksize=chunksize))
+            self._memo.update(zip(missing, errors))
+
+        history = fit['history']
+        fresh = set(missing)
+        results = []
+        for key in keys:
+            error = self._memo[key]
+            for pid, value in zip(self.parameter_ids, key[1]):
+                history[pid].append(value)
+            history['error'].append(error)
+            history['cached'].append(0.0 if key in fresh else 1.0)
+            fresh.discard(key)
+            results.append(error)
+        return results
+
+    def _simulate(self, vector, times, species) -> np.ndarray:
+        if self.workers == 1:
+            return self._local_model().simulate(vector, times, species)
+        return self._pool().submit(_simulate_in_worker, (vector, times, species)).result()
+
+    # ------------------------------------------------
+    # fitting
+    # ------------------------------------------------
+    def _read_data(self, data):
+        times = np.asarray(data.get('time') or [], dtype=float)
+        measured = data.get('species_concentrations') or {}
+        unknown = set(measured) - set(self.model_index.species_ids)
+        if unknown:
+            raise ValueError(f"Data for unknown species: {sorted(unknown)}")
+        species = [sid for sid in self.model_index.species_ids if sid in measured]
+        values = np.asarray([measured[sid] for sid in species], dtype=float)
+        if values.shape != (len(species), times.size):
+            raise ValueError(
+                f"Data has {times.size} time points but species trajectories of shape {values.shape}")
+        if times.size and np.any(np.diff(times) <= 0):
+            raise ValueError("Data time points must be increasing")
+        return times, species, values
+
+    def _optimize(self, fit):
+        from scipy.optimize import differential_evolution, minimize
+
+        def objective(vector):
+            return self._evaluate_many([vector], fit)[0]
+
+        if self.method == 'differential_evolution':
+            # a whole generation is evaluated in one round
+            solution = differential_evolution(
+                objective,
+                self.bounds,
+                maxiter=int(self.config.get('max_iterations', 50)),
+                popsize=int(self.config.get('population', 15)),
+                seed=int(self.config.get('seed', 0)),
+                x0=self.initial,
+                polish=False,
+                updating='deferred',
+                workers=lambda _, vectors: self._evaluate_many(list(vectors), fit))
+        else:
+            solution = minimize(
+                objective,
+                self.initial,
+                method='Nelder-Mead',
+                bounds=self.bounds,
+                options={'maxiter': int(self.config.get('max_iterations', 50))})
+        return solution.x
+
+    @traced('update')
+    def update(self, inputs):
+        times, species, data = self._read_data(inputs.get('data') or {})
+        if not species or times.size == 0:
+            return {}
+
+        data_key = hashlib.sha256()
+        data_key.update(' '.join(species).encode('utf-8'))
+        data_key.update(times.tobytes())
+        data_key.update(data.tobytes())
+        fit = {
+            'data_key': data_key.hexdigest(),
+            'times': times,
+            'species': species,
+            'data': data,
+            'history': {**{pid: [] for pid in self.parameter_ids}, 'error': [], 'cached': []},
+        }
+        with span('optimize', method=self.method):
+            best = self._optimize(fit)
+
+        # the optimizer's point is always among the evaluated ones
+        error = self._evaluate_many([best], fit)[0]
+        with span('best_fit'):
+            simulated = self._simulate(best, times, species)
+
+        return {
+            'parameters': {pid: float(value) for pid, value in zip(self.parameter_ids, best)},
+            'error': error,
+            'result': {
+                'time': times.tolist(),
+                'species_concentrations': {
+                    sid: simulated[i].tolist() for i, sid in enumerate(species)},
+            },
+            'history': fit['history'],
+        }
+
+
+def run_fit(core):
+    # synthetic data from the repressilator at known parameters
+    truth = {'ps_a': 0.5, 'tau_mRNA': 2.0}
+    model = TelluriumFitModel(
+        resolve_model_source('models/BIOMD0000000012_url.xml'), list(truth), TELLURIUM_DEFAULTS)
+    times = np.linspace(0.0, 100.0, 51)
+    species = ['PX', 'PY', 'PZ']
+    values = model.simulate(list(truth.values()), times, species)
+    data = {
+        'time': times.tolist(),
+        'species_concentrations': {sid: values[i].tolist() for i, sid in enumerate(species)},
+    }
+
+    step = ParameterFitStep({
+        'model_source': 'models/BIOMD0000000012_url.xml',
+        'parameters': {
+            'ps_a': {'lower': 0.1, 'upper': 1.0},
+            'tau_mRNA': {'lower': 0.5, 'upper': 5.0},
+        },
+        'metric': 'range_mse',
+        'max_iterations': 20,
+        'population': 8,
+        'workers': 4,
+    }, core=core)
+
+    fit = step.update({'data': data})
+    print(f"True parameters: {truth}")
+    print(f"Best fit: {fit['parameters']} (error {fit['error']:.3g})")
+    print(f"Evaluations: {len(fit['history']['error'])}, cached: {int(sum(fit['history']['cached']))}")
+
+
+if __name__ == '__main__':
+    from biocompose import create_core
+    # workers import this module as biocompose.processes.fitting
+    from biocompose.processes.fitting import run_fit
+
+    run_fit(create_core())
@@ -0,0 +1,278 @@
+'''
+Integrator selection and per-model auto-tuning for the Tellurium and COPASI
+time course steps.
+
+``SOLVER_SCHEMA`` adds ``integrator``, ``rtol``, ``atol`` and ``max_steps``
+to a step's config. A tolerance or step limit of 0 means the engine
+default.
+
+    tellurium  cvode (BDF, stiff), cvode_adams (non-stiff), rk45, rk4, euler
+    copasi     lsoda, radau5
+
+With ``integrator: auto`` the first run of a model benchmarks every
+candidate integrator and tolerance over the time horizon it is run for:
+a step's ``time``, or for ``CopasiUTCProcess`` the interval passed to
+``update``, tuned again whenever that interval changes. Each
+candidate is checked against a tight tolerance reference solution. The
+fastest candidate whose error stays under ``tune_tolerance`` is kept. The
+error is the largest absolute deviation relative to each species' range.
+Decisions are stored per model sha256 in ``<cache>/solvers/<sha256>.json``,
+keyed by engine version, time horizon, number of points and target. Later
+runs reuse the choice without benchmarking.
+'''
+
+import json
+import os
+import time
+from typing import Dict, Any, Callable, List
+
+import numpy as np
+
+from biocompose.processes.model_source import get_model_cache
+
+
+SOLVER_SCHEMA = {
+    'integrator': {'_type': 'string', '_default': 'default'},
+    'rtol': {'_type': 'float', '_default': 0.0},
+    'atol': {'_type': 'float', '_default': 0.0},
+    'max_steps': {'_type': 'integer', '_default': 0},
+    'tune_tolerance': {'_type': 'float', '_default': 1e-4},
+}
+
+TELLURIUM_DEFAULTS = {'integrator': 'cvode', 'rtol': 1e-6, 'atol': 1e-12, 'max_steps': 20000}
+COPASI_DEFAULTS = {'integrator': 'lsoda', 'rtol': 1e-6, 'atol': 1e-12, 'max_steps': 100000}
+
+TELLURIUM_INTEGRATORS = ('cvode', 'cvode_adams', 'rk45', 'rk4', 'euler')
+COPASI_INTEGRATORS = {'lsoda': 'deterministic', 'radau5': 'radau5'}
+
+TUNE_RTOLS = (1e-4, 1e-6, 1e-8)
+REFERENCE_RTOL = 1e-10
+BENCHMARK_REPEATS = 3
+
+TUNING_VERSION = 1
+
+
+def solver_settings(config: Dict[str, Any], defaults: Dict[str, Any], integrators) -> Dict[str, Any]:
+    """Explicit solver settings from a config, engine defaults filled in."""
+    integrator = config.get('integrator') or 'default'
+    if integrator == 'default':
+        integrator = defaults['integrator']
+    if integrator not in integrators:
+        raise ValueError(
+            f"Unknown integrator {integrator!r}, expected 'default', 'auto' "
+            f"or one of {tuple(integrators)}")
+    return {
+        'integrator': integrator,
+        'rtol': float(config.get('rtol') or defaults['rtol']),
+        'atol': float(config.get('atol') or defaults['atol']),
+        'max_steps': int(config.get('max_steps') or defaults['max_steps']),
+    }
+
+
+# ----------------------------------------------------------------------
+# engine adapters
+# ----------------------------------------------------------------------
+
+def apply_tellurium_solver(rr, settings: Dict[str, Any]):
+    integrator = settings['integrator']
+    rr.setIntegrator('cvode' if integrator.startswith('cvode') else integrator)
+    if integrator.startswith('cvode'):
+        rr.integrator.setValue('stiff', integrator == 'cvode')
+        rr.integrator.setValue('relative_tolerance', settings['rtol'])
+        rr.integrator.setValue('absolute_tolerance', settings['atol'])
+        rr.integrator.setValue('maximum_num_steps', settings['max_steps'])
+    elif integrator == 'rk45':
+        rr.integrator.setValue('epsilon', settings['rtol'])
+
+
+def copasi_solver_kwargs(settings: Dict[str, Any]) -> Dict[str, Any]:
+    """Keyword arguments for basico's ``run_time_course*`` functions."""
+    return {
+        'method': COPASI_INTEGRATORS[settings['integrator']],
+        'r_tol': settings['rtol'],
+        'a_tol': settings['atol'],
+        'max_steps': settings['max_steps'],
+    }
+
+
+# ----------------------------------------------------------------------
+# benchmarking
+# ----------------------------------------------------------------------
+
+def candidate_settings(integrators, defaults) -> List[Dict[str, Any]]:
+    candidates = []
+    for integrator in integrators:
+        if integrator in ('rk4', 'euler'):
+            # fixed step on the output grid, no tolerance to vary
+            candidates.append({**defaults, 'integrator': integrator})
+            continue
+        for rtol in TUNE_RTOLS:
+            candidates.append({
+                'integrator': integrator,
+                'rtol': rtol,
+                'atol': rtol * 1e-6,
+                'max_steps': defaults['max_steps']})
+    return candidates
+
+
+def trajectory_error(values: np.ndarray, reference: np.ndarray) -> float:
+    """Largest deviation from ``reference`` relative to each species' range."""
+    if values.shape != reference.shape or not np.all(np.isfinite(values)):
+        return float('inf')
+    scale = np.ptp(reference, axis=0)
+    scale = np.where(scale > 0, scale, np.maximum(np.abs(reference).max(axis=0), 1.0))
+    return float(np.max(np.abs(values - reference) / scale))
+
+
+def benchmark(run: Callable[[Dict[str, Any]], np.ndarray],
+              candidates: List[Dict[str, Any]],
+              reference_settings: Dict[str, Any],
+              tolerance: float) -> Dict[str, Any]:
+    """
+    Time every candidate and pick the fastest within ``tolerance``.
+
+    run: simulates the benchmark horizon from the initial state with the
+        given settings and returns the (time x species) trajectory
+    """
+    reference = run(reference_settings)
+
+    trials = []
+    for settings in candidates:
+        try:
+            seconds = float('inf')
+            for _ in range(BENCHMARK_REPEATS):
+                start = time.perf_counter()
+                values = run(settings)
+                seconds = min(seconds, time.perf_counter() - start)
+            error = trajectory_error(values, reference)
+        except Exception as failure:
+            trials.append({**settings, 'seconds': None, 'error': None, 'failed': str(failure)})
+            continue
+        trials.append({**settings, 'seconds': seconds, 'error': error})
+
+    accepted = [
+        trial for trial in trials
+        if trial.get('seconds') is not None and trial['error'] <= tolerance]
+    if accepted:
+        best = min(accepted, key=lambda trial: trial['seconds'])
+    else:
+        best = {**reference_settings, 'seconds': None, 'error': 0.0}
+
+    return {
+        'settings': {key: best[key] for key in ('integrator', 'rtol', 'atol', 'max_steps')},
+        'seconds': best['seconds'],
+        'error': best['error'],
+        'tolerance': tolerance,
+        'trials': trials,
+    }
+
+
+# ----------------------------------------------------------------------
+# decision cache
+# ----------------------------------------------------------------------
+
+_decisions: Dict[str, Dict[str, Any]] = {}
+
+
+def _decision_path(sha256: str):
+    return get_model_cache().cache_dir.parent / 'solvers' / f'{sha256}.json'
+
+
+def _read_decisions(sha256: str) -> Dict[str, Any]:
+    try:
+        with open(_decision_path(sha256)) as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return {}
+    if data.get('version') != TUNING_VERSION:
+        return {}
+    return data.get('decisions', {})
+
+
+def _write_decision(sha256: str, key: str, decision: Dict[str, Any]):
+    path = _decision_path(sha256)
+    decisions = _read_decisions(sha256)
+    decisions[key] = decision
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as handle:
+            json.dump({'version': TUNING_VERSION, 'decisions': decisions}, handle, indent=1)
+        os.replace(tmp_path, path)
+    except OSError:
+        # the decision is still kept in memory for this run
+        pass
+
+
+def tuned_settings(engine: str, engine_version: str, sha256: str,
+                   horizon: float, n_points: int, tolerance: float,
+                   tune: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The cached decision for this model and horizon, running ``tune`` (which
+    returns a ``benchmark`` result) on first use.
+    """
+    key = f'{engine}|{engine_version}|{horizon!r}|{n_points}|{tolerance!r}'
+    memory_key = f'{sha256}|{key}'
+
+    decision = _decisions.get(memory_key)
+    if decision is None:
+        decision = _read_decisions(sha256).get(key)
+    if decision is None:
+        decision = tune()
+        _write_decision(sha256, key, decision)
+
+    _decisions[memory_key] = decision
+    return decision['settings']
+
+
+def tune_tellurium(rr, sha256: str, horizon: float, n_points: int,
+                   selections, tolerance: float) -> Dict[str, Any]:
+    import roadrunner
+
+    def run(settings):
+        rr.reset()
+        apply_tellurium_solver(rr, settings)
+        return np.asarray(rr.simulate(0, horizon, n_points, selections))[:, 1:]
+
+    def tune():
+        try:
+            return benchmark(
+                run,
+                candidate_settings(TELLURIUM_INTEGRATORS, TELLURIUM_DEFAULTS),
+                {**TELLURIUM_DEFAULTS, 'rtol': REFERENCE_RTOL, 'atol': REFERENCE_RTOL * 1e-4},
+                tolerance)
+        finally:
+            rr.reset()
+
+    return tuned_settings(
+        'tellurium', roadrunner.__version__, sha256,
+        horizon, n_points, tolerance, tune)
+
+
+def tune_copasi(dm, sha256: str, horizon: float, n_points: int,
+                selections, tolerance: float) -> Dict[str, Any]:
+    import COPASI
+    from basico import run_time_course_with_output
+
+    def run(settings):
+        tc = run_time_course_with_output(
+            selections,
+            start_time=0.0,
+            duration=horizon,
+            intervals=n_points - 1,
+            update_model=False,
+            use_initial_values=True,
+            model=dm,
+            **copasi_solver_kwargs(settings))
+        return tc.to_numpy()[:, 1:]
+
+    def tune():
+        return benchmark(
+            run,
+            candidate_settings(COPASI_INTEGRATORS, COPASI_DEFAULTS),
+            {**COPASI_DEFAULTS, 'rtol': REFERENCE_RTOL, 'atol': REFERENCE_RTOL * 1e-4},
+            tolerance)
+
+    return tuned_settings(
+        'copasi', COPASI.CVersion.VERSION.getVersion(), sha256,
+        horizon, n_points, tolerance, tune)
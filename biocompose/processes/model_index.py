@@ -0,0 +1,225 @@
+'''
+Per-model metadata index shared by all engines.
+
+The index records everything the steps need to know about a model's
+identifiers: SBML species ids in a stable slot order, their COPASI names
+and display names, reaction ids and names and compartment sizes. It is
+keyed by the sha256 of the model file, built once and persisted next to
+the model as ``<model>.index.json`` so later runs, and every other engine,
+can skip the metadata queries entirely.
+
+The slot order is the order of the species (and reactions) in the SBML
+document, read with libsbml, so it does not depend on which engine built
+the index first. The Tellurium and NumPy engines never load the model into
+COPASI: without a datamodel the SBML ids and names stand in for the COPASI
+names. The first time a COPASI engine asks for such an index, the names
+are filled in from its datamodel and the slot order is kept.
+'''
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from biocompose.processes.model_source import hash_file, get_model_cache
+
+
+INDEX_VERSION = 3
+
+
+class ModelIndex:
+    """Identifier metadata for one model file, in slot order."""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.sha256 = data['sha256']
+        self.species_ids = list(data['species_ids'])
+        self.sbml_to_name = dict(data['sbml_to_name'])
+        self.sbml_to_display_name = dict(data['sbml_to_display_name'])
+        self.fixed_species = list(data.get('fixed_species', []))
+        self.reaction_ids = list(data['reaction_ids'])
+        self.reaction_names = list(data['reaction_names'])
+        self.compartments = dict(data.get('compartments', {}))
+        self.source = data.get('source', 'sbml')
+
+        self.species_slots = {sid: i for i, sid in enumerate(self.species_ids)}
+        self.reaction_slots = {rid: i for i, rid in enumerate(self.reaction_ids)}
+
+        fixed = set(self.fixed_species)
+        self.floating_species_ids = [
+            sid for sid in self.species_ids if sid not in fixed]
+
+    def native_order(self, native_ids, ids):
+        """
+        Positions of ``ids`` within an engine's native id ordering, so native
+        arrays can be reordered into slot order with a single take.
+        """
+        native = {nid: i for i, nid in enumerate(native_ids)}
+        return [native[i] for i in ids]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': INDEX_VERSION,
+            'sha256': self.sha256,
+            'species_ids': self.species_ids,
+            'sbml_to_name': self.sbml_to_name,
+            'sbml_to_display_name': self.sbml_to_display_name,
+            'fixed_species': self.fixed_species,
+            'reaction_ids': self.reaction_ids,
+            'reaction_names': self.reaction_names,
+            'compartments': self.compartments,
+            'source': self.source,
+        }
+
+
+def build_sbml_index(model_path, document=None, sha256: Optional[str] = None) -> ModelIndex:
+    """
+    Read the model's identifiers from its SBML document, in document order.
+    The SBML names (or ids) stand in for the COPASI names.
+
+    document: an already parsed libsbml document for ``model_path``
+    """
+    import libsbml
+
+    if document is None:
+        document = libsbml.readSBMLFromFile(str(model_path))
+    model = document.getModel()
+    if model is None:
+        raise RuntimeError(f"Could not read model to index: {model_path!r}")
+
+    species = list(model.getListOfSpecies())
+    reactions = list(model.getListOfReactions())
+    species_ids = [sp.getId() for sp in species]
+
+    return ModelIndex({
+        'sha256': sha256 or hash_file(model_path),
+        'species_ids': species_ids,
+        'sbml_to_name': {sp.getId(): sp.getName() or sp.getId() for sp in species},
+        'sbml_to_display_name': {sp.getId(): sp.getName() or sp.getId() for sp in species},
+        'fixed_species': [
+            sp.getId() for sp in species
+            if sp.getBoundaryCondition() or sp.getConstant()],
+        'reaction_ids': [reaction.getId() for reaction in reactions],
+        'reaction_names': [reaction.getName() or reaction.getId() for reaction in reactions],
+        'compartments': {
+            compartment.getId(): float(compartment.getSize()) if compartment.isSetSize() else 1.0
+            for compartment in model.getListOfCompartments()
+        },
+        'source': 'sbml',
+    })
+
+
+def build_model_index(model_path, dm=None, sha256: Optional[str] = None,
+                      base: Optional[ModelIndex] = None) -> ModelIndex:
+    """
+    Fill in the COPASI names of the model's identifiers from a datamodel.
+    Slot order, fixed species and compartments come from ``base``.
+
+    dm: an already loaded datamodel for ``model_path``, loaded here if None
+    base: the index to add names to, built from the SBML if None
+    """
+    from basico import load_model, get_species, get_reactions
+
+    if dm is None:
+        dm = load_model(str(model_path))
+        if dm is None:
+            raise RuntimeError(f"Could not load model to index: {model_path!r}")
+    if base is None:
+        base = build_sbml_index(model_path, sha256=sha256)
+
+    spec_df = get_species(model=dm)
+    rxn_df = get_reactions(model=dm)
+
+    sbml_to_name = {
+        spec_df.loc[name, 'sbml_id']: name
+        for name in spec_df.index
+    }
+    sbml_to_display_name = {
+        spec_df.loc[name, 'sbml_id']: spec_df.loc[name, 'display_name']
+        for name in spec_df.index
+    }
+    reaction_names = {}
+    if rxn_df is not None:
+        reaction_names = {
+            rxn_df.loc[name, 'sbml_id']: name
+            for name in rxn_df.index
+        }
+
+    data = base.to_dict()
+    data.update({
+        'sha256': sha256 or base.sha256,
+        'sbml_to_name': {**base.sbml_to_name, **sbml_to_name},
+        'sbml_to_display_name': {**base.sbml_to_display_name, **sbml_to_display_name},
+        'reaction_names': [
+            reaction_names.get(rid, name)
+            for rid, name in zip(base.reaction_ids, base.reaction_names)],
+        'source': 'copasi',
+    })
+    return ModelIndex(data)
+
+
+_indexes: Dict[str, ModelIndex] = {}
+
+
+def _index_paths(model_path: Path, sha256: str):
+    """Sidecar next to the model first, then the shared cache directory."""
+    return [
+        model_path.with_name(model_path.name + '.index.json'),
+        get_model_cache().cache_dir.parent / 'indexes' / f'{sha256}.json',
+    ]
+
+
+def _read_index(path: Path, sha256: str) -> Optional[ModelIndex]:
+    try:
+        with open(path) as handle:
+            data = json.load(handle)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if data.get('version') != INDEX_VERSION or data.get('sha256') != sha256:
+        return None
+    return ModelIndex(data)
+
+
+def _write_index(index: ModelIndex, paths):
+    for path in paths:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+            with open(tmp_path, 'w') as handle:
+                json.dump(index.to_dict(), handle, indent=1)
+            os.replace(tmp_path, path)
+            return
+        except OSError:
+            # model directory may be read-only, fall back to the cache
+            continue
+
+
+def get_model_index(model_path, dm=None, document=None) -> ModelIndex:
+    """
+    Return the index for a local model file, building it on first use.
+
+    Lookups go memory -> persisted index -> ``build_sbml_index``. With a
+    COPASI datamodel ``dm``, an index without COPASI names gets them from
+    ``build_model_index``, keeping its slot order.
+
+    document: the model's already parsed libsbml document, if any
+    """
+    model_path = Path(model_path)
+    sha256 = hash_file(model_path)
+    paths = _index_paths(model_path, sha256)
+
+    index = _indexes.get(sha256)
+    if index is None:
+        for path in paths:
+            index = _read_index(path, sha256)
+            if index is not None:
+                break
+
+    if index is None or (dm is not None and index.source != 'copasi'):
+        if index is None:
+            index = build_sbml_index(model_path, document=document, sha256=sha256)
+        if dm is not None:
+            index = build_model_index(model_path, dm=dm, sha256=sha256, base=index)
+        _write_index(index, paths)
+
+    _indexes[sha256] = index
+    return index
@@ -0,0 +1,325 @@
+'''
+Resolution of ``model_source`` config values to local model files.
+
+Local paths are resolved relative to the biocompose package root. Remote
+``http://``/``https://`` sources are downloaded once into a content-addressed
+cache that is shared by every engine (Tellurium, COPASI, ...), so the same
+URL referenced by several steps of a document is only fetched once.
+
+Cache behaviour can be configured through environment variables:
+
+    BIOCOMPOSE_CACHE_DIR        cache location (default: ~/.cache/biocompose/models)
+    BIOCOMPOSE_CACHE_MAX_BYTES  size limit, least recently used entries are evicted
+    BIOCOMPOSE_CACHE_MAX_AGE    seconds before a cached url is revalidated (default: 300)
+    BIOCOMPOSE_OFFLINE          if set to 1/true, never touch the network
+'''
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, fall back to the thread lock
+    fcntl = None
+
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_CACHE_DIR = Path.home() / '.cache' / 'biocompose' / 'models'
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 300.0
+
+
+def is_remote(model_source: str) -> bool:
+    return model_source.startswith(('http://', 'https://'))
+
+
+def hash_file(path, chunk_size=1 << 20) -> str:
+    """Return the sha256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """Stable sha256 of a process config, used to validate checkpoints."""
+    encoded = json.dumps(config, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def check_snapshot(snapshot: Dict[str, Any], config: Dict[str, Any], model_sha256: str):
+    """Raise if a checkpoint snapshot was taken with another config or model file."""
+    if snapshot.get('config_hash') != config_hash(config):
+        raise ValueError(
+            "Checkpoint was taken with a different config for "
+            f"{config.get('model_source')!r}")
+    if snapshot.get('model_sha256') != model_sha256:
+        raise ValueError(
+            "Checkpoint was taken with a different model file for "
+            f"{config.get('model_source')!r}")
+
+
+def _env_flag(name):
+    return os.environ.get(name, '').strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+class ModelCache:
+    """
+    Content-addressed download cache for remote model files.
+
+    Downloaded bodies are stored under ``objects/<sha256><suffix>`` and an
+    ``index.json`` maps each url to its object together with the validators
+    (ETag / Last-Modified) needed for conditional revalidation.
+    """
+
+    def __init__(self,
+                 cache_dir=None,
+                 max_bytes: Optional[int] = None,
+                 max_age: Optional[float] = None,
+                 offline: Optional[bool] = None,
+                 timeout: float = 30.0):
+        self.cache_dir = Path(
+            cache_dir or os.environ.get('BIOCOMPOSE_CACHE_DIR') or DEFAULT_CACHE_DIR)
+        self.max_bytes = int(
+            max_bytes if max_bytes is not None
+            else os.environ.get('BIOCOMPOSE_CACHE_MAX_BYTES', DEFAULT_MAX_BYTES))
+        self.max_age = float(
+            max_age if max_age is not None
+            else os.environ.get('BIOCOMPOSE_CACHE_MAX_AGE', DEFAULT_MAX_AGE))
+        self.offline = _env_flag('BIOCOMPOSE_OFFLINE') if offline is None else offline
+        self.timeout = timeout
+
+        self.objects_dir = self.cache_dir / 'objects'
+        self.index_path = self.cache_dir / 'index.json'
+        self.lock_path = self.cache_dir / 'index.lock'
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------
+    # index bookkeeping
+    # ------------------------------------------------
+    @contextlib.contextmanager
+    def _locked(self):
+        """
+        Hold the index lock: a thread lock within this process and an
+        exclusive ``flock`` on ``index.lock`` across processes sharing the cache.
+        """
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.lock_path, 'a') as handle:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Dict[str, Any]:
+        try:
+            with open(self.index_path) as handle:
+                return json.load(handle)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self, index):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as handle:
+            json.dump(index, handle, indent=1)
+        os.replace(tmp_path, self.index_path)
+
+    def _object_path(self, entry) -> Path:
+        return self.objects_dir / f"{entry['sha256']}{entry.get('suffix', '')}"
+
+    def _touch(self, url: str, sha256: str, validated: bool = False) -> Optional[Path]:
+        """
+        Mark the cached object of ``url`` as used (and revalidated), returning
+        its path, or None if another process replaced or evicted it meanwhile.
+        """
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(url)
+            if entry is None or entry['sha256'] != sha256 or not self._object_path(entry).is_file():
+                return None
+            entry['used'] = time.time()
+            if validated:
+                entry['validated'] = entry['used']
+            self._write_index(index)
+            return self._object_path(entry)
+
+    # ------------------------------------------------
+    # fetching
+    # ------------------------------------------------
+    def fetch(self, url: str) -> Path:
+        """
+        Return a local path holding the current contents of ``url``.
+
+        The index lock is only held to read and update the index, never
+        while downloading, so other processes can use the cache meanwhile.
+        """
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(url)
+            cached = entry is not None and self._object_path(entry).is_file()
+            now = time.time()
+
+            if cached and (self.offline or now - entry.get('validated', 0.0) < self.max_age):
+                entry['used'] = now
+                self._write_index(index)
+                return self._object_path(entry)
+
+        if self.offline:
+            raise RuntimeError(
+                f"Model {url!r} is not in the cache at {self.cache_dir} "
+                "and BIOCOMPOSE_OFFLINE is set.")
+
+        request = urllib.request.Request(url)
+        if cached:
+            if entry.get('etag'):
+                request.add_header('If-None-Match', entry['etag'])
+            if entry.get('last_modified'):
+                request.add_header('If-Modified-Since', entry['last_modified'])
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                body = response.read()
+                headers = response.headers
+        except urllib.error.HTTPError as e:
+            if cached:
+                # on 304 the object is current, otherwise serve stale
+                # content rather than failing the whole run
+                path = self._touch(url, entry['sha256'], validated=e.code == 304)
+                if path is not None:
+                    return path
+                if e.code == 304:
+                    # evicted while revalidating, download it again
+                    return self.fetch(url)
+            raise RuntimeError(f"Could not download model {url!r}: {e}")
+        except (urllib.error.URLError, OSError) as e:
+            if cached:
+                path = self._touch(url, entry['sha256'])
+                if path is not None:
+                    return path
+            raise RuntimeError(f"Could not download model {url!r}: {e}")
+
+        now = time.time()
+        sha256 = hashlib.sha256(body).hexdigest()
+        entry = {
+            'sha256': sha256,
+            'suffix': Path(urllib.parse.urlparse(url).path).suffix,
+            'size': len(body),
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'validated': now,
+            'used': now,
+        }
+
+        with self._locked():
+            object_path = self._object_path(entry)
+            if not object_path.is_file():
+                self.objects_dir.mkdir(parents=True, exist_ok=True)
+                tmp_path = object_path.with_suffix(f'.{os.getpid()}.tmp')
+                with open(tmp_path, 'wb') as handle:
+                    handle.write(body)
+                os.replace(tmp_path, object_path)
+
+            # re-read: other processes may have updated the index meanwhile
+            index = self._read_index()
+            index[url] = entry
+            self._evict(index, keep=url)
+            self._write_index(index)
+            return object_path
+
+    def _evict(self, index, keep=None):
+        """Drop least recently used objects until the cache fits in max_bytes."""
+        objects = {}
+        for url, entry in index.items():
+            key = self._object_path(entry)
+            objects.setdefault(key, {'size': entry.get('size', 0), 'used': 0.0, 'urls': []})
+            objects[key]['used'] = max(objects[key]['used'], entry.get('used', 0.0))
+            objects[key]['urls'].append(url)
+
+        total = sum(item['size'] for item in objects.values())
+        keep_path = self._object_path(index[keep]) if keep in index else None
+
+        for path, item in sorted(objects.items(), key=lambda kv: kv[1]['used']):
+            if total <= self.max_bytes:
+                break
+            if path == keep_path:
+                continue
+            path.unlink(missing_ok=True)
+            for url in item['urls']:
+                index.pop(url, None)
+            total -= item['size']
+
+    def clear(self):
+        with self._locked():
+            for entry in self._read_index().values():
+                self._object_path(entry).unlink(missing_ok=True)
+            self._write_index({})
+
+
+_default_cache = None
+
+
+def get_model_cache() -> ModelCache:
+    """Return the process-wide cache configured from the environment."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ModelCache()
+    return _default_cache
+
+
+def resolve_model_source(model_source: str, cache: Optional[ModelCache] = None) -> str:
+    """
+    Turn a ``model_source`` config value into a path to a local file.
+
+    Remote urls go through the download cache, relative paths are resolved
+    against the biocompose package root.
+    """
+    if is_remote(model_source):
+        cache = cache or get_model_cache()
+        return str(cache.fetch(model_source))
+
+    model_path = Path(model_source)
+    if not model_path.is_absolute():
+        model_path = PROJECT_ROOT / model_path
+    return str(model_path)
+
+
+def run_cache_demo():
+    """Fetch the bundled model twice through a local http stand-in."""
+    import functools
+    import tempfile
+    from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(PROJECT_ROOT / 'models'))
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    url = f'http://127.0.0.1:{server.server_address[1]}/BIOMD0000000012_url.xml'
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ModelCache(cache_dir=cache_dir, max_age=0.0)
+        first = cache.fetch(url)
+        second = cache.fetch(url)  # revalidated with If-Modified-Since -> 304
+        print(f'First fetch: {first}')
+        print(f'Second fetch: {second}')
+        print(f'Index: {cache._read_index()}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    run_cache_demo()
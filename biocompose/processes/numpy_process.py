@@ -0,0 +1,674 @@
+'''
+Batched NumPy ODE engine.
+
+The supported SBML subset (reactions with arbitrary kinetic laws, function
+definitions, assignment rules and initial assignments on parameters and
+species initial values, constant compartments) is translated once into a
+single vectorized right-hand side over a (batch x species) array. A whole
+ensemble of parameter sets is then integrated in one ``solve_ivp`` call,
+instead of paying a model instance per sample.
+'''
+
+from typing import Dict, Any, List
+
+import numpy as np
+import libsbml
+from scipy.integrate import solve_ivp
+from scipy.sparse import block_diag
+
+from process_bigraph import Step, ProcessTypes
+
+from biocompose.processes.model_source import resolve_model_source, config_hash, check_snapshot
+from biocompose.processes.model_index import get_model_index
+from biocompose.precision import PRECISION_SCHEMA, check_precision, round_trip_columns, error_report
+from biocompose.trace import span, traced
+
+
+# libsbml's ASTNode.getType() enum does not survive importing basico and
+# tellurium in the same process (their SWIG runtimes clash), so nodes are
+# dispatched on their operator character and builtin name instead.
+
+TIME_URL = 'http://www.sbml.org/sbml/symbols/time'
+AVOGADRO_URL = 'http://www.sbml.org/sbml/symbols/avogadro'
+
+UNARY_FUNCTIONS = {
+    'abs': 'np.abs',
+    'exp': 'np.exp',
+    'ln': 'np.log',
+    'floor': 'np.floor',
+    'ceil': 'np.ceil',
+    'ceiling': 'np.ceil',
+    'sin': 'np.sin',
+    'cos': 'np.cos',
+    'tan': 'np.tan',
+    'sinh': 'np.sinh',
+    'cosh': 'np.cosh',
+    'tanh': 'np.tanh',
+    'arcsin': 'np.arcsin',
+    'arccos': 'np.arccos',
+    'arctan': 'np.arctan',
+    'not': 'np.logical_not',
+}
+
+RELATIONAL_OPERATORS = {
+    'eq': '==',
+    'neq': '!=',
+    'gt': '>',
+    'geq': '>=',
+    'lt': '<',
+    'leq': '<=',
+}
+
+REDUCING_FUNCTIONS = {
+    'and': 'np.logical_and',
+    'or': 'np.logical_or',
+    'xor': 'np.logical_xor',
+    'max': 'np.maximum',
+    'min': 'np.minimum',
+}
+
+CONSTANTS = {
+    'pi': 'np.pi',
+    'exponentiale': 'np.e',
+    'true': 'True',
+    'false': 'False',
+}
+
+
+def _unsupported(feature):
+    return ValueError(f"NumpyUTCStep: unsupported SBML feature: {feature}")
+
+
+def _definition_url(node) -> str:
+    return node.getDefinitionURLString() or ''
+
+
+def math_to_python(node, symbols: Dict[str, str]) -> str:
+    """
+    Translate a libsbml ASTNode into a vectorized Python/NumPy expression.
+
+    symbols: SBML id -> python name for every identifier the math may use
+    """
+    children = [
+        math_to_python(node.getChild(i), symbols)
+        for i in range(node.getNumChildren())
+    ]
+    name = node.getName()
+
+    if node.isInteger():
+        return repr(float(node.getInteger()))
+    if node.isNumber():
+        return repr(float(node.getReal()))
+    if node.isName():
+        url = _definition_url(node)
+        if url == TIME_URL:
+            return 't'
+        if url == AVOGADRO_URL:
+            return repr(6.02214076e23)
+        if name not in symbols:
+            raise _unsupported(f"unknown identifier {name!r}")
+        return symbols[name]
+    if node.isConstant():
+        if name not in CONSTANTS:
+            raise _unsupported(f"constant {name!r}")
+        return CONSTANTS[name]
+
+    if node.isOperator():
+        operator = node.getCharacter()
+        if operator == '+':
+            return '(' + ' + '.join(children or ['0.0']) + ')'
+        if operator == '-':
+            if len(children) == 1:
+                return f'(-{children[0]})'
+            return f'({children[0]} - {children[1]})'
+        if operator == '*':
+            return '(' + ' * '.join(children or ['1.0']) + ')'
+        if operator == '/':
+            return f'({children[0]} / {children[1]})'
+        if operator == '^':
+            return f'({children[0]} ** {children[1]})'
+        raise _unsupported(f"operator {operator!r}")
+
+    if node.isUserFunction():
+        if name not in symbols:
+            raise _unsupported(f"unknown function {name!r}")
+        return f'{symbols[name]}({", ".join(children)})'
+
+    if name == 'power':
+        return f'({children[0]} ** {children[1]})'
+    if name in ('sqrt', 'root'):
+        if len(children) == 1:
+            return f'np.sqrt({children[0]})'
+        return f'({children[1]} ** (1.0 / {children[0]}))'
+    if name in ('log', 'log10'):
+        if len(children) == 1:
+            return f'np.log10({children[0]})'
+        return f'(np.log({children[1]}) / np.log({children[0]}))'
+    if name == 'rem':
+        return f'np.fmod({children[0]}, {children[1]})'
+    if name == 'quotient':
+        return f'np.trunc({children[0]} / {children[1]})'
+
+    if name in UNARY_FUNCTIONS:
+        return f'{UNARY_FUNCTIONS[name]}({children[0]})'
+    if name in RELATIONAL_OPERATORS:
+        operator = RELATIONAL_OPERATORS[name]
+        pairs = [
+            f'({children[i]} {operator} {children[i + 1]})'
+            for i in range(len(children) - 1)
+        ]
+        return pairs[0] if len(pairs) == 1 else f'np.logical_and.reduce([{", ".join(pairs)}])'
+    if name in REDUCING_FUNCTIONS:
+        expression = children[0]
+        for child in children[1:]:
+            expression = f'{REDUCING_FUNCTIONS[name]}({expression}, {child})'
+        return expression
+
+    if node.isPiecewise():
+        otherwise = children[-1] if len(children) % 2 == 1 else 'np.nan'
+        expression = otherwise
+        for i in reversed(range(0, len(children) - 1, 2)):
+            expression = f'np.where({children[i + 1]}, {children[i]}, {expression})'
+        return expression
+
+    raise _unsupported(f"math element {name!r}")
+
+
+def _names_in(node) -> set:
+    """Identifiers (and 'time') a piece of math depends on."""
+    names = set()
+    if node is None:
+        return names
+    if node.isName():
+        url = _definition_url(node)
+        if url == TIME_URL:
+            names.add('time')
+        elif url != AVOGADRO_URL:
+            names.add(node.getName())
+    elif node.isUserFunction():
+        names.add(node.getName())
+    for i in range(node.getNumChildren()):
+        names |= _names_in(node.getChild(i))
+    return names
+
+
+def _topological_order(equations: Dict[str, Any]) -> List[str]:
+    """Order equations {target: math} so every target follows its inputs."""
+    dependencies = {
+        target: _names_in(math) & set(equations)
+        for target, math in equations.items()
+    }
+    ordered, done = [], set()
+    while len(ordered) < len(equations):
+        ready = [
+            target for target, deps in dependencies.items()
+            if target not in done and deps <= done]
+        if not ready:
+            raise _unsupported("cyclic assignment rules")
+        for target in ready:
+            ordered.append(target)
+            done.add(target)
+    return ordered
+
+
+class VectorizedModel:
+    """An SBML model compiled to a batched right-hand side."""
+
+    def __init__(self, model_path: str):
+        document = libsbml.readSBMLFromFile(str(model_path))
+        if document.getNumErrors(libsbml.LIBSBML_SEV_ERROR) > 0:
+            raise RuntimeError(
+                f"Could not read SBML model: {model_path}\n"
+                f"{document.getErrorLog().toString()}")
+        model = document.getModel()
+        if model is None:
+            raise RuntimeError(f"No model in SBML document: {model_path}")
+        # kept for the model index, which reads the species order from it
+        self.document = document
+
+        if model.getNumEvents():
+            raise _unsupported("events")
+        if model.getNumConstraints():
+            raise _unsupported("constraints")
+
+        self.symbols: Dict[str, str] = {}
+        self.values: Dict[str, float] = {}
+
+        # ---- compartments ----
+        self.compartments = {}
+        for compartment in model.getListOfCompartments():
+            cid = compartment.getId()
+            self.symbols[cid] = f'_c_{cid}'
+            size = compartment.getSize() if compartment.isSetSize() else 1.0
+            self.values[cid] = float(size)
+            self.compartments[cid] = float(size)
+
+        # ---- species (state is amounts, math sees concentrations) ----
+        self.species_ids = []
+        self.species_compartment = {}
+        self.only_substance = {}
+        self.fixed = set()
+        for species in model.getListOfSpecies():
+            sid = species.getId()
+            self.species_ids.append(sid)
+            self.symbols[sid] = f'_s_{sid}'
+            compartment = species.getCompartment()
+            self.species_compartment[sid] = compartment
+            self.only_substance[sid] = species.getHasOnlySubstanceUnits()
+            if species.getBoundaryCondition() or species.getConstant():
+                self.fixed.add(sid)
+
+            size = self.values[compartment]
+            if species.isSetInitialAmount():
+                amount = species.getInitialAmount()
+                value = amount if self.only_substance[sid] else amount / size
+            elif species.isSetInitialConcentration():
+                concentration = species.getInitialConcentration()
+                value = concentration * size if self.only_substance[sid] else concentration
+            else:
+                value = 0.0
+            self.values[sid] = float(value)
+        self.species_slots = {sid: i for i, sid in enumerate(self.species_ids)}
+
+        # ---- global parameters ----
+        for parameter in model.getListOfParameters():
+            pid = parameter.getId()
+            self.symbols[pid] = f'_p_{pid}'
+            self.values[pid] = float(parameter.getValue()) if parameter.isSetValue() else 0.0
+
+        # ---- function definitions ----
+        self.function_sources = []
+        for function in model.getListOfFunctionDefinitions():
+            fid = function.getId()
+            self.symbols[fid] = f'_f_{fid}'
+        for function in model.getListOfFunctionDefinitions():
+            fid = function.getId()
+            arguments = [function.getArgument(i).getName() for i in range(function.getNumArguments())]
+            local = dict(self.symbols)
+            local.update({arg: f'_b_{arg}' for arg in arguments})
+            body = math_to_python(function.getBody(), local)
+            self.function_sources.append(
+                f'def _f_{fid}({", ".join(local[arg] for arg in arguments)}):\n'
+                f'    return {body}\n')
+
+        # ---- rules ----
+        self.assignment_rules = {}
+        for rule in model.getListOfRules():
+            if not rule.isAssignment():
+                raise _unsupported("rate and algebraic rules")
+            variable = rule.getVariable()
+            if variable in self.species_slots or variable in self.compartments:
+                raise _unsupported(f"assignment rule on species/compartment {variable!r}")
+            self.assignment_rules[variable] = rule.getMath()
+
+        self.initial_assignments = {
+            assignment.getSymbol(): assignment.getMath()
+            for assignment in model.getListOfInitialAssignments()
+        }
+        for symbol in self.initial_assignments:
+            if symbol in self.compartments:
+                raise _unsupported(f"initial assignment on compartment {symbol!r}")
+
+        # ---- reactions ----
+        self.reactions = []
+        for reaction in model.getListOfReactions():
+            rid = reaction.getId()
+            law = reaction.getKineticLaw()
+            if law is None or law.getMath() is None:
+                raise _unsupported(f"reaction {rid!r} without kinetic law")
+            local = dict(self.symbols)
+            parameters = list(law.getListOfParameters())
+            if law.getLevel() > 2:
+                parameters += list(law.getListOfLocalParameters())
+            for parameter in parameters:
+                pid = parameter.getId()
+                name = f'_l_{rid}_{pid}'
+                local[pid] = name
+                self.values[name] = float(parameter.getValue())
+
+            stoichiometry = {}
+            for sign, references in ((-1.0, reaction.getListOfReactants()),
+                                     (1.0, reaction.getListOfProducts())):
+                for reference in references:
+                    if getattr(reference, 'isSetStoichiometryMath', lambda: False)():
+                        raise _unsupported(f"stoichiometry math in reaction {rid!r}")
+                    sid = reference.getSpecies()
+                    stoich = reference.getStoichiometry() if reference.isSetStoichiometry() else 1.0
+                    stoichiometry[sid] = stoichiometry.get(sid, 0.0) + sign * stoich
+
+            self.reactions.append({
+                'id': rid,
+                'rate': math_to_python(law.getMath(), local),
+                'stoichiometry': stoichiometry,
+            })
+
+        self._compile()
+
+    # ------------------------------------------------
+    # code generation
+    # ------------------------------------------------
+    def _compile(self):
+        """Generate the init and right-hand side functions."""
+        dynamic = set(self.species_ids) | {'time'}
+
+        # rules that never see species or time are constant, hoist them to init
+        depends_on_state = {}
+        for target in _topological_order(self.assignment_rules):
+            names = _names_in(self.assignment_rules[target])
+            depends_on_state[target] = bool(
+                names & dynamic
+                or any(depends_on_state.get(name) for name in names))
+        self.constant_rules = [t for t, dynamic_rule in depends_on_state.items() if not dynamic_rule]
+        self.dynamic_rules = [t for t, dynamic_rule in depends_on_state.items() if dynamic_rule]
+
+        lines = list(self.function_sources)
+
+        # init: initial assignments plus constant rules, in dependency order
+        equations = dict(self.initial_assignments)
+        equations.update({target: self.assignment_rules[target] for target in self.assignment_rules})
+        init_order = _topological_order(equations)
+        # _overrides: python name -> (rows that set it, their values); the
+        # other rows keep the evaluated initial value
+        lines.append('def _initial(t, _overrides):')
+        lines.append('    _values = {}')
+        for target in init_order:
+            name = self.symbols[target]
+            expression = math_to_python(equations[target], self.symbols)
+            lines.append(f'    {name} = {expression}')
+            lines.append(f'    if {name!r} in _overrides:')
+            lines.append(f'        {name} = np.where(*_overrides[{name!r}], {name})')
+            lines.append(f'    _values[{name!r}] = {name}')
+        lines.append('    return _values')
+
+        # rhs: d(amount)/dt for a (batch x species) state
+        n_species = len(self.species_ids)
+        lines.append('def _rhs(t, _y):')
+        lines.append(f'    _y = _y.reshape(-1, {n_species})')
+        for i, sid in enumerate(self.species_ids):
+            if sid in self.fixed:
+                continue
+            name = self.symbols[sid]
+            if self.only_substance[sid]:
+                lines.append(f'    {name} = _y[:, {i}]')
+            else:
+                compartment = self.symbols[self.species_compartment[sid]]
+                lines.append(f'    {name} = _y[:, {i}] / {compartment}')
+        for target in self.dynamic_rules:
+            expression = math_to_python(self.assignment_rules[target], self.symbols)
+            lines.append(f'    {self.symbols[target]} = {expression}')
+        lines.append('    _dy = np.zeros_like(_y)')
+        for j, reaction in enumerate(self.reactions):
+            lines.append(f'    _v{j} = {reaction["rate"]}')
+            for sid, stoich in reaction['stoichiometry'].items():
+                if sid in self.fixed:
+                    continue
+                lines.append(f'    _dy[:, {self.species_slots[sid]}] += {stoich!r} * _v{j}')
+        lines.append('    return _dy.ravel()')
+
+        self.source = '\n'.join(lines) + '\n'
+        self.code = compile(self.source, '<numpy-ode>', 'exec')
+
+    # ------------------------------------------------
+    # batch setup and integration
+    # ------------------------------------------------
+    def namespace(self, parameter_sets: List[Dict[str, float]]):
+        """
+        Build the evaluation namespace and initial amounts for a batch.
+
+        Returns (namespace, amounts) where amounts has shape (batch, species).
+        """
+        batch = max(len(parameter_sets), 1)
+        namespace = {'np': np}
+        for key, value in self.values.items():
+            namespace[self.symbols.get(key, key)] = value
+
+        overrides = {}
+        for key in set().union(*parameter_sets) if parameter_sets else ():
+            if key not in self.symbols or key in self.compartments:
+                raise ValueError(f"NumpyUTCStep: cannot vary {key!r}")
+            if key in self.assignment_rules:
+                raise ValueError(
+                    f"NumpyUTCStep: cannot vary {key!r}, it is set by an assignment rule")
+            rows = np.array([key in sample for sample in parameter_sets])
+            column = np.array(
+                [sample.get(key, self.values[key]) for sample in parameter_sets],
+                dtype=float)
+            namespace[self.symbols[key]] = column
+            if key in self.initial_assignments:
+                overrides[self.symbols[key]] = (rows, column)
+
+        exec(self.code, namespace)
+        namespace.update(namespace['_initial'](0.0, overrides))
+
+        amounts = np.empty((batch, len(self.species_ids)))
+        for i, sid in enumerate(self.species_ids):
+            value = namespace[self.symbols[sid]]
+            if not self.only_substance[sid]:
+                value = value * self.compartments[self.species_compartment[sid]]
+            amounts[:, i] = value
+
+        # fixed species stay constant, bake them into the namespace as concentrations
+        for sid in self.fixed:
+            column = amounts[:, self.species_slots[sid]]
+            if not self.only_substance[sid]:
+                column = column / self.compartments[self.species_compartment[sid]]
+            namespace[self.symbols[sid]] = column
+
+        return namespace, amounts
+
+    def compartment_size(self, sid) -> float:
+        return self.compartments[self.species_compartment[sid]]
+
+    def concentrations(self, amounts: np.ndarray) -> np.ndarray:
+        """Convert amounts (..., species) into concentrations."""
+        sizes = np.array([self.compartment_size(sid) for sid in self.species_ids])
+        return amounts / sizes
+
+    def integrate(self, namespace, amounts, time, n_points,
+                  method='LSODA', rtol=1e-6, atol=1e-12):
+        """
+        Integrate every row of ``amounts`` from 0 to ``time`` in one call.
+
+        Returns (time points, amounts with shape (batch, n_points, species)).
+        """
+        batch, n_species = amounts.shape
+        t_eval = np.linspace(0.0, time, n_points)
+
+        options = {}
+        # rows of the batch are independent, so the jacobian is block diagonal
+        if method == 'LSODA':
+            options = {'lband': n_species - 1, 'uband': n_species - 1}
+        elif method in ('BDF', 'Radau'):
+            options = {'jac_sparsity': block_diag([np.ones((n_species, n_species))] * batch)}
+
+        solution = solve_ivp(
+            namespace['_rhs'],
+            (0.0, time),
+            amounts.ravel(),
+            method=method,
+            t_eval=t_eval,
+            rtol=rtol,
+            atol=atol,
+            **options)
+        if not solution.success:
+            raise RuntimeError(f"NumpyUTCStep: integration failed: {solution.message}")
+
+        trajectories = solution.y.reshape(batch, n_species, -1).transpose(0, 2, 1)
+        return solution.t, trajectories
+
+
+class NumpyUTCStep(Step):
+    """
+    Uniform time course for a whole batch of parameter sets at once.
+
+    ``parameter_sets`` is a list of {parameter or species id: value}; each
+    entry becomes one row of the batch. Ids set by assignment rules cannot
+    be varied. Rows that do not set an initial assignment's target keep its
+    computed value. The first row is reported on the
+    ``result`` port so it can be compared against the other engines, every
+    row is reported on ``results`` keyed by its position.
+    """
+
+    config_schema = {
+        'model_source': 'string',
+        'time': 'float',
+        'n_points': 'integer',
+        'parameter_sets': 'list[map[float]]',
+        'method': {'_type': 'string', '_default': 'LSODA'},
+        'rtol': {'_type': 'float', '_default': 1e-6},
+        'atol': {'_type': 'float', '_default': 1e-12},
+        **PRECISION_SCHEMA,
+    }
+
+    @traced('initialize')
+    def initialize(self, config=None):
+        with span('resolve_model_source'):
+            model_source = resolve_model_source(self.config['model_source'])
+
+        with span('compile_model'):
+            self.model = VectorizedModel(model_source)
+        with span('model_index'):
+            self.model_index = get_model_index(model_source, document=self.model.document)
+
+        # report floating species in the shared slot order
+        self.species_ids = [
+            sid for sid in self.model_index.species_ids
+            if sid in self.model.species_slots and sid not in self.model.fixed]
+        self._species_columns = [self.model.species_slots[sid] for sid in self.species_ids]
+
+        self.parameter_sets = list(self.config.get('parameter_sets') or [])
+        self.namespace, self.amounts = self.model.namespace(self.parameter_sets)
+
+        self.time = float(self.config.get('time', 1.0))
+        self.n_points = int(self.config.get('n_points', 2))
+        if self.n_points < 2:
+            raise ValueError(
+                f"NumpyUTCStep: n_points must be >= 2, got {self.n_points}"
+            )
+
+        # precision the reported trajectories are rounded to; they stay
+        # float lists until saved or sent with biocompose.wire
+        self.precision = self.config.get('precision', 'float64')
+        check_precision(self.precision)
+        self.precision_report = None
+
+        # simulated time so far, recorded in checkpoints
+        self.current_time = 0.0
+
+    def initial_state(self) -> Dict[str, Any]:
+        concentrations = self.model.concentrations(self.amounts[0])
+        return {
+            'concentrations': {
+                sid: float(concentrations[self.model.species_slots[sid]])
+                for sid in self.species_ids
+            }
+        }
+
+    def inputs(self):
+        return {
+            'concentrations': 'map[float]',
+            'counts': 'map[float]',
+        }
+
+    def outputs(self):
+        outputs = {
+            'result': 'result',
+            'results': 'results',
+        }
+        if self.precision != 'float64':
+            outputs['precision_report'] = 'map[float]'
+        return outputs
+
+    @traced('update')
+    def update(self, inputs):
+        # incoming values apply to every row of the batch
+        incoming = inputs.get('counts') or inputs.get('concentrations') or {}
+        for sid, value in incoming.items():
+            if sid in self.model.species_slots:
+                slot = self.model.species_slots[sid]
+                self.amounts[:, slot] = float(value) * self.model.compartment_size(sid)
+
+        with span('integrate', batch=len(self.amounts)):
+            time, trajectories = self.model.integrate(
+                self.namespace,
+                self.amounts,
+                self.time,
+                self.n_points,
+                method=self.config.get('method', 'LSODA'),
+                rtol=self.config.get('rtol', 1e-6),
+                atol=self.config.get('atol', 1e-12))
+
+        # continue from the final state on the next update, like the other engines
+        self.amounts = trajectories[:, -1, :].copy()
+        self.current_time += self.time
+
+        concentrations = self.model.concentrations(trajectories)[:, :, self._species_columns]
+        if self.precision != 'float64':
+            # every (row, species) trajectory is downcast on its own
+            with span('downcast', precision=self.precision):
+                rows, points, species = concentrations.shape
+                columns = concentrations.transpose(1, 0, 2).reshape(points, rows * species)
+                reduced = round_trip_columns(columns, self.precision)
+                # time stays float64 so it remains strictly increasing
+                self.precision_report = error_report(columns, reduced)
+                concentrations = reduced.reshape(points, rows, species).transpose(1, 0, 2)
+
+        with span('build_lists'):
+            time_list = time.tolist()
+            results = {
+                str(row): {
+                    'time': time_list,
+                    'species_concentrations': {
+                        sid: concentrations[row, :, i].tolist()
+                        for i, sid in enumerate(self.species_ids)
+                    },
+                }
+                for row in range(concentrations.shape[0])
+            }
+
+        update = {
+            'result': results['0'],
+            'results': results,
+        }
+        if self.precision_report is not None:
+            update['precision_report'] = self.precision_report
+        return update
+
+    def checkpoint_state(self) -> Dict[str, Any]:
+        # every row of the batch, all species in model order
+        return {
+            'engine': 'numpy',
+            'config_hash': config_hash(self.config),
+            'model_sha256': self.model_index.sha256,
+            'time': self.current_time,
+            'species_ids': list(self.model.species_ids),
+            'state': self.amounts,
+        }
+
+    def restore_checkpoint(self, snapshot):
+        check_snapshot(snapshot, self.config, self.model_index.sha256)
+        if list(snapshot['species_ids']) != self.model.species_ids:
+            raise ValueError("Checkpoint species do not match the model")
+        self.amounts = np.array(snapshot['state'], dtype=float).reshape(self.amounts.shape)
+        self.current_time = float(snapshot['time'])
+
+
+def run_numpy_utc(core):
+    step = NumpyUTCStep({
+        'model_source': 'models/BIOMD0000000012_url.xml',  # represillator model
+        'time': 10.0,
+        'n_points': 5,
+        'parameter_sets': [{'ps_a': value} for value in np.linspace(0.3, 0.7, 4)],
+    }, core=core)
+
+    initial_state = step.initial_state()
+    print(f'Initial state: {initial_state}')
+
+    results = step.update(initial_state)
+    print(f'Results: {results["result"]}')
+
+
+if __name__ == '__main__':
+    core = ProcessTypes()
+    core.register_process('numpy_utc', NumpyUTCStep)
+    run_numpy_utc(core)
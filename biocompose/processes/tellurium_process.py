@@ -1,40 +1,76 @@
-import os
-from pathlib import Path
 from typing import Dict, Any
 
+import numpy as np
 from process_bigraph import Step, ProcessTypes
 import tellurium as te
 
+from biocompose.processes.model_source import resolve_model_source, config_hash, check_snapshot
+from biocompose.processes.model_index import get_model_index
+from biocompose.processes.decimation import DECIMATION_SCHEMA, decimate, select_observables
+from biocompose.processes.adaptive import (
+    ADAPTIVE_SCHEMA, EVENTS_TYPE, output_mode, event_columns, adaptive_rows)
+from biocompose.processes.integrators import (
+    SOLVER_SCHEMA, TELLURIUM_DEFAULTS, TELLURIUM_INTEGRATORS,
+    solver_settings, apply_tellurium_solver, tune_tellurium)
+from biocompose.precision import PRECISION_SCHEMA, check_precision, round_trip_columns, error_report
+from biocompose.trace import span, traced
+
 
 class TelluriumUTCStep(Step):
     config_schema = {
         "model_source": "string",
         "time": "float",
         "n_points": "integer",
+        **DECIMATION_SCHEMA,
+        **ADAPTIVE_SCHEMA,
+        **SOLVER_SCHEMA,
+        **PRECISION_SCHEMA,
     }
 
+    @traced("initialize")
     def initialize(self, config):
         model_source = self.config["model_source"]
 
-        # ----- Resolve path relative to sed2 root -----------
-        if not model_source.startswith(("http://", "https://")):
-            model_path = Path(model_source)
-            if not model_path.is_absolute():
-                project_root = Path(__file__).parent.parent
-                model_path = project_root / model_path
-            model_source = str(model_path)
+        # ----- Resolve path relative to sed2 root / download cache -----------
+        with span("resolve_model_source"):
+            model_source = resolve_model_source(model_source)
 
         # ----- Minimal Tellurium load (SBML) -----
         try:
-            self.rr = te.loadSBMLModel(model_source)
+            with span("load_model"):
+                self.rr = te.loadSBMLModel(model_source)
         except Exception as e:
             raise RuntimeError(f"Could not load SBML model: {model_source}\n{e}")
 
-        # ----- Cache IDs -----
-        self.species_ids = list(self.rr.getFloatingSpeciesIds())
-        self.reaction_ids = list(self.rr.getReactionIds())
+        # ----- Cache IDs (shared per-model index, slot order) -----
+        with span("model_index"):
+            self.model_index = get_model_index(model_source)
+        floating = set(self.rr.getFloatingSpeciesIds())
+        self.species_ids = [
+            sid for sid in self.model_index.floating_species_ids if sid in floating]
+        self.reaction_ids = self.model_index.reaction_ids
         self._species_index = {sid: i for i, sid in enumerate(self.species_ids)}
 
+        # RoadRunner array positions of each slot
+        self._species_order = self.model_index.native_order(
+            self.rr.getFloatingSpeciesIds(), self.species_ids)
+        self._reaction_order = self.model_index.native_order(
+            self.rr.getReactionIds(), self.reaction_ids)
+
+        # ----- output selection: the requested observables, then any other
+        #       species that events are detected on -----
+        self.observables = select_observables(self.config, self.species_ids)
+        self._columns = self.observables + event_columns(
+            self.config, self.species_ids, self.observables)
+        self._selections = ["time"] + [f"[{sid}]" for sid in self._columns]
+        self.events = None
+
+        # ----- precision the reported trajectories are rounded to; they
+        #       stay float lists until saved or sent with biocompose.wire -----
+        self.precision = self.config.get("precision", "float64")
+        check_precision(self.precision)
+        self.precision_report = None
+
         # ----- sim parameters -----
         self.time = float(self.config.get("time", 1.0))
         self.n_points = int(self.config.get("n_points", 2))
@@ -43,11 +79,38 @@ class TelluriumUTCStep(Step):
                 f"TelluriumUTCStep: n_points must be >= 2, got {self.n_points}"
             )
 
+        # ----- integrator: explicit, engine default, or tuned per model -----
+        if self.config.get("integrator") == "auto":
+            with span("tune_integrator"):
+                self.solver = tune_tellurium(
+                    self.rr,
+                    self.model_index.sha256,
+                    self.time,
+                    self.n_points,
+                    ["time"] + [f"[{sid}]" for sid in self.species_ids],
+                    float(self.config.get("tune_tolerance", 1e-4)))
+        else:
+            self.solver = solver_settings(
+                self.config, TELLURIUM_DEFAULTS, TELLURIUM_INTEGRATORS)
+        apply_tellurium_solver(self.rr, self.solver)
+
+        # ----- output times: uniform grid or the solver's own steps -----
+        self.output = output_mode(self.config)
+        if self.output != "grid":
+            if "variable_step_size" not in self.rr.integrator.getSettings():
+                raise ValueError(
+                    f"TelluriumUTCStep: output {self.output!r} needs a variable "
+                    f"step integrator, not {self.solver['integrator']!r}")
+            self.rr.integrator.setValue("variable_step_size", True)
+
+        # simulated time so far, recorded in checkpoints
+        self.current_time = 0.0
+
     # ------------------------------------------------
     # process-bigraph API
     # ------------------------------------------------
     def initial_state(self) -> Dict[str, Any]:
-        conc = self.rr.getFloatingSpeciesConcentrations()
+        conc = self.rr.getFloatingSpeciesConcentrations()[self._species_order]
         return {
             "species_concentrations": {
                 sid: float(conc[i]) for i, sid in enumerate(self.species_ids)
@@ -61,11 +124,17 @@ class TelluriumUTCStep(Step):
         }
 
     def outputs(self):
-        return {"result": "result"}
+        outputs = {"result": "result"}
+        if self.precision != "float64":
+            outputs["precision_report"] = "map[float]"
+        if self.config.get("events"):
+            outputs["events"] = EVENTS_TYPE
+        return outputs
 
     # ------------------------------------------------
     # update logic
     # ------------------------------------------------
+    @traced("update")
     def update(self, inputs):
         # 1) Choose source
         incoming = (
@@ -75,65 +144,89 @@ class TelluriumUTCStep(Step):
         )
 
         # 2) Update species concentrations using Tellurium's setValue
-        for sid, value in incoming.items():
-            if sid in self._species_index:
-                self.rr.setValue(sid, float(value))
-
-        # 3) Run simulation: from 0 -> self.time, n_points samples
-        tc = self.rr.simulate(0, self.time, self.n_points)
-        colnames = list(tc.colnames)
-
-        # Build a mapping from *normalized* column names to indices.
-        # This turns "[S1]" -> "S1", etc.
-        norm_to_index: Dict[str, int] = {
-            name.strip("[]"): i for i, name in enumerate(colnames)
-        }
+        with span("set_inputs"):
+            for sid, value in incoming.items():
+                if sid in self._species_index:
+                    self.rr.setValue(sid, float(value))
+
+        # 3) Run simulation: from 0 -> self.time, n_points samples or every
+        #    solver step, only materializing time and the selected columns
+        with span("integrate"):
+            if self.output == "grid":
+                tc = self.rr.simulate(0, self.time, self.n_points, self._selections)
+            else:
+                tc = self.rr.simulate(0, self.time, selections=self._selections)
+            values = np.asarray(tc)
+
+        # 4) Thin adaptive output, find events, decimate, all before
+        #    building any lists
+        n_observed = len(self.observables) + 1
+        with span("adaptive_output", output=self.output):
+            keep, brackets, self.events = adaptive_rows(
+                self.config, values, self._columns, len(self.observables))
+        with span("decimate"):
+            keep = keep[decimate(self.config, values[keep, 1:n_observed])]
+            # the rows around event crossings survive decimation
+            keep = np.union1d(keep, brackets).astype(int)
+
+        # 5) Species trajectories (the model is left at the final row, so
+        #    the next update continues from there)
+        kept = values[keep, :n_observed]
+        if self.precision != "float64":
+            # explicit downcast of the species, with the error against full
+            # precision; time stays float64 so it remains strictly increasing
+            with span("downcast", precision=self.precision):
+                full = kept[:, 1:]
+                reduced = round_trip_columns(full, self.precision)
+                self.precision_report = error_report(full, reduced)
+                kept = np.column_stack([kept[:, 0], reduced])
+
+        with span("build_lists"):
+            time = kept[:, 0].tolist()
+            species_update: Dict[str, list] = {
+                sid: kept[:, i + 1].tolist()
+                for i, sid in enumerate(self.observables)
+            }
 
-        # Time
-        if "time" not in norm_to_index:
-            raise RuntimeError(
-                f"'time' column not found in Tellurium result. Columns: {colnames}"
-            )
-        time_idx = norm_to_index["time"]
-        time = tc[:, time_idx].tolist()
-
-        # 4) Species trajectories
-        species_update: Dict[str, list] = {}
-        species_cols: Dict[str, int] = {}
-        for sid in self.species_ids:
-            idx = norm_to_index.get(sid)
-            if idx is not None:
-                species_cols[sid] = idx
-                species_update[sid] = tc[:, idx].tolist()
-
-        # 5) Reaction flux time series
-        flux_json = {rid: [] for rid in self.reaction_ids}
-
-        # For each time point, set state and query reaction rates
-        for row in range(tc.shape[0]):
-            for sid, idx in species_cols.items():
-                self.rr.setValue(sid, float(tc[row, idx]))
-
-            rates = self.rr.getReactionRates()
-            for j, rid in enumerate(self.reaction_ids):
-                flux_json[rid].append(float(rates[j]))
-
-        # 6) Restore last state (final row of the timecourse)
-        last_row = tc.shape[0] - 1
-        for sid, idx in species_cols.items():
-            self.rr.setValue(sid, float(tc[last_row, idx]))
-
-        # 7) Send update — structured for easy comparison / aggregation
+        # 6) Send update — structured for easy comparison / aggregation
         result = {
                 "time": time,
                 "species_concentrations": species_update,
-                # "fluxes": flux_json,
             }
+        self.current_time += self.time
+
+        update = {"result": result}
+        if self.precision_report is not None:
+            update["precision_report"] = self.precision_report
+        if self.events is not None:
+            update["events"] = self.events
+        return update
 
+    # ------------------------------------------------
+    # checkpointing
+    # ------------------------------------------------
+    def checkpoint_state(self) -> Dict[str, Any]:
+        # floating species amounts, in slot order
+        amounts = self.rr.model.getFloatingSpeciesAmounts()[self._species_order]
         return {
-            "result": result
+            "engine": "tellurium",
+            "config_hash": config_hash(self.config),
+            "model_sha256": self.model_index.sha256,
+            "time": self.current_time,
+            "species_ids": list(self.species_ids),
+            "state": amounts,
         }
 
+    def restore_checkpoint(self, snapshot):
+        check_snapshot(snapshot, self.config, self.model_index.sha256)
+
+        amounts = self.rr.model.getFloatingSpeciesAmounts()
+        for sid, value in zip(snapshot["species_ids"], snapshot["state"]):
+            if sid in self._species_index:
+                amounts[self._species_order[self._species_index[sid]]] = value
+        self.rr.model.setFloatingSpeciesAmounts(amounts)
+        self.current_time = float(snapshot["time"])
+
 
 class TelluriumSteadyStateStep(Step):
 
@@ -142,33 +235,41 @@ class TelluriumSteadyStateStep(Step):
         "time": "float",   # unused, kept for symmetry
     }
 
+    @traced("initialize")
     def initialize(self, config=None):
         model_source = self.config["model_source"]
 
         # ----- Resolve path ------
-        if not model_source.startswith(("http://", "https://")):
-            model_path = Path(model_source)
-            if not model_path.is_absolute():
-                project_root = Path(__file__).parent.parent
-                model_path = project_root / model_path
-            model_source = str(model_path)
+        with span("resolve_model_source"):
+            model_source = resolve_model_source(model_source)
 
         # ----- Load SBML via Tellurium -----
         try:
-            self.rr = te.loadSBMLModel(model_source)
+            with span("load_model"):
+                self.rr = te.loadSBMLModel(model_source)
         except Exception as e:
             raise RuntimeError(f"Could not load SBML model: {model_source}\n{e}")
 
-        # Cache species & reactions
-        self.species_ids = list(self.rr.getFloatingSpeciesIds())
-        self.reaction_ids = list(self.rr.getReactionIds())
+        # Cache species & reactions from the shared model index
+        with span("model_index"):
+            self.model_index = get_model_index(model_source)
+        floating = set(self.rr.getFloatingSpeciesIds())
+        self.species_ids = [
+            sid for sid in self.model_index.floating_species_ids if sid in floating]
+        self.reaction_ids = self.model_index.reaction_ids
         self._species_index = {sid: i for i, sid in enumerate(self.species_ids)}
 
+        # RoadRunner array positions of each slot
+        self._species_order = self.model_index.native_order(
+            self.rr.getFloatingSpeciesIds(), self.species_ids)
+        self._reaction_order = self.model_index.native_order(
+            self.rr.getReactionIds(), self.reaction_ids)
+
     # ------------------------------------------------
     # process-bigraph API
     # ------------------------------------------------
     def initial_state(self) -> Dict[str, Any]:
-        conc = self.rr.getFloatingSpeciesConcentrations()
+        conc = self.rr.getFloatingSpeciesConcentrations()[self._species_order]
         species_concs = {
             sid: float(conc[i])
             for i, sid in enumerate(self.species_ids)
@@ -189,6 +290,7 @@ class TelluriumSteadyStateStep(Step):
     # ------------------------------------------------
     # steady-state computation
     # ------------------------------------------------
+    @traced("update")
     def update(self, inputs):
         # 1) Prefer counts, fall back to concentrations
         spec_data = (
@@ -205,19 +307,20 @@ class TelluriumSteadyStateStep(Step):
         # 3) Run steady-state computation
         #    RoadRunner steadyState() modifies the internal state to a (near-)steady state.
         try:
-            self.rr.steadyState()
+            with span("steady_state"):
+                self.rr.steadyState()
         except Exception as e:
             raise RuntimeError(f"Tellurium steadyState() failed: {e}")
 
         # 4) Read back steady-state species concentrations
-        conc_ss = self.rr.getFloatingSpeciesConcentrations()
+        conc_ss = self.rr.getFloatingSpeciesConcentrations()[self._species_order]
         species_ss = {
             sid: float(conc_ss[i])
             for i, sid in enumerate(self.species_ids)
         }
 
         # 5) Read back steady-state reaction fluxes
-        rates_ss = self.rr.getReactionRates()
+        rates_ss = self.rr.getReactionRates()[self._reaction_order]
         flux_ss = {
             rid: float(rates_ss[i])
             for i, rid in enumerate(self.reaction_ids)
@@ -0,0 +1,410 @@
+'''
+Remote worker dispatch for steps and processes.
+
+An edge whose address uses the ``remote`` protocol is built on a worker
+instead of in the process that owns the Composite:
+
+    "tellurium_step": {
+        "_type": "step",
+        "address": "remote:TelluriumUTCStep",
+        ...}
+
+or, to name the workers explicitly,
+
+    "address": {
+        "protocol": "remote",
+        "data": {
+            "process": "TelluriumUTCStep",
+            "workers": ["http://node1:22222", "http://node2:22222"]}}
+
+Workers are ``biocompose.server`` instances. Each remote edge is placed on
+the least loaded worker when it is created, and it stays there. A worker's
+load counts the instances it reported with its last batch, so instances
+placed by other clients are taken into account.
+
+Calling ``invoke`` only queues the update. The Composite invokes every ready
+step before it asks for any result, so the first ``get()`` sends all queued
+commands as one ``/batch`` request per worker, to all workers at once.
+Results come back in the binary format from ``biocompose.wire``.
+
+Without explicit workers the default pool is used. It connects to the
+workers listed in ``BIOCOMPOSE_WORKERS`` (comma separated URLs). If that is
+unset, it starts ``BIOCOMPOSE_LOCAL_WORKERS`` (default 2) local stand-in
+servers, whose output goes to ``worker-<port>.log`` files in a temporary
+directory (``WorkerPool.log_paths``).
+'''
+
+import atexit
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import requests
+from process_bigraph import Step, Process
+
+from biocompose.wire import CONTENT_TYPE, JSON_CONTENT_TYPE, loads
+
+
+class Worker:
+    """
+    One worker server and its load: the instances this pool placed on it,
+    or the instances the worker last reported if it holds more (placed by
+    other clients), plus the queued commands, per CPU.
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip('/')
+        self.instances = 0
+        self.reported_instances = 0
+        self.cpus = 1
+        self.pending: List['RemoteCall'] = []
+
+    @property
+    def load(self) -> float:
+        return (max(self.instances, self.reported_instances) + len(self.pending)) / self.cpus
+
+    def report(self, load: Dict[str, Any]):
+        """Take in the load a worker reports from ``/load`` or with a batch."""
+        self.reported_instances = int(load.get('instances', 0))
+        self.cpus = int(load.get('cpus', 1)) or 1
+
+    def __repr__(self):
+        return f'Worker({self.url!r}, instances={self.instances})'
+
+
+class RemoteCall:
+    """A queued command whose result is fetched with the worker's next batch."""
+
+    def __init__(self, pool: 'WorkerPool', worker: Worker, command: Dict[str, Any]):
+        self.pool = pool
+        self.worker = worker
+        self.command = command
+        self.done = False
+        self.result = None
+        self.error = None
+
+    def get(self):
+        if not self.done:
+            self.pool.flush()
+        if self.error is not None:
+            raise RuntimeError(
+                f"{self.command['op']} failed on {self.worker.url}: {self.error}")
+        return self.result
+
+
+class WorkerPool:
+    """
+    A set of worker servers that remote edges are scheduled onto by load.
+
+    urls: base URLs of running ``biocompose.server`` workers
+    timeout: seconds to wait for a batch
+    """
+
+    def __init__(self, urls, timeout: float = 600.0):
+        if not urls:
+            raise ValueError("WorkerPool needs at least one worker url")
+        self.workers = [Worker(url) for url in urls]
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.lock = threading.Lock()
+        self.subprocesses: List[subprocess.Popen] = []
+        self.log_paths: List[Path] = []
+
+        for worker in self.workers:
+            worker.report(self._get(worker, '/load'))
+
+    @classmethod
+    def local(cls, n_workers: int = 2, startup_timeout: float = 60.0,
+              log_dir=None, **kwargs) -> 'WorkerPool':
+        """
+        Start ``n_workers`` stand-in worker servers on this machine.
+
+        log_dir: directory for each worker's ``worker-<port>.log`` (its
+            stdout and stderr), a new temporary directory if None
+        """
+        log_dir = Path(log_dir or tempfile.mkdtemp(prefix='biocompose-workers-'))
+        log_dir.mkdir(parents=True, exist_ok=True)
+        ports = [_free_port() for _ in range(n_workers)]
+        log_paths = [log_dir / f'worker-{port}.log' for port in ports]
+        servers = []
+        for port, log_path in zip(ports, log_paths):
+            with open(log_path, 'ab') as log:
+                servers.append(subprocess.Popen(
+                    [sys.executable, '-m', 'biocompose.server',
+                     '--host', '127.0.0.1', '--port', str(port)],
+                    stdout=log,
+                    stderr=subprocess.STDOUT))
+
+        urls = [f'http://127.0.0.1:{port}' for port in ports]
+        deadline = time.monotonic() + startup_timeout
+        for url, server in zip(urls, servers):
+            while True:
+                try:
+                    requests.get(f'{url}/load', timeout=1.0)
+                    break
+                except requests.ConnectionError:
+                    if server.poll() is not None or time.monotonic() > deadline:
+                        for started in servers:
+                            started.kill()
+                        log_path = log_paths[servers.index(server)]
+                        raise RuntimeError(
+                            f"Local worker at {url} did not start, see {log_path}:\n"
+                            f"{_tail(log_path)}")
+                    time.sleep(0.2)
+
+        pool = cls(urls, **kwargs)
+        pool.subprocesses = servers
+        pool.log_paths = log_paths
+        return pool
+
+    def _get(self, worker: Worker, path: str):
+        response = self.session.get(f'{worker.url}{path}', timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def least_loaded(self) -> Worker:
+        return min(self.workers, key=lambda worker: worker.load)
+
+    def submit(self, worker: Worker, command: Dict[str, Any]) -> RemoteCall:
+        call = RemoteCall(self, worker, command)
+        with self.lock:
+            worker.pending.append(call)
+        return call
+
+    def call(self, worker: Worker, command: Dict[str, Any]):
+        return self.submit(worker, command).get()
+
+    def _send_batch(self, worker: Worker, calls: List[RemoteCall]):
+        try:
+            response = self.session.post(
+                f'{worker.url}/batch',
+                json=[call.command for call in calls],
+                headers={'Accept': CONTENT_TYPE},
+                timeout=self.timeout)
+            response.raise_for_status()
+            content_type = response.headers.get('content-type', JSON_CONTENT_TYPE)
+            reply = loads(
+                response.content,
+                CONTENT_TYPE if content_type.startswith(CONTENT_TYPE) else JSON_CONTENT_TYPE,
+                as_numpy=False)
+        except requests.RequestException as error:
+            for call in calls:
+                call.error = str(error)
+                call.done = True
+            return
+
+        if reply.get('load'):
+            worker.report(reply['load'])
+        for call, outcome in zip(calls, reply['results']):
+            call.result = outcome.get('result')
+            call.error = outcome.get('error')
+            call.done = True
+
+    def flush(self):
+        """Send every queued command, one batch per worker, concurrently."""
+        with self.lock:
+            batches = [
+                (worker, worker.pending)
+                for worker in self.workers
+                if worker.pending]
+            for worker in self.workers:
+                worker.pending = []
+
+        if not batches:
+            return
+        if len(batches) == 1:
+            self._send_batch(*batches[0])
+            return
+        with ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            list(executor.map(lambda batch: self._send_batch(*batch), batches))
+
+    def close(self):
+        """Stop any local stand-in workers this pool started."""
+        for server in self.subprocesses:
+            server.terminate()
+        for server in self.subprocesses:
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        self.subprocesses = []
+
+
+def _tail(path, lines: int = 20) -> str:
+    try:
+        with open(path, errors='replace') as handle:
+            return ''.join(handle.readlines()[-lines:])
+    except OSError:
+        return ''
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+_default_pool: Optional[WorkerPool] = None
+
+
+def get_worker_pool() -> WorkerPool:
+    """The default pool, configured from the environment on first use."""
+    global _default_pool
+    if _default_pool is None:
+        urls = [
+            url.strip()
+            for url in os.environ.get('BIOCOMPOSE_WORKERS', '').split(',')
+            if url.strip()]
+        if urls:
+            _default_pool = WorkerPool(urls)
+        else:
+            _default_pool = WorkerPool.local(
+                int(os.environ.get('BIOCOMPOSE_LOCAL_WORKERS', '2')))
+            atexit.register(_default_pool.close)
+    return _default_pool
+
+
+_pools: Dict[tuple, WorkerPool] = {}
+
+
+def _pool_for(workers) -> WorkerPool:
+    if not workers:
+        return get_worker_pool()
+    key = tuple(workers)
+    if key not in _pools:
+        _pools[key] = WorkerPool(workers)
+    return _pools[key]
+
+
+class RemoteEdge:
+    """Shared behaviour of remote steps and processes."""
+
+    def _connect(self, pool: WorkerPool, process: str, config_schema):
+        self.pool = pool
+        self.process = process
+        self.config_schema = config_schema
+        self.worker = pool.least_loaded()
+        self.process_id = None
+
+    def initialize(self, config):
+        reply = self.pool.call(self.worker, {
+            'op': 'initialize',
+            'process': self.process,
+            'config': config})
+        self.process_id = reply['process_id']
+        self._inputs = reply['inputs']
+        self._outputs = reply['outputs']
+        self.worker.instances += 1
+
+    def inputs(self):
+        return self._inputs
+
+    def outputs(self):
+        return self._outputs
+
+    def invoke(self, state, interval=None):
+        return self.pool.submit(self.worker, {
+            'op': 'update',
+            'process_id': self.process_id,
+            'state': state,
+            'interval': interval})
+
+    def update(self, state, interval=None):
+        return self.invoke(state, interval).get()
+
+    def end(self):
+        if self.process_id is None:
+            return
+        self.pool.submit(self.worker, {
+            'op': 'end',
+            'process_id': self.process_id})
+        self.worker.instances -= 1
+        self.process_id = None
+
+
+class RemoteStep(RemoteEdge, Step):
+    def __init__(self, pool, process, config_schema, config=None, core=None):
+        self._connect(pool, process, config_schema)
+        super().__init__(config, core=core)
+
+
+class RemoteProcess(RemoteEdge, Process):
+    def __init__(self, pool, process, config_schema, config=None, core=None):
+        self._connect(pool, process, config_schema)
+        super().__init__(config, core=core)
+
+
+class RemoteProtocol:
+    """``remote:<process>`` or ``{'process': ..., 'workers': [...]}``."""
+
+    @staticmethod
+    def interface(core, data):
+        if isinstance(data, str):
+            data = {'process': data}
+        process = data['process']
+        pool = _pool_for(data.get('workers'))
+
+        # the worker's registry holds the config schema, the local registry
+        # (when it has the class) tells processes from steps
+        worker = pool.least_loaded()
+        config_schema = pool._get(worker, f'/process/{process}/config-schema')
+        if config_schema.get('process-not-found'):
+            raise RuntimeError(f"Process {process!r} is not registered on {worker.url}")
+
+        local_class = core.process_registry.access(process)
+        edge_class = RemoteStep
+        if local_class is not None and issubclass(local_class, Process):
+            edge_class = RemoteProcess
+
+        def instantiate(config, core=None):
+            return edge_class(pool, process, config_schema, config, core=core)
+
+        instantiate.config_schema = config_schema
+        return instantiate
+
+
+def register_protocols(core):
+    core.register_protocols({'remote': RemoteProtocol})
+    return core
+
+
+def run_remote_comparison(core, n_workers=2):
+    import json
+    from process_bigraph import Composite
+    from biocompose.processes.model_source import PROJECT_ROOT
+
+    pool = WorkerPool.local(n_workers)
+    workers = [worker.url for worker in pool.workers]
+    _pools[tuple(workers)] = pool
+
+    with open(PROJECT_ROOT / 'documents' / 'copasi_tellurium_comparison.json') as handle:
+        document = json.load(handle)
+    for key in ('tellurium_step', 'copasi_step'):
+        process = document['state'][key]['address'].split(':', 1)[1]
+        document['state'][key]['address'] = {
+            'protocol': 'remote',
+            'data': {'process': process, 'workers': workers}}
+
+    try:
+        composite = Composite(document, core=core)
+        composite.run(0.0)
+        print(composite.read_bridge())
+        print(pool.workers)
+    finally:
+        pool.close()
+
+
+if __name__ == '__main__':
+    from biocompose import create_core
+    # the protocol looks pools up in biocompose.remote, not in __main__
+    from biocompose.remote import run_remote_comparison
+
+    core = create_core()
+    run_remote_comparison(core)
@@ -0,0 +1,201 @@
+'''
+Process server with content negotiated update responses.
+
+Serves the same routes as ``rest_process.server`` but lets clients request
+``update`` results in the binary format from ``biocompose.wire`` by sending
+``Accept: application/x-biocompose-results``. Without that header responses
+are plain JSON, exactly as before.
+
+The server also acts as a worker for ``biocompose.remote``. ``POST /batch``
+runs a list of initialize/update/end commands in one request. ``GET /load``
+reports how many instances the worker holds. Ended simulator instances are
+kept warm by process name and config hash, so re-initializing the same
+model restores the saved initial state instead of loading the model again.
+
+    python -m biocompose.server --host 0.0.0.0 --port 22222
+'''
+
+import argparse
+import os
+import threading
+import uuid
+from typing import List
+
+from fastapi import FastAPI, APIRouter, Request, Response
+from process_bigraph import discover_packages
+
+from biocompose import create_core
+from biocompose.wire import CONTENT_TYPE, negotiate, negotiate_precision, encode
+from biocompose.processes.model_source import config_hash
+
+
+# ended instances kept per (process, config hash) for reuse
+MAX_WARM = int(os.environ.get('BIOCOMPOSE_MAX_WARM', '4'))
+
+
+def make_router(core):
+    router = APIRouter()
+    processes = {}
+    names = {}
+    warm = {}
+
+    def find_process_class(process):
+        return core.process_registry.access(process)
+
+    @router.get('/list-types')
+    def get_list_types():
+        return list(core.registry.keys())
+
+    @router.get('/list-processes')
+    def get_list_processes():
+        return list(core.process_registry.registry.keys())
+
+    @router.get('/process/{process}/config-schema')
+    def get_config_schema(process: str):
+        process_class = find_process_class(process)
+        if process_class is None:
+            return {'process-not-found': 'true'}
+        return process_class.config_schema
+
+    # endpoints run on FastAPI's thread pool
+    lock = threading.Lock()
+
+    def initialize(process, config):
+        key = (process, config_hash(config))
+        with lock:
+            reused = warm[key].pop() if warm.get(key) else None
+        if reused is not None:
+            # reuse a loaded model, reset to the state it was created in
+            instance, snapshot = reused
+            instance.restore_checkpoint(snapshot)
+        else:
+            process_class = find_process_class(process)
+            if process_class is None:
+                raise ValueError(f"Unknown process {process!r}")
+            instance = process_class(
+                config,
+                core=core)
+            if hasattr(instance, 'checkpoint_state'):
+                instance._initial_snapshot = instance.checkpoint_state()
+
+        process_id = str(uuid.uuid4())
+        with lock:
+            processes[process_id] = instance
+            names[process_id] = key
+        return process_id
+
+    def end(process_id):
+        with lock:
+            instance = processes.pop(process_id, None)
+            key = names.pop(process_id, None)
+            snapshot = getattr(instance, '_initial_snapshot', None)
+            if snapshot is not None:
+                pool = warm.setdefault(key, [])
+                if len(pool) < MAX_WARM:
+                    pool.append((instance, snapshot))
+
+    def load():
+        with lock:
+            return {
+                'instances': len(processes),
+                'warm': sum(len(pool) for pool in warm.values()),
+                'cpus': os.cpu_count() or 1,
+            }
+
+    def run_command(command):
+        op = command['op']
+        if op == 'initialize':
+            process_id = initialize(command['process'], command['config'])
+            instance = processes[process_id]
+            return {
+                'process_id': process_id,
+                'inputs': instance.inputs(),
+                'outputs': instance.outputs(),
+            }
+        if op == 'update':
+            return processes[command['process_id']].invoke(
+                command['state'],
+                command.get('interval')).get()
+        if op == 'end':
+            end(command['process_id'])
+            return None
+        raise ValueError(f"Unknown command {op!r}")
+
+    @router.post('/process/{process}/initialize')
+    def post_initialize(process: str, config: dict):
+        return initialize(process, config)
+
+    @router.get('/process/{process}/inputs/{process_id}')
+    def get_inputs(process: str, process_id: str):
+        return processes[process_id].inputs()
+
+    @router.get('/process/{process}/outputs/{process_id}')
+    def get_outputs(process: str, process_id: str):
+        return processes[process_id].outputs()
+
+    @router.post('/process/{process}/update/{process_id}')
+    def post_update(process: str, process_id: str, data: dict, request: Request):
+        # invoke() works for Steps (no interval) as well as Processes
+        update = processes[process_id].invoke(
+            data['state'],
+            data['interval']).get()
+
+        accept = request.headers.get('accept')
+        if negotiate(accept) == CONTENT_TYPE:
+            return Response(
+                content=encode(update, precision=negotiate_precision(accept)),
+                media_type=CONTENT_TYPE)
+        return update
+
+    @router.post('/process/{process}/end/{process_id}')
+    def post_end(process: str, process_id: str):
+        end(process_id)
+
+    @router.get('/load')
+    def get_load():
+        return load()
+
+    @router.post('/batch')
+    def post_batch(commands: List[dict], request: Request):
+        # commands run in order, a failure is reported for that command only
+        results = []
+        for command in commands:
+            try:
+                results.append({'result': run_command(command)})
+            except Exception as error:
+                results.append({'error': f'{type(error).__name__}: {error}'})
+        reply = {'results': results, 'load': load()}
+
+        accept = request.headers.get('accept')
+        if negotiate(accept) == CONTENT_TYPE:
+            return Response(
+                content=encode(reply, precision=negotiate_precision(accept)),
+                media_type=CONTENT_TYPE)
+        return reply
+
+    return router
+
+
+def start_server(core):
+    app = FastAPI()
+    app.include_router(make_router(core))
+    return app
+
+
+def start(host='0.0.0.0', port=22222):
+    import uvicorn
+
+    core = create_core()
+    core = discover_packages(core)
+    uvicorn.run(
+        start_server(core),
+        host=host,
+        port=port)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=22222)
+    args = parser.parse_args()
+    start(host=args.host, port=args.port)
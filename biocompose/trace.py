@@ -0,0 +1,258 @@
+'''
+Opt-in wall-clock tracing for steps and processes.
+
+Every simulator's ``initialize`` and ``update`` is a span. Inside it, the
+phases (model loading, integration, DataFrame conversion, list building,
+comparison) are nested spans. Each span records the step's model source
+and config hash. Traces are written in the Chrome trace event format, so
+they open in Perfetto (https://ui.perfetto.dev) or chrome://tracing. Next
+to the trace, a summary aggregates each span path
+(``TelluriumUTCStep.update/integrate``) into count, total, self and mean
+times.
+
+    with tracing('out/comparison.trace.json') as tracer:
+        composite = Composite(document, core=core)
+        composite.run(0.0)
+    print(format_summary(tracer.summary()))
+
+or for a whole program, set ``BIOCOMPOSE_TRACE=out/run.trace.json``.
+
+When tracing is off, ``span()`` returns a shared no-op context and traced
+methods are called straight through, so the cost is one global lookup.
+'''
+
+import atexit
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'args', 'start', 'path', 'child_ns')
+
+    def __init__(self, tracer: 'Tracer', name: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        stack = self.tracer._stack()
+        self.path = f'{stack[-1].path}/{self.name}' if stack else self.name
+        self.child_ns = 0
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        stack = self.tracer._stack()
+        stack.pop()
+        duration = end - self.start
+        if stack:
+            stack[-1].child_ns += duration
+        if exc_type is not None:
+            self.args['error'] = f'{exc_type.__name__}: {exc}'
+        self.tracer._record(self, duration)
+        return False
+
+
+class Tracer:
+    """Collects spans from all threads of this process."""
+
+    def __init__(self):
+        self.origin = time.perf_counter_ns()
+        self.pid = os.getpid()
+        self.events: List[Dict[str, Any]] = []
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _stack(self) -> list:
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def _record(self, span: _Span, duration: int):
+        event = {
+            'name': span.name,
+            'cat': span.path.split('/', 1)[0],
+            'ph': 'X',
+            'ts': (span.start - self.origin) / 1e3,
+            'dur': duration / 1e3,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+            'args': {**span.args, 'path': span.path, 'self_us': (duration - span.child_ns) / 1e3},
+        }
+        with self.lock:
+            self.events.append(event)
+
+    def span(self, name: str, **args) -> _Span:
+        return _Span(self, name, args)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate spans by path, in start order: count and total/self/mean/max in ms."""
+        summary: Dict[str, Dict[str, float]] = {}
+        with self.lock:
+            events = sorted(self.events, key=lambda event: event['ts'])
+        for event in events:
+            path = event['args']['path']
+            entry = summary.setdefault(path, {
+                'count': 0, 'total_ms': 0.0, 'self_ms': 0.0, 'max_ms': 0.0})
+            duration_ms = event['dur'] / 1e3
+            entry['count'] += 1
+            entry['total_ms'] += duration_ms
+            entry['self_ms'] += event['args']['self_us'] / 1e3
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+        for entry in summary.values():
+            entry['mean_ms'] = entry['total_ms'] / entry['count']
+        return summary
+
+    def write(self, path):
+        """Write the Chrome trace to ``path`` and the summary next to it."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            events = list(self.events)
+        with open(path, 'w') as handle:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, handle)
+        with open(summary_path(path), 'w') as handle:
+            json.dump(self.summary(), handle, indent=1)
+
+
+def summary_path(trace_path) -> Path:
+    trace_path = Path(trace_path)
+    stem = trace_path.name[:-len('.json')] if trace_path.name.endswith('.json') else trace_path.name
+    return trace_path.with_name(f'{stem}.summary.json')
+
+
+def format_summary(summary: Dict[str, Dict[str, float]]) -> str:
+    """Render a summary as a fixed width table, nested spans indented."""
+    width = max([len('span')] + [
+        len(path.rsplit('/', 1)[-1]) + 2 * path.count('/')
+        for path in summary])
+    lines = [f"{'span':<{width}}  {'count':>6}  {'total ms':>10}  {'self ms':>10}  {'mean ms':>10}  {'max ms':>10}"]
+    for path, entry in summary.items():
+        label = '  ' * path.count('/') + path.rsplit('/', 1)[-1]
+        lines.append(
+            f"{label:<{width}}  {entry['count']:>6}  {entry['total_ms']:>10.3f}  "
+            f"{entry['self_ms']:>10.3f}  {entry['mean_ms']:>10.3f}  {entry['max_ms']:>10.3f}")
+    return '\n'.join(lines)
+
+
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Optional[Tracer]:
+    return _tracer
+
+
+def span(name: str, **args):
+    """A nested span under the current one, or a no-op when tracing is off."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, **args)
+
+
+def _edge_args(instance) -> Dict[str, Any]:
+    from biocompose.processes.model_source import config_hash
+
+    config = getattr(instance, 'config', None) or {}
+    args = {'config_hash': config_hash(config)}
+    if 'model_source' in config:
+        args['model_source'] = config['model_source']
+    return args
+
+
+def traced(phase: str):
+    """
+    Method decorator that wraps ``initialize``/``update`` of an edge in a
+    ``<ClassName>.<phase>`` span carrying its model source and config hash.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _tracer is None:
+                return method(self, *args, **kwargs)
+            with _tracer.span(f'{type(self).__name__}.{phase}', **_edge_args(self)):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def start_tracing() -> Tracer:
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing(path=None) -> Optional[Tracer]:
+    """Stop tracing, writing the trace to ``path`` if given."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is not None and path is not None:
+        tracer.write(path)
+    return tracer
+
+
+@contextmanager
+def tracing(path=None):
+    """Trace everything run inside the block, writing to ``path`` at the end."""
+    tracer = start_tracing()
+    try:
+        yield tracer
+    finally:
+        stop_tracing(path)
+
+
+if os.environ.get('BIOCOMPOSE_TRACE'):
+    start_tracing()
+    atexit.register(stop_tracing, os.environ['BIOCOMPOSE_TRACE'])
+
+
+def run_traced(document_path, trace_path, time_interval=0.0):
+    from process_bigraph import Composite
+    from biocompose import create_core
+
+    with open(document_path) as handle:
+        document = json.load(handle)
+
+    core = create_core()
+    with tracing(trace_path) as tracer:
+        with span('Composite.initialize', document=str(document_path)):
+            composite = Composite(document, core=core)
+        with span('Composite.run', interval=time_interval):
+            composite.run(time_interval)
+
+    print(composite.read_bridge())
+    print(format_summary(tracer.summary()))
+    print(f'trace written to {trace_path} and {summary_path(trace_path)}')
+
+
+if __name__ == '__main__':
+    import argparse
+    # spans are recorded by biocompose.trace, not by this __main__ copy
+    from biocompose.trace import run_traced
+
+    parser = argparse.ArgumentParser(description='Run a document with tracing enabled.')
+    parser.add_argument('document')
+    parser.add_argument('--out', default='out/trace.json')
+    parser.add_argument('--time', type=float, default=0.0)
+    cli_args = parser.parse_args()
+    run_traced(cli_args.document, cli_args.out, cli_args.time)
@@ -0,0 +1,298 @@
+'''
+Compact binary wire format for ``result``/``results`` payloads.
+
+A message is laid out as
+
+    b'BCW1' | uint32 header length | JSON header | padding | array payload
+
+where the JSON header holds the structure of the update with every numeric
+list replaced by ``{"__array__": i}`` and a table describing each array
+(dtype, length and byte offset into the payload). Arrays are stored as
+little-endian, 8-byte aligned typed buffers so a client can map them
+straight into NumPy without parsing any numbers. Lists of ints are stored
+as int64, other numeric lists as float64.
+
+JSON stays the default, the binary format is only used when a client asks
+for ``CONTENT_TYPE`` in its ``Accept`` header.
+
+Trajectories can be stored at reduced precision (see
+``biocompose.precision``) by passing ``precision='float32'`` or
+``'float16'`` to ``encode``, or by sending
+``Accept: application/x-biocompose-results; precision=float32``. ``time``
+vectors and integer lists are never downcast. The header then records the
+precision, each float16 array's scale, and the largest error against the
+full precision values. ``save``/``load`` write the same format to disk
+for archived results.
+'''
+
+import json
+import struct
+from array import array
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # clients can decode without numpy
+    np = None
+
+
+CONTENT_TYPE = 'application/x-biocompose-results'
+JSON_CONTENT_TYPE = 'application/json'
+
+MAGIC = b'BCW1'
+ALIGNMENT = 8
+
+# dtype code -> (array module typecode, itemsize), half floats go through struct
+DTYPES = {
+    '<f8': ('d', 8),
+    '<f4': ('f', 4),
+    '<f2': ('e', 2),
+    '<i8': ('q', 8),
+}
+
+
+def negotiate(accept: str | None) -> str:
+    """Pick the response content type from an ``Accept`` header."""
+    if not accept:
+        return JSON_CONTENT_TYPE
+
+    for part in accept.split(','):
+        fields = [field.strip() for field in part.split(';')]
+        if fields[0] != CONTENT_TYPE:
+            continue
+        quality = 1.0
+        for field in fields[1:]:
+            if field.startswith('q='):
+                try:
+                    quality = float(field[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            return CONTENT_TYPE
+
+    return JSON_CONTENT_TYPE
+
+
+# names accepted by biocompose.precision
+PRECISION_NAMES = ('float64', 'float32', 'float16')
+
+# keys whose values are never downcast
+FULL_PRECISION_KEYS = ('time',)
+
+
+def negotiate_precision(accept: str | None) -> str:
+    """The ``precision`` parameter of the binary media type, float64 if absent or unknown."""
+    for part in (accept or '').split(','):
+        fields = [field.strip() for field in part.split(';')]
+        if fields[0] != CONTENT_TYPE:
+            continue
+        for field in fields[1:]:
+            if field.startswith('precision='):
+                precision = field[len('precision='):]
+                if precision in PRECISION_NAMES:
+                    return precision
+    return 'float64'
+
+
+def _is_numeric_list(value) -> bool:
+    return bool(value) and all(
+        isinstance(item, (float, int)) and not isinstance(item, bool)
+        for item in value)
+
+
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _is_int_list(value) -> bool:
+    return all(isinstance(item, int) for item in value)
+
+
+def _pad(length: int) -> int:
+    return (-length) % ALIGNMENT
+
+
+def encode(value: Any, precision: str = 'float64') -> bytes:
+    """
+    Encode an update (nested dicts/lists of trajectories) to bytes.
+
+    precision: 'float64', or 'float32'/'float16' to downcast every floating
+        point trajectory (requires numpy). ``time`` vectors always stay at
+        float64 so they remain strictly increasing.
+    """
+    arrays: List[Dict[str, Any]] = []
+    buffers: List[bytes] = []
+    reports = []
+    offset = 0
+
+    reduced = precision != 'float64'
+    if reduced:
+        if np is None:
+            raise RuntimeError(f"Encoding at {precision} precision requires numpy")
+        from biocompose.precision import quantize, dequantize, error_report, check_precision
+        check_precision(precision)
+
+    def add_array(buffer: bytes, dtype: str, length: int, scale: float = 1.0):
+        nonlocal offset
+        spec = {'dtype': dtype, 'length': length, 'offset': offset}
+        if scale != 1.0:
+            spec['scale'] = scale
+        arrays.append(spec)
+        buffers.append(buffer)
+        padding = _pad(len(buffer))
+        if padding:
+            buffers.append(b'\x00' * padding)
+        offset += len(buffer) + padding
+        return {'__array__': len(arrays) - 1}
+
+    def add_reduced(values):
+        full = np.asarray(values, dtype=float)
+        stored, scale = quantize(full, precision)
+        reports.append(error_report(full, dequantize(stored, scale)))
+        return add_array(stored.tobytes(), stored.dtype.str, len(stored), scale)
+
+    def walk(node, reduce=reduced):
+        if isinstance(node, dict):
+            return {
+                str(key): walk(item, reduce and key not in FULL_PRECISION_KEYS)
+                for key, item in node.items()}
+        if np is not None and isinstance(node, np.ndarray):
+            if node.ndim != 1:
+                return walk(node.tolist(), reduce)
+            if reduce and node.dtype.kind == 'f':
+                return add_reduced(node)
+            dtype = node.dtype.newbyteorder('<').str
+            if dtype not in DTYPES:
+                dtype = '<i8' if node.dtype.kind == 'i' or (
+                    node.dtype.kind == 'u' and node.dtype.itemsize < 8) else '<f8'
+            return add_array(node.astype(dtype, copy=False).tobytes(), dtype, len(node))
+        if isinstance(node, (list, tuple)):
+            if _is_numeric_list(node):
+                if _is_int_list(node):
+                    if not INT64_MIN <= min(node) <= max(node) <= INT64_MAX:
+                        # beyond int64, left in the JSON header to stay exact
+                        return list(node)
+                    buffer = array('q', node)
+                    if struct.pack('=q', 1) != struct.pack('<q', 1):
+                        buffer.byteswap()
+                    return add_array(buffer.tobytes(), '<i8', len(buffer))
+                if reduce:
+                    return add_reduced(node)
+                buffer = array('d', node)
+                if struct.pack('=d', 1.0) != struct.pack('<d', 1.0):
+                    buffer.byteswap()
+                return add_array(buffer.tobytes(), '<f8', len(buffer))
+            return [walk(item, reduce) for item in node]
+        if np is not None and isinstance(node, np.generic):
+            return node.item()
+        return node
+
+    tree = walk(value)
+    meta = {'tree': tree, 'arrays': arrays}
+    if reduced:
+        from biocompose.precision import merge_reports
+        meta['precision'] = precision
+        meta['error'] = merge_reports(reports)
+    header = json.dumps(
+        meta,
+        separators=(',', ':')).encode('utf-8')
+    prefix = MAGIC + struct.pack('<I', len(header)) + header
+    prefix += b'\x00' * _pad(len(prefix))
+
+    return b''.join([prefix] + buffers)
+
+
+def _read_header(data: bytes):
+    if data[:4] != MAGIC:
+        raise ValueError('not a biocompose binary payload')
+
+    (header_length,) = struct.unpack_from('<I', data, 4)
+    header_end = 8 + header_length
+    header = json.loads(bytes(data[8:header_end]).decode('utf-8'))
+    return header, header_end + _pad(header_end)
+
+
+def describe(data: bytes) -> Dict[str, Any]:
+    """Precision, error report and sizes of an encoded payload."""
+    header, _ = _read_header(data)
+    return {
+        'precision': header.get('precision', 'float64'),
+        'error': header.get('error', {'max_abs_error': 0.0, 'max_rel_error': 0.0}),
+        'arrays': len(header['arrays']),
+        'values': sum(spec['length'] for spec in header['arrays']),
+        'bytes': len(data),
+    }
+
+
+def decode(data: bytes, as_numpy: bool = True) -> Any:
+    """
+    Decode bytes produced by ``encode``.
+
+    With ``as_numpy`` (and numpy installed) trajectories come back as
+    read-only arrays viewing ``data``, otherwise as lists of floats.
+    Scaled float16 arrays are materialized as float32 arrays.
+    """
+    header, payload_start = _read_header(data)
+
+    use_numpy = as_numpy and np is not None
+
+    def load_array(spec):
+        dtype = spec['dtype']
+        start = payload_start + spec['offset']
+        scale = spec.get('scale', 1.0)
+        if use_numpy:
+            values = np.frombuffer(data, dtype=dtype, count=spec['length'], offset=start)
+            if dtype == '<f2':
+                values = values.astype('<f4') * np.float32(scale)
+            return values
+        typecode, itemsize = DTYPES[dtype]
+        end = start + itemsize * spec['length']
+        if dtype == '<f2':
+            return [
+                item * scale
+                for item in struct.unpack(f'<{spec["length"]}e', bytes(data[start:end]))]
+        buffer = array(typecode)
+        buffer.frombytes(data[start:end])
+        if struct.pack('=d', 1.0) != struct.pack('<d', 1.0):
+            buffer.byteswap()
+        return buffer.tolist()
+
+    arrays = header['arrays']
+
+    def walk(node):
+        if isinstance(node, dict):
+            if set(node) == {'__array__'}:
+                return load_array(arrays[node['__array__']])
+            return {key: walk(item) for key, item in node.items()}
+        if isinstance(node, list):
+            return [walk(item) for item in node]
+        return node
+
+    return walk(header['tree'])
+
+
+def dumps(value: Any, content_type: str = JSON_CONTENT_TYPE, precision: str = 'float64') -> bytes:
+    """Serialize ``value`` in the given content type."""
+    if content_type == CONTENT_TYPE:
+        return encode(value, precision=precision)
+    return json.dumps(value).encode('utf-8')
+
+
+def loads(data: bytes, content_type: str = JSON_CONTENT_TYPE, as_numpy: bool = True) -> Any:
+    """Deserialize a response body given its ``Content-Type``."""
+    if content_type.split(';')[0].strip() == CONTENT_TYPE:
+        return decode(data, as_numpy=as_numpy)
+    return json.loads(data)
+
+
+def save(path, value: Any, precision: str = 'float64') -> Dict[str, Any]:
+    """Store ``value`` in the binary format, returning ``describe`` of it."""
+    data = encode(value, precision=precision)
+    with open(path, 'wb') as handle:
+        handle.write(data)
+    return describe(data)
+
+
+def load(path, as_numpy: bool = True) -> Any:
+    """Read results written by ``save``."""
+    with open(path, 'rb') as handle:
+        return decode(handle.read(), as_numpy=as_numpy)
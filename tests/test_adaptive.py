@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+
+from biocompose.processes.adaptive import adaptive_rows, find_events, output_mode, thin
+
+
+def interpolation_error(times, values, keep):
+    chord = np.column_stack([
+        np.interp(times, times[keep], values[keep, column])
+        for column in range(values.shape[1])])
+    return np.max(np.abs(values - chord) / np.ptp(values, axis=0))
+
+
+@pytest.mark.parametrize('tolerance', [1e-2, 1e-3])
+def test_thin_stays_within_tolerance(tolerance):
+    times = np.sort(np.random.default_rng(0).uniform(0.0, 50.0, 2000))
+    values = np.column_stack([np.sin(times), np.tanh(times - 25.0), np.ones_like(times)])
+
+    keep = thin(times, values, tolerance)
+
+    assert keep[0] == 0 and keep[-1] == len(times) - 1
+    assert np.all(np.diff(keep) > 0)
+    assert len(keep) < len(times) // 2
+    assert interpolation_error(times, values[:, :2], keep) <= tolerance
+
+
+def test_thin_keeps_a_line_as_its_endpoints():
+    times = np.linspace(0.0, 1.0, 100)
+    values = np.column_stack([3.0 * times + 1.0])
+    assert np.array_equal(thin(times, values, 1e-6), [0, 99])
+    assert np.array_equal(thin(times[:2], values[:2], 1e-6), [0, 1])
+
+
+def test_find_events():
+    times = np.linspace(0.0, 4.0 * np.pi, 4001)
+    values = np.column_stack([np.sin(times)])
+    events, brackets = find_events(times, values, ['A'], {'A': 0.5})
+
+    assert np.allclose(events['A']['up'], [np.pi / 6, 2 * np.pi + np.pi / 6], atol=1e-5)
+    assert np.allclose(events['A']['down'], [5 * np.pi / 6, 2 * np.pi + 5 * np.pi / 6], atol=1e-5)
+    assert len(brackets) == 8
+
+
+def test_output_mode():
+    assert output_mode({}) == 'grid'
+    with pytest.raises(ValueError):
+        output_mode({'output': 'dense'})
+
+
+def test_adaptive_rows_keeps_event_brackets():
+    times = np.linspace(0.0, 10.0, 1001)
+    values = np.column_stack([times, np.clip(times - 5.0, 0.0, None)])
+    config = {'output': 'adaptive', 'output_tolerance': 1e-3, 'events': {'A': 2.055}}
+
+    keep, brackets, events = adaptive_rows(config, values, ['A'], 1)
+
+    assert np.allclose(events['A']['up'], [7.055])
+    assert keep.tolist() == [0, 500, 1000]
+    assert sorted(brackets.tolist()) == [705, 706]
+
+
+def test_step_keeps_event_brackets_under_decimation():
+    from biocompose import create_core
+    from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+    step = TelluriumUTCStep({
+        'model_source': 'models/BIOMD0000000012_url.xml',
+        'time': 200.0,
+        'n_points': 2001,
+        'observables': ['PX'],
+        'events': {'PX': 1000.0},
+        'decimation': 'every_k',
+        'decimation_k': 500,
+    }, core=create_core())
+    update = step.update({})
+
+    time = np.asarray(update['result']['time'])
+    crossings = update['events']['PX']['up'] + update['events']['PX']['down']
+    assert crossings
+    assert np.all(np.diff(time) > 0)
+    for at in crossings:
+        assert np.any((time < at) & (time > at - 0.1 - 1e-9))
+        assert np.any((time > at) & (time < at + 0.1 + 1e-9))
@@ -0,0 +1,89 @@
+import json
+import os
+import sys
+import time
+
+from biocompose import batch
+from biocompose.batch import run_batch, run_pool
+
+
+COMPARISON = 'biocompose/documents/copasi_tellurium_comparison.json'
+
+
+def sleep_for(core, seconds):
+    time.sleep(seconds)
+    return {'slept': seconds}
+
+
+def exit_with(core, code):
+    os._exit(code)
+
+
+def run(tasks, handler, **kwargs):
+    outcomes = {}
+    run_pool(tasks, handler, outcomes.__setitem__, **kwargs)
+    return [outcomes[index] for index in range(len(tasks))]
+
+
+def vanishing(monkeypatch):
+    """A handler that spawned workers cannot import, so they fail to start."""
+    def handler(core):
+        return {}
+    handler.__module__ = __name__
+    handler.__qualname__ = handler.__name__ = 'vanishing_handler'
+    monkeypatch.setattr(sys.modules[__name__], 'vanishing_handler', handler, raising=False)
+    return handler
+
+
+def test_timeout_and_crash_are_recorded():
+    outcomes = run(
+        [(0.0,), (30.0,), (0.0,)],
+        sleep_for,
+        workers=1,
+        timeout=2.0)
+    assert [outcome['status'] for outcome in outcomes] == ['ok', 'timeout', 'ok']
+    assert outcomes[2]['slept'] == 0.0
+
+    outcomes = run([(3,), (4,)], exit_with, workers=1)
+    assert [outcome['status'] for outcome in outcomes] == ['crashed', 'crashed']
+    assert 'code 3' in outcomes[0]['error']
+
+
+def test_workers_that_fail_to_start_are_recorded(monkeypatch):
+    outcomes = run([(), ()], vanishing(monkeypatch), workers=2)
+    assert [outcome['status'] for outcome in outcomes] == ['crashed', 'crashed']
+    assert 'failed to start' in outcomes[0]['error']
+
+
+def test_startup_failure_still_writes_summary(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch, 'run_document', vanishing(monkeypatch))
+    rows = run_batch([COMPARISON], tmp_path, workers=1)
+    assert rows[0]['status'] == 'crashed'
+    with open(tmp_path / 'summary.json') as handle:
+        assert json.load(handle)[0]['status'] == 'crashed'
+
+
+def test_rerun_skips_documents_with_results(tmp_path):
+    documents = tmp_path / 'documents'
+    documents.mkdir()
+    with open(COMPARISON) as handle:
+        document = json.load(handle)
+    with open(documents / 'comparison.json', 'w') as handle:
+        json.dump(document, handle)
+
+    out = tmp_path / 'out'
+    [first] = run_batch(batch.find_documents(documents), out, workers=1)
+    assert first['status'] == 'ok'
+    [second] = run_batch(batch.find_documents(documents), out, workers=1)
+    assert second['status'] == 'cached'
+    assert second['hash'] == first['hash']
+
+    # a changed document has a new hash and runs again
+    document['state']['tellurium_step']['config']['n_points'] = 20
+    with open(documents / 'comparison.json', 'w') as handle:
+        json.dump(document, handle)
+    [third] = run_batch(batch.find_documents(documents), out, workers=1)
+    assert third['status'] == 'ok'
+    assert third['hash'] != first['hash']
+    with open(out / 'summary.json') as handle:
+        assert json.load(handle)[0]['hash'] == third['hash']
@@ -0,0 +1,109 @@
+import json
+
+import numpy as np
+import pytest
+from process_bigraph import Composite
+
+from biocompose import create_core
+from biocompose.checkpoint import load_checkpoint, run_with_checkpoints, save_checkpoint
+from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+COMPARISON = 'biocompose/documents/copasi_tellurium_comparison.json'
+
+
+def process_document():
+    return {
+        'state': {
+            'copasi': {
+                '_type': 'process',
+                'address': 'local:CopasiUTCProcess',
+                'config': {'model_source': MODEL, 'time': 1.0, 'intervals': 10},
+                'inputs': {
+                    'species_concentrations': ['species_concentrations'],
+                    'species_counts': ['species_counts']},
+                'outputs': {
+                    'species_concentrations': ['species_concentrations'],
+                    'fluxes': ['fluxes'],
+                    'time': ['time']}}}}
+
+
+def test_resumed_process_matches_uninterrupted_run(tmp_path):
+    core = create_core()
+    path = tmp_path / 'run.ckpt.npz'
+
+    uninterrupted = Composite(process_document(), core=core)
+    uninterrupted.run(20.0)
+
+    first = Composite(process_document(), core=core)
+    run_with_checkpoints(first, 10.0, path, every=5.0)
+    resumed = load_checkpoint(path, core)
+    assert resumed.state['global_time'] == 10.0
+    resumed.run(10.0)
+
+    expected = uninterrupted.state['species_concentrations']
+    actual = resumed.state['species_concentrations']
+    assert set(actual) == set(expected)
+    for sid, value in expected.items():
+        assert np.isclose(actual[sid], value, rtol=1e-6, atol=1e-9)
+
+
+def test_load_does_not_rerun_steps(tmp_path, monkeypatch):
+    core = create_core()
+    path = tmp_path / 'steps.ckpt.npz'
+    with open(COMPARISON) as handle:
+        composite = Composite(json.load(handle), core=core)
+    saved = composite.state['results']['tellurium']
+    save_checkpoint(composite, path)
+
+    calls = []
+    update = TelluriumUTCStep.update
+
+    def counted(self, inputs):
+        calls.append(inputs)
+        return update(self, inputs)
+
+    monkeypatch.setattr(TelluriumUTCStep, 'update', counted)
+    resumed = load_checkpoint(path, core)
+
+    assert calls == []
+    restored = resumed.state['results']['tellurium']
+    assert np.array_equal(np.asarray(restored['time']), np.asarray(saved['time']))
+
+
+def test_restore_rejects_a_changed_model_file(tmp_path):
+    core = create_core()
+    path = tmp_path / 'run.ckpt.npz'
+    composite = Composite(process_document(), core=core)
+    composite.run(1.0)
+    save_checkpoint(composite, path)
+
+    instance = composite.state['copasi']['instance']
+    snapshot = instance.checkpoint_state()
+    snapshot['model_sha256'] = '0' * 64
+    with pytest.raises(ValueError, match='different model file'):
+        instance.restore_checkpoint(snapshot)
+
+    step = TelluriumUTCStep({'model_source': MODEL, 'time': 1.0, 'n_points': 2}, core=core)
+    snapshot = step.checkpoint_state()
+    snapshot['model_sha256'] = '0' * 64
+    with pytest.raises(ValueError, match='different model file'):
+        step.restore_checkpoint(snapshot)
+
+
+def test_load_rejects_a_simulator_without_saved_state(tmp_path):
+    core = create_core()
+    path = tmp_path / 'run.ckpt.npz'
+    composite = Composite(process_document(), core=core)
+    save_checkpoint(composite, path)
+
+    with np.load(path) as data:
+        arrays = dict(data)
+    header = json.loads(arrays['__header__'].tobytes().decode('utf-8'))
+    header['simulators'] = {}
+    arrays['__header__'] = np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8)
+    np.savez_compressed(path, **arrays)
+
+    with pytest.raises(ValueError, match="no state for simulator 'copasi'"):
+        load_checkpoint(path, core)
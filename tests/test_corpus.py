@@ -0,0 +1,119 @@
+import json
+import shutil
+import sqlite3
+
+import pytest
+
+from biocompose import corpus
+from biocompose.corpus import validate_corpus
+from biocompose.processes.model_source import PROJECT_ROOT
+
+
+MODEL = PROJECT_ROOT / 'models' / 'BIOMD0000000012_url.xml'
+SETTINGS = {'time_interval': 1.0, 'n_points': 5}
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """Run engine tasks in this process, recording every task."""
+    from biocompose import create_core
+
+    core = create_core()
+    tasks = []
+
+    def run_pool(pool_tasks, handler, on_outcome, workers=None, timeout=None):
+        for index, task in enumerate(pool_tasks):
+            tasks.append(task)
+            on_outcome(index, {'status': 'ok', 'seconds': 0.0, **handler(core, *task)})
+
+    monkeypatch.setattr(corpus, 'run_pool', run_pool)
+    return tasks
+
+
+def stored(db_path):
+    connection = sqlite3.connect(db_path)
+    connection.row_factory = sqlite3.Row
+    try:
+        return {
+            row['path']: dict(row)
+            for row in connection.execute('SELECT * FROM validations')}
+    finally:
+        connection.close()
+
+
+def test_rerun_skips_validated_models(tmp_path, runs):
+    models = tmp_path / 'models'
+    models.mkdir()
+    shutil.copy(MODEL, models / 'a.xml')
+    db_path = tmp_path / 'corpus.sqlite'
+
+    assert validate_corpus(models, db_path, **SETTINGS) == {'ok': 1}
+    assert len(runs) == 2
+    [row] = stored(db_path).values()
+    assert row['max_mse'] < 1e-4
+
+    assert validate_corpus(models, db_path, **SETTINGS) == {'cached': 1}
+    assert len(runs) == 2
+
+
+def test_changed_file_is_run_again(tmp_path, runs):
+    models = tmp_path / 'models'
+    models.mkdir()
+    path = models / 'a.xml'
+    shutil.copy(MODEL, path)
+    db_path = tmp_path / 'corpus.sqlite'
+    validate_corpus(models, db_path, **SETTINGS)
+    before = stored(db_path)[str(path.resolve())]['sha256']
+
+    with open(path, 'a') as handle:
+        handle.write('<!-- edited -->\n')
+    assert validate_corpus(models, db_path, **SETTINGS) == {'ok': 1}
+    assert len(runs) == 4
+    assert stored(db_path)[str(path.resolve())]['sha256'] != before
+
+
+def test_duplicate_file_reuses_stored_result(tmp_path, runs):
+    models = tmp_path / 'models'
+    models.mkdir()
+    shutil.copy(MODEL, models / 'a.xml')
+    db_path = tmp_path / 'corpus.sqlite'
+    validate_corpus(models, db_path, **SETTINGS)
+
+    shutil.copy(MODEL, models / 'b.xml')
+    assert validate_corpus(models, db_path, **SETTINGS) == {'cached': 2}
+    assert len(runs) == 2
+    rows = stored(db_path)
+    original = rows[str((models / 'a.xml').resolve())]
+    duplicate = rows[str((models / 'b.xml').resolve())]
+    assert duplicate['status'] == 'ok'
+    assert duplicate['species_mse'] == original['species_mse']
+
+
+def test_duplicates_in_one_run_are_simulated_once(tmp_path, runs):
+    models = tmp_path / 'models'
+    models.mkdir()
+    shutil.copy(MODEL, models / 'a.xml')
+    shutil.copy(MODEL, models / 'b.xml')
+
+    assert validate_corpus(models, tmp_path / 'corpus.sqlite', **SETTINGS) == {'ok': 2}
+    assert len(runs) == 2
+
+
+@pytest.mark.parametrize('failure', ['crashed', 'timeout'])
+def test_failed_engine_run_is_stored_and_retried(tmp_path, monkeypatch, failure):
+    models = tmp_path / 'models'
+    models.mkdir()
+    shutil.copy(MODEL, models / 'a.xml')
+    db_path = tmp_path / 'corpus.sqlite'
+
+    def run_pool(tasks, handler, on_outcome, workers=None, timeout=None):
+        on_outcome(0, {'status': 'error', 'error': 'ValueError: bad', 'seconds': 0.0})
+        on_outcome(1, {'status': failure, 'error': 'lost', 'seconds': 0.0})
+
+    monkeypatch.setattr(corpus, 'run_pool', run_pool)
+    assert validate_corpus(models, db_path, **SETTINGS) == {failure: 1}
+    [row] = stored(db_path).values()
+    assert json.loads(row['errors'])['copasi']['status'] == failure
+
+    # unlike errors, timeouts and crashes are not reused
+    assert validate_corpus(models, db_path, **SETTINGS) == {failure: 1}
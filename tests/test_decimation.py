@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from biocompose.processes.decimation import decimate, select_observables
+
+
+def trajectories(n_points=1001):
+    time = np.linspace(0.0, 100.0, n_points)
+    return np.column_stack([np.sin(time / 5.0), np.exp(-time / 20.0)])
+
+
+def test_none_keeps_every_point():
+    values = trajectories()
+    assert np.array_equal(decimate({}, values), np.arange(len(values)))
+
+
+def test_every_k_keeps_endpoints():
+    keep = decimate({'decimation': 'every_k', 'decimation_k': 7}, trajectories())
+    assert keep[0] == 0 and keep[-1] == 1000
+    assert np.all(np.diff(keep[:-1]) == 7)
+    with pytest.raises(ValueError):
+        decimate({'decimation': 'every_k', 'decimation_k': 0}, trajectories())
+
+
+def test_threshold_bounds_the_change_between_kept_points():
+    values = trajectories()
+    threshold = 0.05
+    keep = decimate({'decimation': 'threshold', 'decimation_threshold': threshold}, values)
+    assert keep[0] == 0 and keep[-1] == len(values) - 1
+    assert len(keep) < len(values) // 4
+
+    limit = threshold * np.ptp(values, axis=0)
+    segment = np.searchsorted(keep, np.arange(len(values)), side='right') - 1
+    assert np.all(np.abs(values - values[keep[segment]]) <= limit + 1e-12)
+
+
+def test_minmax_keeps_extremes():
+    values = trajectories()
+    keep = decimate({'decimation': 'minmax', 'decimation_points': 50}, values)
+    assert len(keep) <= 50 * values.shape[1] + 2
+    for column in range(values.shape[1]):
+        assert np.argmax(values[:, column]) in keep
+        assert np.argmin(values[:, column]) in keep
+
+    short = trajectories(20)
+    assert np.array_equal(
+        decimate({'decimation': 'minmax', 'decimation_points': 50}, short), np.arange(20))
+
+
+def test_unknown_method_and_observables():
+    with pytest.raises(ValueError, match='Unknown decimation'):
+        decimate({'decimation': 'lttb'}, trajectories())
+    assert select_observables({'observables': ['Z', 'X']}, ['X', 'Y', 'Z']) == ['X', 'Z']
+    assert select_observables({}, ['X', 'Y']) == ['X', 'Y']
+    with pytest.raises(ValueError, match='Unknown observables'):
+        select_observables({'observables': ['W']}, ['X'])
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from biocompose import create_core
+from biocompose.processes.fitting import ParameterFitStep, TelluriumFitModel
+from biocompose.processes.integrators import COPASI_DEFAULTS, TELLURIUM_DEFAULTS
+from biocompose.processes.model_source import resolve_model_source
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+TRUTH = {'ps_a': 0.5}
+DEFAULTS = {'tellurium': TELLURIUM_DEFAULTS, 'copasi': COPASI_DEFAULTS}
+
+
+@pytest.fixture(scope='module')
+def data():
+    model = TelluriumFitModel(resolve_model_source(MODEL), list(TRUTH), TELLURIUM_DEFAULTS)
+    times = np.linspace(0.0, 50.0, 26)
+    species = ['PX', 'PY']
+    values = model.simulate(list(TRUTH.values()), times, species)
+    return {
+        'time': times.tolist(),
+        'species_concentrations': {sid: values[i].tolist() for i, sid in enumerate(species)},
+    }
+
+
+def fit_step(**config):
+    return ParameterFitStep({
+        'model_source': MODEL,
+        'parameters': {'ps_a': {'lower': 0.2, 'upper': 0.8}},
+        'metric': 'range_mse',
+        'max_iterations': 15,
+        'population': 6,
+        'workers': 1,
+        **config,
+    }, core=create_core())
+
+
+@pytest.mark.parametrize('engine', ['tellurium', 'copasi'])
+def test_recovers_a_known_parameter(engine, data):
+    fit = fit_step(engine=engine).update({'data': data})
+
+    assert fit['parameters']['ps_a'] == pytest.approx(0.5, abs=5e-3)
+    assert fit['error'] < 1e-4
+    assert fit['error'] == min(fit['history']['error'])
+    assert list(fit['result']['species_concentrations']) == ['PX', 'PY']
+    assert len(fit['history']['ps_a']) == len(fit['history']['error'])
+
+
+def test_second_update_is_fully_memoized(data):
+    step = fit_step(method='nelder-mead', max_iterations=20)
+    first = step.update({'data': data})
+    second = step.update({'data': data})
+
+    assert 0.0 in first['history']['cached']
+    assert second['history']['cached'] == [1.0] * len(second['history']['cached'])
+    assert second['parameters'] == first['parameters']
+
+
+@pytest.mark.parametrize('engine', ['tellurium', 'copasi'])
+def test_rejects_parameters_set_by_assignment_rules(engine):
+    with pytest.raises(ValueError, match='Not fittable'):
+        fit_step(engine=engine, parameters={'k_tl': {'lower': 0.1, 'upper': 10.0}})
+
+    from biocompose.processes.fitting import FIT_MODELS
+    with pytest.raises(ValueError, match='Not fittable'):
+        FIT_MODELS[engine](resolve_model_source(MODEL), ['k_tl'], DEFAULTS[engine])
+
+
+def test_rejects_unknown_species(data):
+    with pytest.raises(ValueError, match='unknown species'):
+        fit_step().update({'data': {**data, 'species_concentrations': {'Q': data['time']}}})
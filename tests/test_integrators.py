@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pytest
+
+from biocompose import create_core
+from biocompose.processes import integrators
+from biocompose.processes.copasi_process import CopasiUTCProcess
+from biocompose.processes.integrators import benchmark, tuned_settings
+from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+
+
+@pytest.fixture
+def decisions(tmp_path, monkeypatch):
+    """Store tuning decisions under ``tmp_path``, with nothing in memory."""
+    monkeypatch.setattr(integrators, '_decisions', {})
+    monkeypatch.setattr(
+        integrators, '_decision_path', lambda sha256: tmp_path / 'solvers' / f'{sha256}.json')
+
+    def stored(sha256):
+        with open(tmp_path / 'solvers' / f'{sha256}.json') as handle:
+            return json.load(handle)['decisions']
+    return stored
+
+
+def test_benchmark_picks_fastest_candidate_within_tolerance():
+    reference = np.linspace(0.0, 1.0, 5)[:, None]
+    offsets = {'exact': 0.0, 'close': 1e-6, 'far': 0.1}
+
+    def run(settings):
+        return reference + offsets[settings['integrator']]
+
+    def settings(integrator):
+        return {'integrator': integrator, 'rtol': 1e-6, 'atol': 1e-12, 'max_steps': 10}
+
+    result = benchmark(
+        run,
+        [settings('exact'), settings('close'), settings('far')],
+        settings('exact'),
+        tolerance=1e-4)
+    accepted = [trial for trial in result['trials'] if trial['error'] <= 1e-4]
+    assert {trial['integrator'] for trial in accepted} == {'exact', 'close'}
+    assert result['settings']['integrator'] in ('exact', 'close')
+
+    # nothing within tolerance falls back to the reference settings
+    result = benchmark(run, [settings('far')], settings('exact'), tolerance=1e-4)
+    assert result['settings'] == settings('exact')
+
+
+def test_decisions_are_stored_and_reused(decisions, monkeypatch):
+    calls = []
+
+    def tune():
+        calls.append(1)
+        return {'settings': {'integrator': 'rk4', 'rtol': 1e-6, 'atol': 1e-12, 'max_steps': 10}}
+
+    first = tuned_settings('tellurium', '1.0', 'abc', 10.0, 11, 1e-4, tune)
+    assert first['integrator'] == 'rk4'
+    assert list(decisions('abc')) == ["tellurium|1.0|10.0|11|0.0001"]
+
+    # a new process reads the stored decision instead of tuning again
+    monkeypatch.setattr(integrators, '_decisions', {})
+    assert tuned_settings('tellurium', '1.0', 'abc', 10.0, 11, 1e-4, tune) == first
+    assert len(calls) == 1
+
+    # another horizon is a separate decision
+    tuned_settings('tellurium', '1.0', 'abc', 20.0, 11, 1e-4, tune)
+    assert len(calls) == 2
+    assert len(decisions('abc')) == 2
+
+
+def test_tellurium_auto_matches_default_integrator(decisions):
+    core = create_core()
+    config = {'model_source': MODEL, 'time': 10.0, 'n_points': 11}
+    tuned = TelluriumUTCStep({**config, 'integrator': 'auto'}, core=core)
+    default = TelluriumUTCStep(config, core=core)
+
+    [decision] = decisions(tuned.model_index.sha256).values()
+    assert decision['settings'] == tuned.solver
+    assert decision['error'] <= 1e-4
+
+    expected = default.update({})['result']['species_concentrations']
+    actual = tuned.update({})['result']['species_concentrations']
+    for sid, values in expected.items():
+        scale = max(np.ptp(values), 1.0)
+        assert np.max(np.abs(np.subtract(actual[sid], values))) / scale < 1e-3
+
+
+def test_copasi_process_tunes_over_the_update_interval(decisions):
+    process = CopasiUTCProcess({
+        'model_source': MODEL,
+        'time': 1.0,
+        'intervals': 10,
+        'integrator': 'auto'}, core=create_core())
+    # nothing is tuned before the interval is known
+    assert process.solver is None
+
+    process.update({}, 5.0)
+    [key] = decisions(process.model_index.sha256)
+    assert key.split('|')[2] == '5.0'
+
+    process.update({}, 5.0)
+    assert len(decisions(process.model_index.sha256)) == 1
+    process.update({}, 2.0)
+    assert {key.split('|')[2] for key in decisions(process.model_index.sha256)} == {'5.0', '2.0'}
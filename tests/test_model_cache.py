@@ -0,0 +1,118 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from biocompose.processes.model_source import ModelCache
+
+
+class ModelServer:
+    """Serves ``bodies`` by path with ETags, or ``fail`` with a 500."""
+
+    def __init__(self):
+        self.bodies = {}
+        self.requests = []
+        self.fail = False
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append((self.path, self.headers.get('If-None-Match')))
+                body = server.bodies.get(self.path)
+                if server.fail:
+                    self.send_error(500)
+                elif body is None:
+                    self.send_error(404)
+                else:
+                    etag = f'"{hash(body)}"'
+                    if self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    self.send_response(200)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f'http://127.0.0.1:{self.httpd.server_address[1]}{path}'
+
+
+@pytest.fixture
+def server():
+    server = ModelServer()
+    server.thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+
+def test_revalidates_with_304(server, tmp_path):
+    server.bodies['/a.xml'] = b'<sbml/>'
+    cache = ModelCache(cache_dir=tmp_path, max_age=0.0, offline=False)
+
+    first = cache.fetch(server.url('/a.xml'))
+    second = cache.fetch(server.url('/a.xml'))
+
+    assert first == second
+    assert first.read_bytes() == b'<sbml/>'
+    assert server.requests[0][1] is None
+    assert server.requests[1][1] is not None  # conditional request, answered with 304
+
+
+def test_updated_content_is_downloaded(server, tmp_path):
+    server.bodies['/a.xml'] = b'<sbml version="1"/>'
+    cache = ModelCache(cache_dir=tmp_path, max_age=0.0, offline=False)
+    first = cache.fetch(server.url('/a.xml'))
+
+    server.bodies['/a.xml'] = b'<sbml version="2"/>'
+    second = cache.fetch(server.url('/a.xml'))
+
+    assert first != second
+    assert second.read_bytes() == b'<sbml version="2"/>'
+
+
+def test_offline_hit_and_miss(server, tmp_path):
+    server.bodies['/a.xml'] = b'<sbml/>'
+    ModelCache(cache_dir=tmp_path, offline=False).fetch(server.url('/a.xml'))
+    count = len(server.requests)
+
+    offline = ModelCache(cache_dir=tmp_path, max_age=0.0, offline=True)
+    assert offline.fetch(server.url('/a.xml')).read_bytes() == b'<sbml/>'
+    with pytest.raises(RuntimeError, match='not in the cache'):
+        offline.fetch(server.url('/b.xml'))
+    assert len(server.requests) == count
+
+
+def test_serves_stale_content_on_error(server, tmp_path):
+    server.bodies['/a.xml'] = b'<sbml/>'
+    cache = ModelCache(cache_dir=tmp_path, max_age=0.0, offline=False)
+    first = cache.fetch(server.url('/a.xml'))
+
+    server.fail = True
+    assert cache.fetch(server.url('/a.xml')) == first
+    with pytest.raises(RuntimeError, match='Could not download'):
+        cache.fetch(server.url('/b.xml'))
+
+
+def test_evicts_least_recently_used(server, tmp_path):
+    for name in 'abc':
+        server.bodies[f'/{name}.xml'] = name.encode() * 100
+    cache = ModelCache(cache_dir=tmp_path, max_bytes=250, offline=False)
+
+    a = cache.fetch(server.url('/a.xml'))
+    b = cache.fetch(server.url('/b.xml'))
+    cache.fetch(server.url('/a.xml'))  # fresh hit, a is now more recent than b
+    c = cache.fetch(server.url('/c.xml'))
+
+    index = cache._read_index()
+    assert set(index) == {server.url('/a.xml'), server.url('/c.xml')}
+    assert a.is_file() and c.is_file()
+    assert not b.exists()
@@ -0,0 +1,122 @@
+import basico
+import pytest
+
+from biocompose import create_core
+from biocompose.processes import model_index
+from biocompose.processes.copasi_process import CopasiUTCStep
+from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+
+# A is set by an assignment rule and S is a boundary species, so RoadRunner
+# lists them after the floating species
+ORDER_MODEL = '''<?xml version="1.0" encoding="UTF-8"?>
+<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1">
+  <model id="order">
+    <listOfCompartments>
+      <compartment id="cell" size="1" constant="true"/>
+    </listOfCompartments>
+    <listOfSpecies>
+      <species id="A" compartment="cell" initialConcentration="0" hasOnlySubstanceUnits="false"
+               boundaryCondition="false" constant="false"/>
+      <species id="S" compartment="cell" initialConcentration="1" hasOnlySubstanceUnits="false"
+               boundaryCondition="true" constant="false"/>
+      <species id="B" compartment="cell" initialConcentration="0" hasOnlySubstanceUnits="false"
+               boundaryCondition="false" constant="false"/>
+      <species id="C" compartment="cell" initialConcentration="0" hasOnlySubstanceUnits="false"
+               boundaryCondition="false" constant="false"/>
+    </listOfSpecies>
+    <listOfRules>
+      <assignmentRule variable="A">
+        <math xmlns="http://www.w3.org/1998/Math/MathML">
+          <apply><times/><cn>2</cn><ci>B</ci></apply>
+        </math>
+      </assignmentRule>
+    </listOfRules>
+    <listOfReactions>
+      <reaction id="make" reversible="false" fast="false">
+        <listOfReactants>
+          <speciesReference species="S" stoichiometry="1" constant="true"/>
+        </listOfReactants>
+        <listOfProducts>
+          <speciesReference species="B" stoichiometry="1" constant="true"/>
+        </listOfProducts>
+        <kineticLaw>
+          <math xmlns="http://www.w3.org/1998/Math/MathML">
+            <apply><times/><cn>0.5</cn><ci>S</ci></apply>
+          </math>
+        </kineticLaw>
+      </reaction>
+      <reaction id="convert" reversible="false" fast="false">
+        <listOfReactants>
+          <speciesReference species="B" stoichiometry="1" constant="true"/>
+        </listOfReactants>
+        <listOfProducts>
+          <speciesReference species="C" stoichiometry="1" constant="true"/>
+        </listOfProducts>
+        <kineticLaw>
+          <math xmlns="http://www.w3.org/1998/Math/MathML">
+            <apply><times/><cn>0.3</cn><ci>B</ci></apply>
+          </math>
+        </kineticLaw>
+      </reaction>
+    </listOfReactions>
+  </model>
+</sbml>
+'''
+
+
+@pytest.fixture
+def order_model(tmp_path, monkeypatch):
+    path = tmp_path / 'order.xml'
+    path.write_text(ORDER_MODEL)
+    monkeypatch.setattr(model_index, '_indexes', {})
+    return path
+
+
+def step_config(path):
+    return {'model_source': str(path), 'time': 10.0, 'n_points': 5}
+
+
+def test_tellurium_index_does_not_load_copasi(order_model, monkeypatch):
+    def load_model(*args, **kwargs):
+        raise AssertionError('COPASI load while indexing for Tellurium')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(basico, 'load_model', load_model)
+        step = TelluriumUTCStep(step_config(order_model), core=create_core())
+    assert step.model_index.source == 'sbml'
+
+
+def test_slot_order_does_not_depend_on_engine(order_model):
+    core = create_core()
+    first = TelluriumUTCStep(step_config(order_model), core=core)
+    assert first.model_index.species_ids == ['A', 'S', 'B', 'C']
+    assert first.model_index.fixed_species == ['S']
+
+    # COPASI adds its names and keeps the slot order
+    copasi = CopasiUTCStep(step_config(order_model), core=core)
+    assert copasi.model_index.source == 'copasi'
+    assert copasi.model_index.species_ids == ['A', 'S', 'B', 'C']
+    assert copasi.model_index.reaction_ids == ['make', 'convert']
+    assert set(copasi.model_index.sbml_to_name) == {'A', 'S', 'B', 'C'}
+
+    second = TelluriumUTCStep(step_config(order_model), core=core)
+    assert second.species_ids == first.species_ids
+    assert model_index.get_model_index(order_model).species_ids == ['A', 'S', 'B', 'C']
+
+
+def test_copasi_first_gives_the_same_order(order_model):
+    copasi = CopasiUTCStep(step_config(order_model), core=create_core())
+    assert copasi.model_index.species_ids == ['A', 'S', 'B', 'C']
+
+
+def test_engines_report_species_in_the_same_slot_order(tmp_path, monkeypatch):
+    path = tmp_path / 'repressilator.xml'
+    path.write_text(open('biocompose/models/BIOMD0000000012_url.xml').read())
+    monkeypatch.setattr(model_index, '_indexes', {})
+    core = create_core()
+
+    # Tellurium first, as in the comparison document
+    tellurium = TelluriumUTCStep(step_config(path), core=core).update({})['result']
+    copasi = CopasiUTCStep(step_config(path), core=core).update({})['result']
+    assert list(tellurium['species_concentrations']) == list(copasi['species_concentrations'])
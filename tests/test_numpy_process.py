@@ -0,0 +1,142 @@
+import numpy as np
+import pytest
+
+from biocompose.processes.numpy_process import VectorizedModel
+
+
+DECAY_MODEL = '''<?xml version="1.0" encoding="UTF-8"?>
+<sbml xmlns="http://www.sbml.org/sbml/level3/version1/core" level="3" version="1">
+  <model id="decay">
+    <listOfCompartments>
+      <compartment id="cell" size="1" constant="true"/>
+    </listOfCompartments>
+    <listOfSpecies>
+      <species id="A" compartment="cell" initialConcentration="0" hasOnlySubstanceUnits="false"
+               boundaryCondition="false" constant="false"/>
+    </listOfSpecies>
+    <listOfParameters>
+      <parameter id="k1" value="0.5" constant="true"/>
+      <parameter id="k2" value="0" constant="true"/>
+      <parameter id="A0" value="1" constant="true"/>
+      <parameter id="rate" value="0" constant="false"/>
+    </listOfParameters>
+    <listOfInitialAssignments>
+      <initialAssignment symbol="k2">
+        <math xmlns="http://www.w3.org/1998/Math/MathML">
+          <apply><times/><cn>2</cn><ci>k1</ci></apply>
+        </math>
+      </initialAssignment>
+      <initialAssignment symbol="A">
+        <math xmlns="http://www.w3.org/1998/Math/MathML"><ci>A0</ci></math>
+      </initialAssignment>
+    </listOfInitialAssignments>
+    <listOfRules>
+      <assignmentRule variable="rate">
+        <math xmlns="http://www.w3.org/1998/Math/MathML">
+          <apply><times/><ci>k2</ci><ci>A</ci></apply>
+        </math>
+      </assignmentRule>
+    </listOfRules>
+    <listOfReactions>
+      <reaction id="decay" reversible="false" fast="false">
+        <listOfReactants>
+          <speciesReference species="A" stoichiometry="1" constant="true"/>
+        </listOfReactants>
+        <kineticLaw>
+          <math xmlns="http://www.w3.org/1998/Math/MathML">
+            <apply><times/><ci>cell</ci><ci>rate</ci></apply>
+          </math>
+        </kineticLaw>
+      </reaction>
+    </listOfReactions>
+  </model>
+</sbml>
+'''
+
+
+@pytest.fixture
+def decay_model(tmp_path):
+    path = tmp_path / 'decay.xml'
+    path.write_text(DECAY_MODEL)
+    return path
+
+
+def test_initial_assignment_overrides_are_per_row(decay_model):
+    model = VectorizedModel(decay_model)
+    parameter_sets = [{}, {'k2': 3.0}, {'k1': 1.0}, {'A': 2.0}]
+    namespace, amounts = model.namespace(parameter_sets)
+
+    assert np.allclose(namespace['_p_k2'], [1.0, 3.0, 2.0, 1.0])
+    assert np.allclose(amounts[:, 0], [1.0, 1.0, 1.0, 2.0])
+
+    time, trajectories = model.integrate(namespace, amounts, 2.0, 5, rtol=1e-10, atol=1e-12)
+    expected = np.array([1.0, 1.0, 1.0, 2.0])[:, None] * np.exp(
+        -np.array([1.0, 3.0, 2.0, 1.0])[:, None] * time[None, :])
+    assert np.allclose(trajectories[:, :, 0], expected, rtol=1e-6)
+
+
+def test_rejects_assignment_rule_targets(decay_model):
+    model = VectorizedModel(decay_model)
+    with pytest.raises(ValueError, match='assignment rule'):
+        model.namespace([{}, {'rate': 1.0}])
+    with pytest.raises(ValueError, match='cannot vary'):
+        model.namespace([{'cell': 2.0}])
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+
+
+def run_engines(parameter_sets, time=50.0, n_points=101):
+    from biocompose import create_core
+    from biocompose.processes import CompareResults
+    from biocompose.processes.copasi_process import CopasiUTCStep
+    from biocompose.processes.numpy_process import NumpyUTCStep
+    from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+    core = create_core()
+    config = {'model_source': MODEL, 'time': time, 'n_points': n_points}
+    numpy_update = NumpyUTCStep(
+        {**config, 'parameter_sets': parameter_sets, 'rtol': 1e-8, 'atol': 1e-10},
+        core=core).update({})
+    results = {
+        'tellurium': TelluriumUTCStep(config, core=core).update({})['result'],
+        'copasi': CopasiUTCStep(config, core=core).update({})['result'],
+        'numpy': numpy_update['result'],
+    }
+    comparison = CompareResults({}, core=core).update({'results': results})['comparison']
+    return numpy_update, results, comparison['species_mse']
+
+
+def test_matches_tellurium_and_copasi():
+    _, results, species_mse = run_engines([])
+    # same slot order as the other engines, so the arrays are compared directly
+    assert list(results['numpy']['species_concentrations']) == list(
+        results['tellurium']['species_concentrations'])
+    # trajectories reach about 1e3
+    assert species_mse['numpy']['tellurium'] < 1e-4
+    assert species_mse['numpy']['copasi'] < 1e-4
+
+
+def test_batch_rows_match_separate_runs():
+    from biocompose import create_core
+    from biocompose.processes import CompareResults
+    from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+    parameter_sets = [{}, {'tau_mRNA': 3.0}, {'ps_a': 0.4}]
+    numpy_update, _, _ = run_engines(parameter_sets)
+    rows = numpy_update['results']
+    assert sorted(rows) == ['0', '1', '2']
+
+    core = create_core()
+    for row, overrides in enumerate(parameter_sets):
+        step = TelluriumUTCStep({'model_source': MODEL, 'time': 50.0, 'n_points': 101}, core=core)
+        for key, value in overrides.items():
+            step.rr[key] = value
+        step.rr.reset()
+        reference = step.update({})['result']
+        comparison = CompareResults({}, core=core).update(
+            {'results': {'tellurium': reference, 'numpy': rows[str(row)]}})['comparison']
+        assert comparison['species_mse']['numpy']['tellurium'] < 1e-4, row
+
+    # the overrides change the trajectories
+    assert rows['0']['species_concentrations']['PX'] != rows['1']['species_concentrations']['PX']
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from biocompose import wire
+from biocompose.precision import error_report, round_trip_columns
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float16'])
+def test_wire_keeps_time_at_full_precision(precision):
+    time = np.linspace(0.0, 1000.0, 5001)
+    species = np.sin(time / 50.0) * 1e3
+    payload = {'time': time.tolist(), 'species_concentrations': {'A': species.tolist()}}
+
+    decoded = wire.decode(wire.encode(payload, precision=precision), as_numpy=False)
+
+    assert decoded['time'] == time.tolist()
+    assert np.all(np.diff(decoded['time']) > 0)
+    assert wire.describe(wire.encode(payload, precision=precision))['precision'] == precision
+    assert np.max(np.abs(np.asarray(decoded['species_concentrations']['A']) - species)) > 0
+
+
+def test_round_trip_columns_error_report():
+    values = np.column_stack([np.linspace(0.0, 1.0, 100), np.linspace(5.0, 5e4, 100)])
+    reduced = round_trip_columns(values, 'float16')
+    report = error_report(values, reduced)
+    assert report['max_rel_error'] < 2 ** -10
+    assert np.array_equal(round_trip_columns(reduced, 'float16'), reduced)
+
+
+@pytest.mark.parametrize('precision', ['float32', 'float16'])
+def test_tellurium_step_time_strictly_increasing(precision):
+    from biocompose import create_core
+    from biocompose.processes.tellurium_process import TelluriumUTCStep
+
+    step = TelluriumUTCStep({
+        'model_source': MODEL,
+        'time': 1000.0,
+        'n_points': 5001,
+        'precision': precision,
+    }, core=create_core())
+    update = step.update({})
+
+    time = np.asarray(update['result']['time'])
+    assert np.array_equal(time, np.linspace(0.0, 1000.0, 5001))
+    assert np.all(np.diff(time) > 0)
+    assert update['precision_report']['max_rel_error'] > 0
@@ -0,0 +1,113 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from process_bigraph import Composite
+
+from biocompose import create_core
+from biocompose import remote
+from biocompose.remote import WorkerPool
+from biocompose.server import make_router
+
+
+MODEL = 'models/BIOMD0000000012_url.xml'
+COMPARISON = 'biocompose/documents/copasi_tellurium_comparison.json'
+CONFIG = {'model_source': MODEL, 'time': 10, 'n_points': 10}
+
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = WorkerPool.local(2)
+    workers = tuple(worker.url for worker in pool.workers)
+    remote._pools[workers] = pool
+    yield pool
+    remote._pools.pop(workers, None)
+    pool.close()
+
+
+def remote_document(workers):
+    with open(COMPARISON) as handle:
+        document = json.load(handle)
+    for key in ('tellurium_step', 'copasi_step'):
+        process = document['state'][key]['address'].split(':', 1)[1]
+        document['state'][key]['address'] = {
+            'protocol': 'remote',
+            'data': {'process': process, 'workers': workers}}
+    return document
+
+
+def test_remote_steps_match_local_steps(pool):
+    core = create_core()
+    with open(COMPARISON) as handle:
+        local = Composite(json.load(handle), core=core)
+    workers = [worker.url for worker in pool.workers]
+    composite = Composite(remote_document(workers), core=core)
+
+    # one step on each worker
+    assert sorted(worker.instances for worker in pool.workers) == [1, 1]
+    for engine in ('tellurium', 'copasi'):
+        expected = local.state['results'][engine]
+        actual = composite.state['results'][engine]
+        assert actual['time'] == pytest.approx(expected['time'])
+        for sid, values in expected['species_concentrations'].items():
+            assert np.allclose(actual['species_concentrations'][sid], values)
+
+
+def test_batch_reports_worker_load(pool):
+    worker = pool.workers[0]
+    before = worker.reported_instances
+    process_id = pool.call(worker, {
+        'op': 'initialize',
+        'process': 'TelluriumUTCStep',
+        'config': CONFIG})['process_id']
+    # the load of the initialize batch counts the new instance
+    assert worker.reported_instances == before + 1
+
+    pool.call(worker, {'op': 'end', 'process_id': process_id})
+    assert worker.reported_instances == before
+
+
+def test_instances_placed_by_other_clients_count_toward_load(pool):
+    busy, idle = pool.workers
+    other = WorkerPool([busy.url])
+    process_ids = [
+        other.call(other.workers[0], {
+            'op': 'initialize',
+            'process': 'TelluriumUTCStep',
+            'config': CONFIG})['process_id']
+        for _ in range(2)]
+
+    busy.report(pool._get(busy, '/load'))
+    assert busy.reported_instances >= idle.reported_instances + 2
+    assert pool.least_loaded() is idle
+
+    for process_id in process_ids:
+        other.call(other.workers[0], {'op': 'end', 'process_id': process_id})
+
+
+def test_concurrent_initializes_share_the_warm_pool():
+    client = TestClient(FastAPI())
+    client.app.include_router(make_router(create_core()))
+    command = {'op': 'initialize', 'process': 'TelluriumUTCStep', 'config': CONFIG}
+
+    def initialize(_):
+        [outcome] = client.post('/batch', json=[command]).json()['results']
+        assert 'error' not in outcome, outcome
+        return outcome['result']['process_id']
+
+    # fill the warm pool, then take from it from several threads at once
+    process_ids = [initialize(None) for _ in range(2)]
+    client.post('/batch', json=[
+        {'op': 'end', 'process_id': process_id} for process_id in process_ids])
+    assert client.get('/load').json()['warm'] == 2
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        process_ids = list(executor.map(initialize, range(8)))
+
+    assert len(set(process_ids)) == 8
+    load = client.get('/load').json()
+    assert load['instances'] == 8
+    assert load['warm'] == 0
@@ -0,0 +1,95 @@
+import json
+
+import numpy as np
+import pytest
+
+from biocompose import wire
+
+
+def payload():
+    time = np.linspace(0.0, 10.0, 11)
+    return {
+        'results': {
+            'tellurium': {
+                'time': time.tolist(),
+                'species_concentrations': {
+                    'PX': np.exp(-time).tolist(),
+                    'PY': np.arange(11.0) * 0.1,
+                },
+                'fluxes': {},
+                'label': 'repressilator',
+                'nested': [[1.5, 2.5], [3.5]],
+            },
+        },
+    }
+
+
+def as_lists(node):
+    if isinstance(node, dict):
+        return {key: as_lists(item) for key, item in node.items()}
+    if isinstance(node, np.ndarray):
+        return node.tolist()
+    if isinstance(node, list):
+        return [as_lists(item) for item in node]
+    return node
+
+
+@pytest.mark.parametrize('as_numpy', [True, False])
+def test_round_trip(as_numpy):
+    value = payload()
+    decoded = wire.decode(wire.encode(value), as_numpy=as_numpy)
+
+    assert as_lists(decoded) == as_lists(value)
+    time = decoded['results']['tellurium']['time']
+    assert isinstance(time, np.ndarray) == as_numpy
+
+
+def test_arrays_are_aligned_views():
+    data = wire.encode(payload())
+    decoded = wire.decode(data)
+    px = decoded['results']['tellurium']['species_concentrations']['PX']
+    assert px.dtype == np.dtype('<f8')
+    assert not px.flags.writeable
+    assert wire.describe(data)['arrays'] == 5
+
+
+def test_negotiate():
+    assert wire.negotiate(None) == wire.JSON_CONTENT_TYPE
+    assert wire.negotiate(f'{wire.CONTENT_TYPE};q=0') == wire.JSON_CONTENT_TYPE
+    assert wire.negotiate(f'application/json, {wire.CONTENT_TYPE}') == wire.CONTENT_TYPE
+    assert wire.negotiate_precision(f'{wire.CONTENT_TYPE}; precision=float16') == 'float16'
+    assert wire.negotiate_precision(f'{wire.CONTENT_TYPE}; precision=int8') == 'float64'
+
+
+def test_dumps_loads_and_save_load(tmp_path):
+    value = as_lists(payload())
+    assert wire.loads(wire.dumps(value)) == value
+    data = wire.dumps(value, wire.CONTENT_TYPE)
+    assert as_lists(wire.loads(data, f'{wire.CONTENT_TYPE}; precision=float64')) == value
+
+    info = wire.save(tmp_path / 'results.bcw', value, precision='float32')
+    assert info['precision'] == 'float32'
+    loaded = wire.load(tmp_path / 'results.bcw', as_numpy=False)
+    assert loaded['results']['tellurium']['time'] == value['results']['tellurium']['time']
+    assert np.allclose(
+        loaded['results']['tellurium']['species_concentrations']['PX'],
+        value['results']['tellurium']['species_concentrations']['PX'], rtol=1e-6)
+
+
+def test_rejects_other_payloads():
+    with pytest.raises(ValueError):
+        wire.decode(json.dumps({}).encode('utf-8'))
+
+
+@pytest.mark.parametrize('precision', ['float64', 'float16'])
+def test_int_lists_round_trip_exactly(precision):
+    counts = [0, 1, -7, 2 ** 53 + 1, 2 ** 63 - 1]
+    huge = [2 ** 64, 3]
+    value = {'counts': counts, 'huge': huge, 'array': np.array([5, 6], dtype=np.int32)}
+    data = wire.encode(value, precision=precision)
+
+    decoded = wire.decode(data, as_numpy=False)
+    assert decoded['counts'] == counts
+    assert decoded['huge'] == huge
+    assert decoded['array'] == [5, 6]
+    assert wire.decode(data)['counts'].dtype == np.dtype('<i8')